@@ -0,0 +1,64 @@
+# Benchmark offline da análise da transcrição com o backend stub
+#
+# "antes": o fluxo antigo, com duas chamadas em sequência (resumo e
+# sentimento), cada uma enviando a transcrição duas vezes ("Tópico:
+# {topico}-{subject}" do call_agent).
+# "depois": o ServicoAnalise (uma requisição estruturada ou, acima do
+# orçamento, o resumo por janelas seguido da análise final); os tokens somam
+# todas as chamadas, inclusive as das janelas.
+#
+# O backend stub simula latência proporcional aos tokens enviados, então os
+# números servem para comparar formatos de requisição sem rede nem custo.
+#
+# Uso: python benchmarks/bench_analise.py [--palavras 2000 20000 100000]
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import video_transcription_core as core
+
+VOCABULARIO = ("modelo dados treinamento rede neural aprendizado python código vídeo aula exemplo "
+               "resultado análise projeto sistema usuário tempo").split()
+
+def gerar_transcricao(palavras):
+    return " ".join(VOCABULARIO[(i * 7) % len(VOCABULARIO)] for i in range(palavras))
+
+async def fluxo_antigo(servico, texto):
+    uso_total = {"tokens_prompt": 0, "tokens_resposta": 0}
+    for instrucao, subject in [
+        ("Gere um resumo conciso do texto fornecido, destacando os pontos principais em até 100 palavras.",
+         f"Texto a ser resumido: {texto}"),
+        ("Analise o sentimento geral do texto fornecido e classifique-o como 'positivo', 'negativo' ou 'neutro'.",
+         f"Texto a ser analisado: {texto}"),
+    ]:
+        _, uso = await servico._chamar(instrucao, f"Tópico: {texto}-{subject}")
+        for chave in uso_total:
+            uso_total[chave] += uso[chave]
+    return uso_total
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--palavras", type=int, nargs="+", default=[2000, 20000, 100000])
+    args = parser.parse_args()
+
+    servico = core.ServicoAnalise(core.BackendStub())
+    print(f"{'palavras':>9} | {'antes (s)':>9} {'tokens':>9} | {'depois (s)':>10} {'tokens':>9}")
+    for palavras in args.palavras:
+        texto = gerar_transcricao(palavras)
+
+        inicio = time.perf_counter()
+        uso_antes = servico.executar(fluxo_antigo(servico, texto))
+        tempo_antes = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        analise = servico.analisar(texto)
+        tempo_depois = time.perf_counter() - inicio
+
+        tokens_antes = uso_antes["tokens_prompt"] + uso_antes["tokens_resposta"]
+        tokens_depois = analise["uso"]["tokens_prompt"] + analise["uso"]["tokens_resposta"]
+        print(f"{palavras:>9} | {tempo_antes:>9.3f} {tokens_antes:>9} | {tempo_depois:>10.3f} {tokens_depois:>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# Benchmark de precisão x velocidade dos backends de inferência (WER x RTF)
+#
+# Transcreve as amostras com cada combinação de backend e tamanho de modelo e
+# mede tempo de carga, fator de tempo real (RTF = tempo de inferência /
+# duração do áudio), memória dos pesos e taxa de erro de palavras (WER). Cada
+# amostra é um arquivo de áudio em --amostras com a transcrição de referência
+# em um .txt de mesmo nome; sem .txt, a transcrição do --modelo-referencia no
+# backend whisper (FP32) serve de pseudo-referência e o WER mede quanto cada
+# variante se afasta dele. Se o diretório não tem áudio, o vídeo de
+# demonstração do dashboard é baixado para ele uma única vez.
+#
+# A tabela marca com * as combinações na fronteira de Pareto (nenhuma outra é
+# ao mesmo tempo mais rápida e mais precisa). Os spans de inferência vão para
+# METRICAS_DB, de onde a política de modelos lê o RTF medido: rodar o
+# benchmark no servidor de produção calibra a escolha automática de modelo.
+#
+# Uso: python benchmarks/bench_backends.py [--backends whisper whisper-int8 ctranslate2]
+#      [--modelos tiny base small] [--threads 4] [--modelo-referencia small] [--amostras DIR]
+import argparse
+import glob
+import importlib.util
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import video_transcription_core as core
+
+DIRETORIO_AMOSTRAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "amostras")
+URL_DEMONSTRACAO = "https://www.youtube.com/watch?v=cgy9diQA6DM"
+EXTENSOES_AUDIO = (".wav", ".mp3", ".m4a", ".webm", ".ogg", ".opus", ".flac", ".mp4")
+
+def normalizar(texto):
+    return core.TOKENIZADOR_PALAVRAS.findall(texto.lower())
+
+# Distância de edição entre listas de palavras (substituições + inserções + remoções)
+def distancia_edicao(referencia, hipotese):
+    anterior = list(range(len(hipotese) + 1))
+    for i, palavra in enumerate(referencia, 1):
+        atual = [i]
+        for j, outra in enumerate(hipotese, 1):
+            atual.append(min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + (palavra != outra)))
+        anterior = atual
+    return anterior[-1]
+
+def carregar_amostras(diretorio):
+    arquivos = sorted(a for a in glob.glob(os.path.join(diretorio, "*")) if a.lower().endswith(EXTENSOES_AUDIO))
+    if not arquivos:
+        os.makedirs(diretorio, exist_ok=True)
+        arquivo = core.baixar_audio_compactado(URL_DEMONSTRACAO)
+        if not arquivo:
+            sys.exit(f"Nenhuma amostra em {diretorio} e o download do vídeo de demonstração falhou")
+        arquivos = [shutil.copy(arquivo, diretorio)]
+    amostras = []
+    for arquivo in arquivos:
+        caminho_referencia = os.path.splitext(arquivo)[0] + ".txt"
+        referencia = None
+        if os.path.exists(caminho_referencia):
+            with open(caminho_referencia, encoding="utf-8") as f:
+                referencia = f.read()
+        amostras.append({"nome": os.path.basename(arquivo), "audio": core.decodificar_audio(arquivo),
+                         "referencia": referencia})
+    return amostras
+
+def transcrever(modelo, amostra, idioma, backend, tamanho):
+    duracao = len(amostra["audio"]) / core.TAXA_AMOSTRAGEM
+    inicio = time.perf_counter()
+    with core.metricas.medir("inferencia", modelo=tamanho, backend=backend, duracao_audio_s=duracao):
+        resultado = modelo.transcribe(amostra["audio"], language=idioma, fp16=False, **core.opcoes_decodificacao())
+    return resultado["text"], time.perf_counter() - inicio
+
+# Combinações que nenhuma outra supera ao mesmo tempo em RTF e em WER
+def fronteira_pareto(resultados):
+    return [r for r in resultados
+            if not any(o["rtf"] <= r["rtf"] and o["wer"] <= r["wer"] and (o["rtf"], o["wer"]) != (r["rtf"], r["wer"])
+                       for o in resultados)]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=list(core.BACKENDS_INFERENCIA))
+    parser.add_argument("--modelos", nargs="+", default=["tiny", "base", "small"])
+    parser.add_argument("--modelo-referencia", default="small",
+                        help="modelo (backend whisper) que gera a pseudo-referência das amostras sem .txt")
+    parser.add_argument("--idioma", default="pt")
+    parser.add_argument("--threads", type=int, default=None, help="threads intra-op (padrão: WHISPER_THREADS_INTRA_OP)")
+    parser.add_argument("--threads-inter", type=int, default=None)
+    parser.add_argument("--amostras", default=DIRETORIO_AMOSTRAS)
+    args = parser.parse_args()
+
+    core.configurar_threads(args.threads, args.threads_inter)
+    amostras = carregar_amostras(args.amostras)
+    for amostra in amostras:
+        if amostra["referencia"] is None:
+            with core.registro_modelos.usar(args.modelo_referencia, backend="whisper") as modelo:
+                amostra["referencia"], _ = transcrever(modelo, amostra, args.idioma, "whisper", args.modelo_referencia)
+            amostra["pseudo"] = True
+    duracao_total = sum(len(a["audio"]) for a in amostras) / core.TAXA_AMOSTRAGEM
+    pseudo = sum(a.get("pseudo", False) for a in amostras)
+    print(f"{len(amostras)} amostras, {duracao_total:.0f}s de áudio"
+          + (f" ({pseudo} com pseudo-referência do {args.modelo_referencia})" if pseudo else ""))
+
+    resultados = []
+    for backend in args.backends:
+        if backend == "ctranslate2" and importlib.util.find_spec("faster_whisper") is None:
+            print("ctranslate2: faster-whisper não instalado, pulando")
+            continue
+        for tamanho in args.modelos:
+            try:
+                inicio = time.perf_counter()
+                with core.registro_modelos.usar(tamanho, backend=backend) as modelo:
+                    carga = time.perf_counter() - inicio
+                    # Aquecimento: a primeira inferência inclui a alocação dos buffers
+                    modelo.transcribe(amostras[0]["audio"][:core.TAXA_AMOSTRAGEM], language=args.idioma, fp16=False)
+                    erros = palavras = 0
+                    tempo = 0.0
+                    for amostra in amostras:
+                        texto, duracao = transcrever(modelo, amostra, args.idioma, backend, tamanho)
+                        referencia = normalizar(amostra["referencia"])
+                        erros += distancia_edicao(referencia, normalizar(texto))
+                        palavras += len(referencia)
+                        tempo += duracao
+                    bytes_modelo = core.RegistroModelos._tamanho_bytes(modelo)
+            except Exception as e:
+                print(f"{backend}/{tamanho}: erro {e}")
+                continue
+            resultados.append({"backend": backend, "modelo": tamanho, "carga_s": carga, "rtf": tempo / duracao_total,
+                               "wer": erros / max(palavras, 1), "bytes": bytes_modelo})
+            print(f"  {backend}/{tamanho}: RTF {resultados[-1]['rtf']:.3f}, WER {resultados[-1]['wer']:.1%}")
+
+    pareto = fronteira_pareto(resultados)
+    print(f"\n  {'backend':<14} {'modelo':<9} {'carga':>7} {'RTF':>7} {'WER':>7} {'pesos':>9}")
+    for r in sorted(resultados, key=lambda r: r["rtf"]):
+        marca = " *" if r in pareto else ""
+        print(f"  {r['backend']:<14} {r['modelo']:<9} {r['carga_s']:6.1f}s {r['rtf']:7.3f} {r['wer']:7.1%} "
+              f"{r['bytes'] / 1e6:7.0f}MB{marca}")
+    print("  * fronteira de Pareto")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Benchmark do índice de busca textual (SQLite FTS5)
+#
+# Ingestão em lote: indexa vídeos sintéticos (segmentos de 4 s com vocabulário
+# em distribuição de Zipf) em um banco temporário e mede segmentos por
+# segundo. Com --via-cache a ingestão passa por CacheTranscricoes.salvar, como
+# no pipeline (grava também o JSON e a tabela de segmentos).
+# Consultas: mede a latência (mediana e p95) de termos raros, médios e
+# frequentes, de uma frase e de dois termos, com o corpus inteiro indexado.
+#
+# Uso: python benchmarks/bench_busca.py [--videos 1000] [--segmentos-por-video 1000] [--via-cache]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import video_transcription_core as core
+
+VOCABULARIO = 50000
+
+def gerar_segmentos(rng, quantidade, palavras):
+    segmentos = []
+    for i in range(quantidade):
+        indices = np.minimum(rng.zipf(1.2, size=int(rng.integers(8, 20))), VOCABULARIO) - 1
+        segmentos.append({"start": i * 4.0, "end": i * 4.0 + 3.5, "text": " " + " ".join(palavras[j] for j in indices)})
+    return segmentos
+
+def medir_consulta(indice, consulta, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultados = indice.buscar(consulta, limite=20)
+        tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    return tempos[len(tempos) // 2], tempos[int(len(tempos) * 0.95) - 1], len(resultados)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=1000)
+    parser.add_argument("--segmentos-por-video", type=int, default=1000)
+    parser.add_argument("--via-cache", action="store_true")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    palavras = [f"palavra{i}" for i in range(VOCABULARIO)]
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, "busca.sqlite3")
+        indice = core.IndiceBusca(caminho)
+        cache = core.CacheTranscricoes(caminho, indice) if args.via_cache else None
+
+        total = args.videos * args.segmentos_por_video
+        tempo_ingestao = 0.0
+        for v in range(args.videos):
+            segmentos = gerar_segmentos(rng, args.segmentos_por_video, palavras)
+            inicio = time.perf_counter()
+            if cache:
+                cache.salvar(f"video{v:06d}", "pt", segmentos)
+            else:
+                indice.indexar(f"video{v:06d}", "pt", segmentos)
+            tempo_ingestao += time.perf_counter() - inicio
+        tamanho = sum(os.path.getsize(os.path.join(diretorio, a)) for a in os.listdir(diretorio)) / 1e6
+        print(f"ingestão: {total:,} segmentos de {args.videos} vídeos em {tempo_ingestao:.1f}s "
+              f"({total / tempo_ingestao:,.0f} segmentos/s, banco com {tamanho:.0f} MB)")
+
+        consultas = {
+            "frequente": "palavra1",
+            "média": "palavra150",
+            "rara": "palavra40000",
+            "dois termos": "palavra30 palavra500",
+            "frase": '"palavra0 palavra1"',
+        }
+        for nome, consulta in consultas.items():
+            mediana, p95, encontrados = medir_consulta(indice, consulta, args.repeticoes)
+            print(f"  {nome:<12} {consulta!r:<26} mediana {mediana * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms  "
+                  f"({encontrados} resultados)")
+
+if __name__ == "__main__":
+    main()
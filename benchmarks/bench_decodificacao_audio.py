@@ -0,0 +1,98 @@
+# Benchmark: WAV intermediário x decodificação direta para float32 16 kHz
+#
+# Caminho "wav" (atual): converte o arquivo compactado para WAV na taxa e nos
+# canais originais, como o FFmpegExtractAudio do yt-dlp, e depois o Whisper
+# decodifica o WAV de novo com whisper.load_audio.
+# Caminho "direto": decodificar_audio lê o arquivo compactado uma única vez
+# pelo pipe do ffmpeg (com mapeamento em memória acima do limite).
+#
+# Cada caminho roda em um subprocesso separado para medir o pico de RSS de
+# forma isolada; também são medidos os bytes gravados em disco e o tempo total.
+#
+# Uso: python benchmarks/bench_decodificacao_audio.py [--arquivo audio.webm] [--minutos 60]
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+def gerar_audio_compactado(minutos, destino):
+    # Ruído modulado estéreo 48 kHz codificado em Opus, parecido com o que o YouTube entrega
+    taxa = 48000
+    rng = np.random.default_rng(0)
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-f", "f32le", "-ar", str(taxa), "-ac", "2",
+           "-i", "-", "-c:a", "libopus", "-b:a", "128k", destino]
+    processo = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+    for _ in range(int(minutos * 6)):
+        t = np.arange(10 * taxa) / taxa
+        bloco = 0.2 * np.sin(2 * np.pi * 180 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t))
+        bloco = bloco + 0.05 * rng.standard_normal(len(t))
+        processo.stdin.write(np.repeat(bloco[:, None], 2, axis=1).astype(np.float32).tobytes())
+    processo.stdin.close()
+    processo.wait()
+
+def executar_caminho(caminho, arquivo):
+    import video_transcription_core as core
+    import whisper
+
+    diretorio = tempfile.mkdtemp()
+    inicio = time.perf_counter()
+    if caminho == "wav":
+        wav = os.path.join(diretorio, "audio.wav")
+        subprocess.run(["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", arquivo, wav], check=True)
+        bytes_gravados = os.path.getsize(wav)
+        audio = whisper.load_audio(wav)
+    else:
+        # Intercepta o arquivo temporário para contabilizar o que vai para o disco
+        gravados = []
+        original = tempfile.NamedTemporaryFile
+        def registrar(*args, **kwargs):
+            arquivo_temp = original(*args, **kwargs)
+            gravados.append(arquivo_temp)
+            return arquivo_temp
+        tempfile.NamedTemporaryFile = registrar
+        audio = core.decodificar_audio(arquivo, diretorio_temp=diretorio)
+        tempfile.NamedTemporaryFile = original
+        bytes_gravados = audio.nbytes if gravados else 0
+    # Toca todas as páginas, como o Whisper faz ao calcular o espectrograma
+    float(np.abs(audio).max())
+    duracao = time.perf_counter() - inicio
+    pico_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"tempo_s": duracao, "bytes_gravados": bytes_gravados, "pico_rss_mb": pico_rss_mb,
+                      "amostras": int(len(audio))}))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--arquivo", help="Áudio compactado já baixado (webm/m4a/opus)")
+    parser.add_argument("--minutos", type=float, default=60, help="Duração do áudio sintético")
+    parser.add_argument("--caminho", choices=["wav", "direto"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.caminho:
+        executar_caminho(args.caminho, args.arquivo)
+        return
+
+    arquivo = args.arquivo
+    if not arquivo:
+        arquivo = os.path.join(tempfile.mkdtemp(), "sintetico.opus")
+        print(f"Gerando {args.minutos:.0f} min de áudio sintético em {arquivo}...")
+        gerar_audio_compactado(args.minutos, arquivo)
+
+    print(f"Arquivo de entrada: {os.path.getsize(arquivo) / 1e6:.1f} MB")
+    for caminho in ("wav", "direto"):
+        saida = subprocess.run([sys.executable, __file__, "--caminho", caminho, "--arquivo", arquivo],
+                               check=True, capture_output=True, text=True, cwd=RAIZ).stdout
+        r = json.loads(saida.strip().splitlines()[-1])
+        print(f"{caminho:>7}: {r['tempo_s']:7.2f}s  gravados={r['bytes_gravados'] / 1e6:8.1f} MB  "
+              f"pico RSS={r['pico_rss_mb']:8.1f} MB")
+
+if __name__ == "__main__":
+    main()
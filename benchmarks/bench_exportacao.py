@@ -0,0 +1,68 @@
+# Benchmark do exportador de legendas
+#
+# Gera listas sintéticas de segmentos com tempos por palavra e mede, para cada
+# formato (SRT, WebVTT, JSON Lines, texto), com e sem ressegmentação por
+# palavra, o tempo de exportação, a vazão em segmentos por segundo e os
+# megabytes escritos. A saída vai para um arquivo temporário, entregue em
+# lotes como no streaming da transcrição.
+#
+# Uso: python benchmarks/bench_exportacao.py [--segmentos 10000 100000] [--lote 50]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import video_transcription_core as core
+
+PALAVRAS = ("o modelo ficou muito bom mas o treinamento foi lento e difícil hoje vamos falar de "
+            "aprendizado de máquina redes neurais dados projeto resultado").split()
+
+def gerar_segmentos(quantidade, semente=0):
+    rng = np.random.default_rng(semente)
+    segmentos = []
+    inicio = 0.0
+    for _ in range(quantidade):
+        palavras = rng.choice(PALAVRAS, size=int(rng.integers(8, 25)))
+        duracoes = rng.uniform(0.15, 0.5, size=len(palavras))
+        tempos = inicio + np.concatenate(([0.0], np.cumsum(duracoes)))
+        segmentos.append({
+            "start": float(tempos[0]),
+            "end": float(tempos[-1]),
+            "text": " " + " ".join(palavras),
+            "words": [{"start": float(tempos[i]), "end": float(tempos[i + 1]), "word": " " + p}
+                      for i, p in enumerate(palavras)],
+        })
+        inicio = float(tempos[-1]) + 0.3
+    return segmentos
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segmentos", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--lote", type=int, default=50, help="segmentos por chamada de escrever")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, "legendas")
+        for quantidade in args.segmentos:
+            segmentos = gerar_segmentos(quantidade)
+            print(f"{quantidade} segmentos:")
+            for por_palavra in (False, True):
+                for formato in core.ExportadorLegendas.FORMATOS:
+                    inicio = time.perf_counter()
+                    with open(caminho, "w", encoding="utf-8", newline="\n") as f:
+                        exportador = core.ExportadorLegendas(f, formato, por_palavra)
+                        for i in range(0, quantidade, args.lote):
+                            exportador.escrever(segmentos[i:i + args.lote])
+                    duracao = time.perf_counter() - inicio
+                    megabytes = os.path.getsize(caminho) / 1e6
+                    modo = "por palavra" if por_palavra else "segmento"
+                    print(f"  {formato:<5} {modo:<11} {duracao * 1000:8.1f} ms  "
+                          f"{quantidade / duracao:>10,.0f} segmentos/s  {exportador.legendas:>7} legendas  "
+                          f"{megabytes:6.1f} MB ({megabytes / duracao:6.1f} MB/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Benchmark do tempo de importação (partida a frio)
+#
+# Importa o núcleo do pipeline e a CLI em subprocessos novos, cada um num
+# diretório vazio e com o ambiente do usuário (sem redirecionar os bancos).
+# Cada repetição copia os módulos do projeto para um diretório novo, sem
+# bytecode, e mede a primeira importação (partida a frio: o código do projeto
+# é compilado do zero, como no primeiro processo depois de um deploy; as
+# dependências instaladas usam o bytecode gerado pelo pip) e, em seguida, uma
+# segunda (bytecode já em cache). O orçamento vale para a mediana das
+# partidas a frio. Também confere que nenhuma dependência pesada (torch,
+# whisper, yt-dlp, SDKs do Google, Dash, IPython) foi carregada e que a
+# importação não criou arquivos no diretório atual. Sai com código 1 se algo
+# falhar, para poder ser usado como verificação em CI.
+#
+# Uso: python benchmarks/bench_importacao.py [--orcamento-ms 300] [--repeticoes 5]
+import argparse
+import json
+import os
+import glob
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULOS_PESADOS = ["torch", "whisper", "yt_dlp", "google.genai", "google.adk", "google.colab",
+                   "dash", "flask", "IPython", "nltk"]
+
+CODIGO_MEDICAO = """
+import json, sys, time
+inicio = time.perf_counter()
+import {modulo}
+duracao = time.perf_counter() - inicio
+print(json.dumps({{"duracao_s": duracao, "carregados": [m for m in {pesados!r} if m in sys.modules]}}))
+"""
+
+# Roda a importação num diretório vazio, com os módulos do projeto em
+# `diretorio_modulos`, e devolve o tempo, os módulos pesados carregados e os
+# arquivos que apareceram no diretório
+def medir_importacao(modulo, diretorio_modulos):
+    codigo = CODIGO_MEDICAO.format(modulo=modulo, pesados=MODULOS_PESADOS)
+    ambiente = dict(os.environ, PYTHONPATH=diretorio_modulos + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    ambiente.pop("PYTHONDONTWRITEBYTECODE", None)
+    with tempfile.TemporaryDirectory() as diretorio:
+        saida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True,
+                               check=True, env=ambiente, cwd=diretorio).stdout
+        resultado = json.loads(saida.strip().splitlines()[-1])
+        resultado["arquivos_criados"] = sorted(os.listdir(diretorio))
+    return resultado
+
+# Uma partida a frio (cópia nova dos módulos, sem __pycache__) seguida de uma a quente
+def medir_frio_e_quente(modulo):
+    with tempfile.TemporaryDirectory(prefix="modulos_") as diretorio_modulos:
+        for arquivo in glob.glob(os.path.join(RAIZ, "*.py")):
+            shutil.copy(arquivo, diretorio_modulos)
+        return medir_importacao(modulo, diretorio_modulos), medir_importacao(modulo, diretorio_modulos)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orcamento-ms", type=float, default=300)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    falhou = False
+    for modulo in ("video_transcription_core", "video_transcription_cli"):
+        medicoes = [medir_frio_e_quente(modulo) for _ in range(args.repeticoes)]
+        frios = [frio["duracao_s"] * 1000 for frio, _ in medicoes]
+        quentes = [quente["duracao_s"] * 1000 for _, quente in medicoes]
+        resultados = [r for par in medicoes for r in par]
+        carregados = sorted({m for r in resultados for m in r["carregados"]})
+        criados = sorted({a for r in resultados for a in r["arquivos_criados"]})
+        frio = statistics.median(frios)
+        estado = "ok" if frio <= args.orcamento_ms and not carregados and not criados else "FALHOU"
+        falhou = falhou or estado != "ok"
+        print(f"{modulo:<26} frio mediana {frio:7.1f} ms (máx {max(frios):7.1f} ms, "
+              f"orçamento {args.orcamento_ms:.0f} ms)  quente mediana {statistics.median(quentes):7.1f} ms  "
+              f"pesados carregados: {', '.join(carregados) or 'nenhum'}  "
+              f"arquivos criados: {', '.join(criados) or 'nenhum'}  [{estado}]")
+    sys.exit(1 if falhou else 0)
+
+if __name__ == "__main__":
+    main()
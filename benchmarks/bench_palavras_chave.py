@@ -0,0 +1,75 @@
+# Benchmark do motor de palavras-chave (TF-IDF de 1 a 3-grams)
+#
+# Gera transcrições sintéticas de algumas horas (segmentos de 4 s com
+# vocabulário em distribuição de Zipf misturado a stop words) e mede:
+#   - extrair sem corpus (só TF);
+#   - extrair com um corpus SQLite temporário já populado com outros vídeos;
+#   - extrair_termo_principal sobre o texto inteiro, como referência.
+#
+# Uso: python benchmarks/bench_palavras_chave.py [--horas 1 3 6] [--videos-corpus 50]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import video_transcription_core as core
+
+STOP = "o a de que e do da em um para com não uma os no se na por mais as dos como mas ao".split()
+
+def gerar_segmentos(horas, semente=0, vocabulario=20000):
+    rng = np.random.default_rng(semente)
+    palavras = [f"termo{i}" for i in range(vocabulario)]
+    quantidade = int(horas * 3600 / 4)
+    segmentos = []
+    for i in range(quantidade):
+        tamanho = int(rng.integers(8, 18))
+        indices = np.minimum(rng.zipf(1.3, size=tamanho), vocabulario) - 1
+        texto = [palavras[j] if rng.random() < 0.6 else STOP[j % len(STOP)] for j in indices]
+        segmentos.append({"start": i * 4.0, "end": i * 4.0 + 3.5, "text": " " + " ".join(texto)})
+    return segmentos
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--horas", type=float, nargs="+", default=[1, 3, 6])
+    parser.add_argument("--videos-corpus", type=int, default=50)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        corpus = core.CorpusPalavrasChave(os.path.join(diretorio, "corpus.sqlite3"))
+        motor_corpus = core.MotorPalavrasChave(corpus)
+        inicio = time.perf_counter()
+        for v in range(args.videos_corpus):
+            motor_corpus.extrair(gerar_segmentos(0.25, semente=1000 + v), video_id=f"video{v}")
+        print(f"corpus: {args.videos_corpus} vídeos de 15 min em {time.perf_counter() - inicio:.2f}s "
+              f"({corpus.estatisticas()['termos'].get('pt', 0)} termos)")
+
+        motor_tf = core.MotorPalavrasChave()
+        for horas in args.horas:
+            segmentos = gerar_segmentos(horas)
+            texto = " ".join(seg["text"] for seg in segmentos)
+            palavras = len(texto.split())
+            t_tf, _ = medir(lambda: motor_tf.extrair(segmentos), args.repeticoes)
+            t_idf, chaves = medir(lambda: motor_corpus.extrair(segmentos, video_id=f"longo{horas}"),
+                                  args.repeticoes)
+            t_ref, _ = medir(lambda: core.extrair_termo_principal(texto), args.repeticoes)
+            print(f"{horas:>4}h ({len(segmentos)} segmentos, {palavras} palavras): "
+                  f"TF {t_tf * 1000:7.1f} ms | TF-IDF {t_idf * 1000:7.1f} ms | "
+                  f"extrair_termo_principal {t_ref * 1000:7.1f} ms | "
+                  f"{palavras / t_idf:,.0f} palavras/s")
+            print(f"       top 3: {[c['termo'] for c in chaves[:3]]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# Benchmark offline do pipeline completo, medido pelos spans de core.metricas
+#
+# Para cada vídeo sintético roda download, decodificação, transcrição, análise
+# e agentes, sem rede e sem pesos do Whisper:
+#   - download: um yt_dlp falso grava um WAV sintético (fala simulada com
+#     pausas) limitado a --banda-mbps, chamando os progress hooks;
+#   - decodificação: ffmpeg de verdade, quando instalado (sem ele a etapa é
+#     pulada e o WAV é lido direto);
+#   - transcrição: um modelo falso que gasta --rtf-modelo segundos por segundo
+#     de áudio e --carga-modelo-s para carregar (ou o Whisper com --modelo-real);
+#   - análise e agentes: ANALISE_BACKEND=stub.
+# Os bancos (métricas, cache, fila) e o armazém de áudios ficam em um
+# diretório temporário. Com --salvar o resumo por estágio vai para um JSON;
+# com --referencia a mediana de cada estágio é comparada à do arquivo e o
+# script sai com código 1 se alguma piorar mais que --tolerancia, para rodar
+# antes do deploy.
+#
+# Uso: python benchmarks/bench_pipeline.py [--videos 3] [--minutos 5] [--salvar base.json]
+#      python benchmarks/bench_pipeline.py --referencia base.json --tolerancia 0.25
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import types
+import wave
+
+import numpy as np
+
+DIRETORIO_TEMP = tempfile.mkdtemp(prefix="bench_pipeline_")
+os.environ.update({
+    "METRICAS_DB": os.path.join(DIRETORIO_TEMP, "metricas.sqlite3"),
+    "CACHE_TRANSCRICOES_DB": os.path.join(DIRETORIO_TEMP, "cache.sqlite3"),
+    "FILA_DB": os.path.join(DIRETORIO_TEMP, "fila.sqlite3"),
+    "ARTEFATOS_DIR": os.path.join(DIRETORIO_TEMP, "artefatos"),
+    "ANALISE_BACKEND": "stub",
+})
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import video_transcription_core as core
+
+TAXA = core.TAXA_AMOSTRAGEM
+PALAVRAS = ("hoje vamos falar sobre aprendizado de máquina redes neurais dados treinamento modelo resultado "
+            "projeto python análise vídeo transcrição exemplo importante muito bom difícil rápido").split()
+# Estágios com mediana abaixo disso não entram na comparação (ruído de medição)
+PISO_COMPARACAO_S = 0.005
+
+def gerar_audio_sintetico(segundos, semente=0):
+    rng = np.random.default_rng(semente)
+    blocos = []
+    total = int(segundos * TAXA)
+    gerado = 0
+    while gerado < total:
+        fala = int(rng.uniform(2, 8) * TAXA)
+        t = np.arange(fala) / TAXA
+        envelope = 0.5 * (1 + np.sin(2 * np.pi * rng.uniform(3, 6) * t))
+        portadora = np.sin(2 * np.pi * rng.uniform(120, 250) * t) + 0.3 * rng.standard_normal(fala)
+        blocos.append((0.2 * envelope * portadora).astype(np.float32))
+        pausa = int(rng.uniform(0.3, 1.5) * TAXA)
+        blocos.append((0.001 * rng.standard_normal(pausa)).astype(np.float32))
+        gerado += fala + pausa
+    return np.concatenate(blocos)[:total]
+
+def ler_wav(caminho):
+    with wave.open(caminho, "rb") as f:
+        return np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16).astype(np.float32) / 32768
+
+# Substituto do yt_dlp: "baixa" um WAV sintético em blocos de 1 MB respeitando a banda
+def criar_yt_dlp_falso(segundos, banda_mbps):
+    class YoutubeDL:
+        def __init__(self, opcoes):
+            self.opcoes = opcoes
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *excecao):
+            return False
+
+        def prepare_filename(self, info):
+            return self.opcoes["outtmpl"] % {"ext": info["ext"]}
+
+        def extract_info(self, url, download=True):
+            video_id = core.extrair_video_id(url)
+            audio = gerar_audio_sintetico(segundos, semente=sum(map(ord, video_id)))
+            pcm = (np.clip(audio, -1, 1) * 32767).astype(np.int16).tobytes()
+            info = {"id": video_id, "ext": "wav", "duration": segundos}
+            caminho = self.prepare_filename(info)
+            baixados = 0
+            with wave.open(caminho, "wb") as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(TAXA)
+                for i in range(0, len(pcm), 1 << 20):
+                    bloco = pcm[i:i + (1 << 20)]
+                    time.sleep(len(bloco) * 8 / (banda_mbps * 1e6))
+                    f.writeframes(bloco)
+                    baixados += len(bloco)
+                    for hook in self.opcoes.get("progress_hooks", []):
+                        hook({"status": "downloading", "downloaded_bytes": baixados, "total_bytes": len(pcm)})
+            return info
+
+    modulo = types.ModuleType("yt_dlp")
+    modulo.YoutubeDL = YoutubeDL
+    return modulo
+
+# Modelo com a interface de whisper.transcribe que simula o custo da inferência
+class ModeloFalso:
+    def __init__(self, rtf):
+        self.rtf = rtf
+
+    def transcribe(self, audio, language=None, initial_prompt=None, **opcoes):
+        duracao = len(audio) / TAXA
+        time.sleep(self.rtf * duracao)
+        rng = np.random.default_rng(len(audio))
+        segmentos = [{"start": float(t), "end": float(min(t + 4, duracao)),
+                      "text": " " + " ".join(rng.choice(PALAVRAS, size=10))}
+                     for t in np.arange(0, duracao, 4)]
+        return {"segments": segmentos, "text": "".join(s["text"] for s in segmentos)}
+
+def formatar_tabela(resumo):
+    linhas = [f"  {'estágio':<14} {'chamadas':>8} {'p50':>9} {'p95':>9} {'total':>9} {'rtf':>7} "
+              f"{'bytes':>10} {'rss pico':>9} {'+pico':>8}"]
+    for estagio, dados in resumo.items():
+        atributos = dados["atributos"]
+        rtf = f"{atributos['rtf']['media']:7.3f}" if "rtf" in atributos else f"{'-':>7}"
+        total_bytes = sum(atributos[n]["total"] for n in ("bytes", "bytes_saida") if n in atributos)
+        linhas.append(f"  {estagio:<14} {dados['chamadas']:>8} {dados['p50_s'] * 1000:7.1f}ms "
+                      f"{dados['p95_s'] * 1000:7.1f}ms {dados['total_s']:8.2f}s {rtf} "
+                      f"{total_bytes / 1e6:8.1f}MB {dados['rss_pico_bytes'] / 1e6:7.0f}MB "
+                      f"{dados['rss_acrescimo_pico_bytes'] / 1e6:6.1f}MB")
+    return "\n".join(linhas)
+
+# Estágios cuja mediana piorou mais que a tolerância em relação à referência
+def comparar(resumo, referencia, tolerancia):
+    regressoes = []
+    for estagio, dados in resumo.items():
+        anterior = referencia.get(estagio)
+        if not anterior or max(dados["p50_s"], anterior["p50_s"]) < PISO_COMPARACAO_S:
+            continue
+        variacao = dados["p50_s"] / anterior["p50_s"] - 1 if anterior["p50_s"] else float("inf")
+        estado = "REGRESSÃO" if variacao > tolerancia else "ok"
+        print(f"  {estagio:<14} {anterior['p50_s'] * 1000:8.1f}ms -> {dados['p50_s'] * 1000:8.1f}ms "
+              f"({variacao:+.0%})  [{estado}]")
+        if estado != "ok":
+            regressoes.append(estagio)
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=3)
+    parser.add_argument("--minutos", type=float, default=5)
+    parser.add_argument("--idioma", default="pt")
+    parser.add_argument("--banda-mbps", type=float, default=200)
+    parser.add_argument("--rtf-modelo", type=float, default=0.02, help="segundos de inferência por segundo de áudio")
+    parser.add_argument("--carga-modelo-s", type=float, default=0.5)
+    parser.add_argument("--modelo-real", action="store_true", help="usa o Whisper instalado em vez do modelo falso")
+    parser.add_argument("--modelo", default="tiny")
+    parser.add_argument("--processos", type=int, default=0, help="só com --modelo-real (o pool importa o Whisper)")
+    parser.add_argument("--salvar", default=None, help="grava o resumo por estágio neste JSON")
+    parser.add_argument("--referencia", default=None, help="JSON gravado com --salvar para comparação")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    args = parser.parse_args()
+
+    segundos = args.minutos * 60
+    sys.modules["yt_dlp"] = criar_yt_dlp_falso(segundos, args.banda_mbps)
+    if not args.modelo_real:
+        def carregar_modelo_falso(backend, tamanho, device, dtype):
+            time.sleep(args.carga_modelo_s)
+            return ModeloFalso(args.rtf_modelo)
+        core.registro_modelos = core.RegistroModelos(core.ORCAMENTO_MEMORIA_MODELOS_MB << 20, carregar_modelo_falso)
+    processos = args.processos if args.modelo_real else 0
+    tem_ffmpeg = shutil.which("ffmpeg") is not None
+    if not tem_ffmpeg:
+        print("ffmpeg não encontrado: a decodificação é pulada e o WAV sintético é lido direto")
+
+    diretorio_original = os.getcwd()
+    os.chdir(DIRETORIO_TEMP)
+    try:
+        for v in range(args.videos):
+            inicio = time.perf_counter()
+            with core.audio_compactado_em_uso(f"https://youtu.be/sintetico{v:02d}") as arquivo:
+                audio = core.decodificar_audio(arquivo) if tem_ffmpeg else ler_wav(arquivo)
+            transcricao = core.transcrever_audio(audio, args.idioma, tamanho_modelo=args.modelo, processos=processos)
+            texto = " ".join(seg["text"].strip() for seg in transcricao)
+            analise = core.obter_servico_analise().analisar(texto, args.idioma, transcricao)
+            topico = (analise["palavras_chave"] or ["tecnologia"])[0]
+            core.run_agentes(topico, "stub", None)
+            print(f"vídeo {v + 1}/{args.videos}: {segundos:.0f}s de áudio, {len(transcricao)} segmentos, "
+                  f"tópico {topico!r}, {time.perf_counter() - inicio:.2f}s")
+
+        resumo = core.metricas.resumo(janela_s=1e9)["estagios"]
+        print(formatar_tabela(resumo))
+        if args.salvar:
+            with open(os.path.join(diretorio_original, args.salvar), "w", encoding="utf-8") as f:
+                json.dump(resumo, f, ensure_ascii=False, indent=2)
+            print(f"Resumo salvo em {args.salvar}")
+        regressoes = []
+        if args.referencia:
+            with open(os.path.join(diretorio_original, args.referencia), encoding="utf-8") as f:
+                regressoes = comparar(resumo, json.load(f), args.tolerancia)
+    finally:
+        os.chdir(diretorio_original)
+        shutil.rmtree(DIRETORIO_TEMP, ignore_errors=True)
+    sys.exit(1 if regressoes else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# Benchmark do motor de sentimento local (léxico + NumPy)
+#
+# Pontua listas sintéticas de segmentos, parecidas com as do Whisper, e mede
+# o tempo total e a vazão em segmentos por segundo.
+#
+# Uso: python benchmarks/bench_sentimentos.py [--segmentos 1000 10000 100000]
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import video_transcription_core as core
+
+PALAVRAS = ("o modelo ficou muito bom mas o treinamento foi lento e difícil não gostei do erro final "
+            "resultado excelente para o projeto com dados novos").split()
+
+def gerar_segmentos(quantidade, semente=0):
+    rng = np.random.default_rng(semente)
+    segmentos = []
+    for i in range(quantidade):
+        palavras = rng.choice(PALAVRAS, size=int(rng.integers(8, 25)))
+        segmentos.append({"start": i * 4.0, "end": i * 4.0 + 3.5, "text": " " + " ".join(palavras)})
+    return segmentos
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segmentos", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    motor = core.MotorSentimento()
+    for quantidade in args.segmentos:
+        textos = [seg["text"] for seg in gerar_segmentos(quantidade)]
+        motor.pontuar(textos[:100])  # aquecimento
+        tempos = []
+        for _ in range(args.repeticoes):
+            inicio = time.perf_counter()
+            motor.pontuar(textos)
+            tempos.append(time.perf_counter() - inicio)
+        melhor = min(tempos)
+        print(f"{quantidade:>7} segmentos: {melhor * 1000:8.1f} ms  ({quantidade / melhor:,.0f} segmentos/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Benchmark: transcrição em chamada única x transcrição em trechos paralelos
+#
+# Gera um áudio sintético (rajadas de ruído modulado separadas por pausas),
+# transcreve pelos dois caminhos de transcrever_audio e compara tempo de
+# parede e fator de tempo real (RTF = tempo de processamento / duração do áudio).
+#
+# Uso: python benchmarks/bench_transcricao_paralela.py --minutos 20 --processos 4 --modelo tiny
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import video_transcription_core as core
+
+TAXA = 16000
+
+def gerar_audio_sintetico(minutos, semente=0):
+    rng = np.random.default_rng(semente)
+    blocos = []
+    total = int(minutos * 60 * TAXA)
+    gerado = 0
+    while gerado < total:
+        # "Frase" de 2 a 8 s seguida de pausa de 0,3 a 1,5 s
+        fala = int(rng.uniform(2, 8) * TAXA)
+        t = np.arange(fala) / TAXA
+        envelope = 0.5 * (1 + np.sin(2 * np.pi * rng.uniform(3, 6) * t))
+        portadora = np.sin(2 * np.pi * rng.uniform(120, 250) * t) + 0.3 * rng.standard_normal(fala)
+        blocos.append((0.2 * envelope * portadora).astype(np.float32))
+        pausa = int(rng.uniform(0.3, 1.5) * TAXA)
+        blocos.append((0.001 * rng.standard_normal(pausa)).astype(np.float32))
+        gerado += fala + pausa
+    return np.concatenate(blocos)[:total]
+
+def medir(audio, idioma, modelo, processos):
+    inicio = time.perf_counter()
+    segmentos = core.transcrever_audio(audio, idioma, tamanho_modelo=modelo, processos=processos)
+    duracao = time.perf_counter() - inicio
+    return duracao, segmentos
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minutos", type=float, default=20)
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--modelo", default="tiny")
+    parser.add_argument("--idioma", default="pt")
+    args = parser.parse_args()
+
+    audio = gerar_audio_sintetico(args.minutos)
+    duracao_audio = len(audio) / TAXA
+    print(f"Áudio sintético: {duracao_audio:.0f}s, modelo {args.modelo}")
+
+    # Aquecimento: carrega o modelo no processo principal e nos processos do pool
+    # para que o tempo medido seja apenas de inferência
+    curto = audio[: 2 * int(core.DURACAO_TRECHO_S * TAXA) * args.processos]
+    medir(curto[: 30 * TAXA], args.idioma, args.modelo, 1)
+    medir(curto, args.idioma, args.modelo, args.processos)
+
+    for nome, processos in [("chamada única", 1), (f"{args.processos} processos", args.processos)]:
+        tempo, segmentos = medir(audio, args.idioma, args.modelo, processos)
+        print(f"{nome:>16}: {tempo:8.2f}s  RTF={tempo / duracao_audio:.3f}  segmentos={len(segmentos)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+# Os bancos SQLite, o armazém de áudios e os jobs do dashboard vão para um diretório
+# temporário da sessão de testes, antes dos módulos do projeto serem importados
+import os
+import sys
+import tempfile
+
+DIRETORIO_TESTES = tempfile.mkdtemp(prefix="testes_transcricao_")
+os.environ.update({
+    "CACHE_TRANSCRICOES_DB": os.path.join(DIRETORIO_TESTES, "cache.sqlite3"),
+    "FILA_DB": os.path.join(DIRETORIO_TESTES, "fila.sqlite3"),
+    "METRICAS_DB": os.path.join(DIRETORIO_TESTES, "metricas.sqlite3"),
+    "ARTEFATOS_DIR": os.path.join(DIRETORIO_TESTES, "artefatos"),
+    "DASH_DIRETORIO_JOBS": os.path.join(DIRETORIO_TESTES, "jobs"),
+    "ANALISE_BACKEND": "stub",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
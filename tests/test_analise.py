@@ -0,0 +1,66 @@
+import json
+
+import video_transcription_core as core
+
+# Backend que devolve resumos maiores que o orçamento, para forçar novas rodadas de redução
+class BackendResumosLongos:
+    def __init__(self):
+        self.chamadas = []
+
+    async def gerar(self, instrucao, texto, esquema=None):
+        self.chamadas.append(texto)
+        if esquema:
+            resposta = json.dumps({"resumo": "ok", "sentimento": "neutro", "palavras_chave": []})
+        else:
+            resposta = "resumo longo " * 50
+        return resposta, {"tokens_prompt": core.estimar_tokens(texto), "tokens_resposta": core.estimar_tokens(resposta)}
+
+def test_reducao_para_quando_a_grade_maior_nao_junta_janelas():
+    # Segmentos tão distantes que nem a grade de tempo da segunda rodada junta
+    # dois deles, cada um dentro do orçamento (não é quebrado por palavras)
+    segmentos = [{"start": t, "end": t + 5.0, "text": " texto do segmento " * 10} for t in (0.0, 1e5, 2e5)]
+    texto = " ".join(seg["text"] for seg in segmentos)
+    backend = BackendResumosLongos()
+    servico = core.ServicoAnalise(backend, orcamento_tokens=50)
+
+    resultado = servico.analisar(texto, "pt", segmentos)
+
+    # Uma rodada de três janelas e a análise final sobre os resumos dela
+    assert resultado["janelas"] == 3
+    assert len(backend.chamadas) == 4
+    assert backend.chamadas[-1].count("resumo longo") == 150
+
+# Backend que registra o tamanho de cada requisição e responde como o stub, sem latência
+class BackendRegistrado(core.BackendStub):
+    def __init__(self):
+        super().__init__()
+        self.tokens_por_chamada = []
+
+    async def gerar(self, instrucao, texto, esquema=None):
+        self.tokens_por_chamada.append(core.estimar_tokens(texto))
+        return self.responder(instrucao, texto, esquema)
+
+# Texto puro sem pontuação vira um único segmento, que é quebrado por palavras:
+# nenhuma requisição passa do orçamento, e o uso devolvido soma todas elas
+def test_texto_sem_pontuacao_respeita_orcamento_e_soma_uso():
+    texto = " ".join(f"palavra{i % 50}" for i in range(20000))
+    backend = BackendRegistrado()
+    servico = core.ServicoAnalise(backend, orcamento_tokens=2000)
+
+    resultado = servico.analisar(texto, "pt")
+
+    assert len(backend.tokens_por_chamada) > 2
+    # O cabeçalho de tempo da janela ([00:00:00 - 00:00:00]) soma alguns tokens
+    assert max(backend.tokens_por_chamada) <= 2000 + 10
+    estatisticas = servico.estatisticas()
+    assert resultado["uso"] == {"tokens_prompt": estatisticas["tokens_prompt"],
+                                "tokens_resposta": estatisticas["tokens_resposta"]}
+
+def test_quebrar_segmento_reparte_tempos():
+    seg = {"start": 10.0, "end": 20.0, "text": " " + " ".join(["abc"] * 100)}
+    partes = core.quebrar_segmento(seg, 50)
+    assert len(partes) == 2
+    assert all(core.estimar_tokens(p["text"].strip()) <= 50 for p in partes)
+    assert partes[0]["start"] == 10.0 and partes[-1]["end"] == 20.0
+    assert partes[0]["end"] == partes[1]["start"]
+    assert " ".join(p["text"].strip() for p in partes) == seg["text"].strip()
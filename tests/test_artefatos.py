@@ -0,0 +1,118 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from video_transcription_core import ArmazemArtefatos, extrair_video_id
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.mark.parametrize("url", [
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "youtube.com/watch?v=dQw4w9WgXcQ&t=10s",
+    "https://youtu.be/dQw4w9WgXcQ?si=abc",
+    "https://m.youtube.com/shorts/dQw4w9WgXcQ",
+    "https://music.youtube.com/watch?list=PL1&v=dQw4w9WgXcQ",
+    "https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ",
+    "https://www.youtube.com/live/dQw4w9WgXcQ?feature=share",
+    "https://www.youtube.com/attribution_link?a=x&u=/watch%3Fv%3DdQw4w9WgXcQ%26feature%3Dshare",
+    "https://consent.youtube.com/m?continue=https%3A%2F%2Fwww.youtube.com%2Fwatch%3Fv%3DdQw4w9WgXcQ",
+    "dQw4w9WgXcQ",
+])
+def test_extrair_video_id_aceita_links_do_youtube(url):
+    assert extrair_video_id(url) == "dQw4w9WgXcQ"
+
+@pytest.mark.parametrize("url", [
+    "https://notyoutube.com/embed/dQw4w9WgXcQ",
+    "https://youtube.com.exemplo.com/watch?v=dQw4w9WgXcQ",
+    "https://fakeyoutu.be/dQw4w9WgXcQ",
+    "https://exemplo.com/?u=https://youtu.be/dQw4w9WgXcQ",
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQX",
+    "https://www.youtube.com/channel/UCdQw4w9WgX",
+])
+def test_extrair_video_id_recusa_outros_hosts_e_ids_invalidos(url):
+    assert extrair_video_id(url) is None
+
+def baixar_arquivo(extensao, conteudo=b"audio"):
+    def baixar(diretorio):
+        caminho = os.path.join(diretorio, f"download.{extensao}")
+        with open(caminho, "wb") as f:
+            f.write(conteudo)
+        return caminho
+    return baixar
+
+# A chave com extensão vira o nome do arquivo; sem extensão, ganha a do download
+def test_nomes_dos_arquivos_no_armazem(tmp_path):
+    armazem = ArmazemArtefatos(tmp_path, 10 ** 6)
+    wav = armazem.produzir("dQw4w9WgXcQ.wav", baixar_arquivo("wav"))
+    compactado = armazem.produzir("dQw4w9WgXcQ", baixar_arquivo("webm"))
+    assert os.path.basename(wav) == "dQw4w9WgXcQ.wav"
+    assert os.path.basename(compactado) == "dQw4w9WgXcQ.webm"
+
+# Quem espera o download em andamento de outra thread não conta como miss
+def test_download_compartilhado_nao_conta_como_miss(tmp_path):
+    armazem = ArmazemArtefatos(tmp_path, 10 ** 6)
+    comecou, liberar = threading.Event(), threading.Event()
+    downloads = []
+
+    def baixar_lento(diretorio):
+        downloads.append(diretorio)
+        comecou.set()
+        liberar.wait(5)
+        return baixar_arquivo("wav")(diretorio)
+
+    primeira = threading.Thread(target=armazem.produzir, args=("dQw4w9WgXcQ.wav", baixar_lento))
+    primeira.start()
+    comecou.wait(5)
+    segunda = threading.Thread(target=armazem.produzir, args=("dQw4w9WgXcQ.wav", baixar_lento))
+    segunda.start()
+    segunda.join(0.2)  # a segunda fica esperando a trava do download em andamento
+    liberar.set()
+    primeira.join()
+    segunda.join()
+
+    estatisticas = armazem.estatisticas()
+    assert len(downloads) == 1
+    assert estatisticas["misses"] == 1
+    assert estatisticas["downloads_compartilhados"] + estatisticas["hits"] == 1
+
+# Um arquivo reservado (em uso por um consumidor) não é removido pela
+# evicção; ao ser liberado, volta a ser candidato
+def test_evictar_pula_arquivo_reservado(tmp_path):
+    armazem = ArmazemArtefatos(tmp_path, 6)
+    with armazem.reservar("aaaaaaaaaaa"):
+        em_uso = armazem.produzir("aaaaaaaaaaa", baixar_arquivo("webm", b"12345"))
+        armazem.produzir("bbbbbbbbbbb", baixar_arquivo("webm", b"12345"))
+        assert os.path.exists(em_uso)
+    assert armazem.evictar(protegida="bbbbbbbbbbb") == 1
+    assert not os.path.exists(em_uso)
+
+# A reserva vale entre processos (flock compartilhado)
+def test_reserva_vale_entre_processos(tmp_path):
+    pytest.importorskip("fcntl")
+    armazem = ArmazemArtefatos(tmp_path, 6)
+    em_uso = armazem.produzir("aaaaaaaaaaa", baixar_arquivo("webm", b"12345"))
+    codigo = ("import sys, time; from video_transcription_core import ArmazemArtefatos\n"
+              "with ArmazemArtefatos(sys.argv[1], 6).reservar('aaaaaaaaaaa'):\n"
+              "    print('reservado', flush=True); sys.stdin.readline()\n")
+    processo = subprocess.Popen([sys.executable, "-c", codigo, str(tmp_path)], stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, text=True, cwd=RAIZ)
+    try:
+        assert processo.stdout.readline().strip() == "reservado"
+        armazem.produzir("bbbbbbbbbbb", baixar_arquivo("webm", b"12345"))
+        assert os.path.exists(em_uso)
+    finally:
+        processo.communicate("\n")
+    assert armazem.evictar(protegida="bbbbbbbbbbb") == 1
+
+# Sem fcntl: várias reservas simultâneas, mas a evicção (exclusiva, sem bloquear) falha
+def test_trava_local_compartilhada_e_exclusiva(tmp_path):
+    armazem = ArmazemArtefatos(tmp_path, 6)
+    with armazem._trava_local("uso-1", True, True) as primeira, armazem._trava_local("uso-1", True, True) as segunda:
+        assert primeira and segunda
+        with armazem._trava_local("uso-1", False, False) as exclusiva:
+            assert not exclusiva
+    with armazem._trava_local("uso-1", False, False) as exclusiva:
+        assert exclusiva
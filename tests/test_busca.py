@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("dash")
+
+from video_transcription_core import cache_transcricoes
+from video_transcription_dash_ai import app
+
+SEGMENTOS = [{"start": 0.0, "end": 2.0, "text": "o tamanduá atravessou a estrada"}]
+
+# Invalidar a transcrição de um modelo não tira o vídeo da busca enquanto a
+# de outro modelo continua no cache; invalidar a última tira
+def test_invalidar_um_modelo_mantem_video_na_busca():
+    cliente = app.server.test_client()
+    cache_transcricoes.salvar("tamandua001", "pt", SEGMENTOS, modelo="base")
+    cache_transcricoes.salvar("tamandua001", "pt", SEGMENTOS, modelo="small")
+
+    resposta = cliente.post("/cache/transcricoes/invalidar",
+                            json={"video_id": "tamandua001", "idioma": "pt", "modelo": "small"})
+    assert resposta.get_json() == {"removidas": 1}
+    resultados = cliente.get("/busca?q=tamanduá").get_json()["resultados"]
+    assert [r["video_id"] for r in resultados] == ["tamandua001"]
+
+    cliente.post("/cache/transcricoes/invalidar", json={"video_id": "tamandua001", "idioma": "pt"})
+    assert cliente.get("/busca?q=tamanduá").get_json()["resultados"] == []
+
+# Sem filtros (corpo vazio, inválido ou {}) nada é apagado; limpar tudo exige {"todos": true}
+def test_invalidar_sem_filtros_e_recusado():
+    cliente = app.server.test_client()
+    cache_transcricoes.salvar("tamandua002", "pt", SEGMENTOS, modelo="base")
+
+    assert cliente.post("/cache/transcricoes/invalidar").status_code == 400
+    assert cliente.post("/cache/transcricoes/invalidar", data="{", content_type="application/json").status_code == 400
+    assert cliente.post("/cache/transcricoes/invalidar", json={}).status_code == 400
+    assert cliente.post("/cache/transcricoes/invalidar", json={"todos": "sim"}).status_code == 400
+    assert cache_transcricoes.obter("tamandua002", "pt", "base", registrar=False) == SEGMENTOS
+
+    resposta = cliente.post("/cache/transcricoes/invalidar", json={"todos": True})
+    assert resposta.status_code == 200 and resposta.get_json()["removidas"] >= 1
+    assert cache_transcricoes.obter("tamandua002", "pt", "base", registrar=False) is None
@@ -0,0 +1,25 @@
+from video_transcription_core import costurar_segmentos
+
+# O primeiro trecho termina em 30 s, mas o Whisper emite um segmento em 30,5 s
+# com o começo da fala do trecho seguinte; ele é descartado em vez de ser
+# preso ao fim do trecho, e as palavras não se repetem na emenda
+def test_segmento_depois_do_fim_do_trecho_e_descartado():
+    primeiro = (0.0, 30.0, [
+        {"start": 27.0, "end": 30.0, "text": " fim da primeira frase"},
+        {"start": 30.5, "end": 32.0, "text": " começo da"},
+    ])
+    segundo = (30.0, 60.0, [
+        {"start": 0.3, "end": 2.5, "text": " começo da segunda frase"},
+        {"start": 2.5, "end": 5.0, "text": " e o resto"},
+    ])
+    transcricao = costurar_segmentos([segundo, primeiro])
+    assert [seg["text"] for seg in transcricao] == [
+        " fim da primeira frase", " começo da segunda frase", " e o resto"]
+    assert transcricao[1]["start"] == 30.3
+    texto = "".join(seg["text"] for seg in transcricao)
+    assert texto.count("começo da") == 1
+
+# Segmento que começa dentro do trecho e passa do fim continua, preso ao limite
+def test_segmento_que_passa_do_fim_e_preso_ao_limite():
+    transcricao = costurar_segmentos([(0.0, 30.0, [{"start": 28.0, "end": 31.0, "text": " última"}])])
+    assert transcricao == [{"start": 28.0, "end": 30.0, "text": " última"}]
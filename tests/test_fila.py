@@ -0,0 +1,17 @@
+from video_transcription_core import FilaTranscricao
+
+# Jobs interrompidos no meio do download voltam ao estágio de origem: a
+# playlist volta a ser expandida em vez de virar um vídeo sem video_id
+def test_retomar_devolve_playlist_para_expandir(tmp_path):
+    caminho = str(tmp_path / "fila.sqlite3")
+    fila = FilaTranscricao(caminho, 1, 1)
+    fila.adicionar(["https://www.youtube.com/playlist?list=PLexemplo",
+                    "https://youtu.be/dQw4w9WgXcQ"], "pt")
+    assert fila._reivindicar(["expandir", "pendente"], "baixando")["estagio"] == "expandir"
+    assert fila._reivindicar(["expandir", "pendente"], "baixando")["estagio"] == "pendente"
+
+    reiniciada = FilaTranscricao(caminho, 1, 1)
+    reiniciada._retomar()
+    estagios = {job["url"]: job["estagio"] for job in reiniciada.listar()}
+    assert estagios == {"https://www.youtube.com/playlist?list=PLexemplo": "expandir",
+                        "https://youtu.be/dQw4w9WgXcQ": "pendente"}
@@ -0,0 +1,15 @@
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Importar o núcleo num diretório vazio, sem redirecionar os bancos, não pode
+# criar arquivos: os bancos SQLite só nascem no primeiro uso
+def test_importar_nucleo_nao_cria_arquivos(tmp_path):
+    ambiente = {chave: valor for chave, valor in os.environ.items()
+                if chave not in ("CACHE_TRANSCRICOES_DB", "FILA_DB", "METRICAS_DB", "ARTEFATOS_DIR")}
+    ambiente["PYTHONPATH"] = RAIZ
+    subprocess.run([sys.executable, "-c", "import video_transcription_core"],
+                   check=True, env=ambiente, cwd=tmp_path)
+    assert os.listdir(tmp_path) == []
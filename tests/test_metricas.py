@@ -0,0 +1,39 @@
+import pytest
+
+from video_transcription_core import MetricasPipeline
+
+MB = 1 << 20
+
+pytestmark = pytest.mark.skipif(MetricasPipeline.rss_atual_bytes() is None, reason="sem /proc/self/statm")
+
+def alocar(tamanho):
+    bloco = bytearray(tamanho)
+    bloco[::4096] = b"\x01" * len(bloco[::4096])  # toca as páginas para entrarem no RSS
+    return bloco
+
+# O pico de cada span é o do próprio span, não o maior RSS da vida do processo
+def test_pico_de_rss_e_por_span(tmp_path):
+    metricas = MetricasPipeline(str(tmp_path / "metricas.sqlite3"))
+    with metricas.medir("grande"):
+        bloco = alocar(64 * MB)
+        del bloco
+    with metricas.medir("pequeno"):
+        pass
+    spans = {span["estagio"]: span for span in metricas.spans()}
+    assert spans["grande"]["rss_pico_bytes"] - spans["grande"]["rss_inicio_bytes"] >= 48 * MB
+    assert spans["pequeno"]["rss_pico_bytes"] - spans["pequeno"]["rss_inicio_bytes"] < 16 * MB
+    assert spans["pequeno"]["rss_pico_bytes"] < spans["grande"]["rss_pico_bytes"]
+
+# Um span aninhado que começa depois da alocação não apaga o pico do span de fora
+def test_span_aninhado_preserva_pico_do_externo(tmp_path):
+    metricas = MetricasPipeline(str(tmp_path / "metricas.sqlite3"))
+    with metricas.medir("externo"):
+        bloco = alocar(64 * MB)
+        del bloco
+        with metricas.medir("interno"):
+            pass
+    spans = {span["estagio"]: span for span in metricas.spans()}
+    assert spans["externo"]["rss_pico_bytes"] - spans["externo"]["rss_inicio_bytes"] >= 48 * MB
+    assert spans["interno"]["rss_pico_bytes"] - spans["interno"]["rss_inicio_bytes"] < 16 * MB
+    resumo = metricas.resumo()["estagios"]
+    assert resumo["externo"]["rss_acrescimo_pico_bytes"] >= 48 * MB
@@ -0,0 +1,83 @@
+import multiprocessing
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import video_transcription_core as core
+from video_transcription_core import (
+    ServicoTranscricao, acompanhar_transcricao, cache_transcricoes, encerrar_trabalhador_transcricao,
+    iniciar_trabalhador_transcricao, obter_servico_transcricao,
+)
+
+class ModeloFalso:
+    def __init__(self, latencia_s=0.0):
+        self.latencia_s = latencia_s
+
+    def transcribe(self, audio, language=None, **opcoes):
+        time.sleep(self.latencia_s)
+        duracao = len(audio) / core.TAXA_AMOSTRAGEM
+        return {"segments": [{"start": 0.0, "end": duracao, "text": f" trecho de {duracao:.1f}s"}]}
+
+# Inicializador do trabalhador: troca o Whisper pelo modelo falso no processo dele
+def usar_modelo_falso():
+    core.registro_modelos = core.RegistroModelos(1 << 30, lambda *chave: ModeloFalso())
+
+def audio_silencioso(segundos):
+    return np.zeros(int(segundos * core.TAXA_AMOSTRAGEM), dtype=np.float32)
+
+def transcrever(audio, video_id=None):
+    estados = list(acompanhar_transcricao(audio, "pt", video_id, tamanho_modelo="tiny", intervalo_s=0.01))
+    assert estados[-1]["estado"] == "concluido", estados[-1]["erro"]
+    return [seg for estado in estados for seg in estado["segmentos"]]
+
+# Simula o job de um clique do Dash: um processo filho que se conecta ao trabalhador
+def transcrever_em_filho(fila):
+    fila.put(transcrever(audio_silencioso(60)))
+
+@pytest.fixture
+def trabalhador():
+    servico = iniciar_trabalhador_transcricao(inicializador=usar_modelo_falso)
+    try:
+        yield servico
+    finally:
+        encerrar_trabalhador_transcricao()
+
+# O modelo é carregado uma vez no trabalhador e reaproveitado pelos jobs
+# seguintes, inclusive os de outros processos; as estatísticas vêm de lá
+def test_trabalhador_mantem_modelos_entre_jobs(trabalhador):
+    segmentos = transcrever(audio_silencioso(60), "dQw4w9WgXcQ")
+    assert len(segmentos) == 2 and segmentos[-1]["end"] == 60.0
+    assert cache_transcricoes.obter("dQw4w9WgXcQ", "pt", "tiny", registrar=False) is not None
+
+    fila = multiprocessing.get_context("fork").Queue()
+    filho = multiprocessing.get_context("fork").Process(target=transcrever_em_filho, args=(fila,))
+    filho.start()
+    assert len(fila.get(timeout=30)) == 2
+    filho.join()
+
+    estatisticas = obter_servico_transcricao().estatisticas()
+    assert estatisticas["pid"] != os.getpid()
+    assert estatisticas["misses"] == 1
+    assert estatisticas["hits"] == 3
+    assert estatisticas["jobs_ativos"] == 0
+
+# Abandonar o gerador (job do Dash encerrado) cancela a transcrição no serviço
+def test_abandonar_acompanhamento_cancela_job(monkeypatch):
+    monkeypatch.setattr(core, "registro_modelos", core.RegistroModelos(1 << 30, lambda *chave: ModeloFalso(0.05)))
+    servico = ServicoTranscricao()
+    andamento = acompanhar_transcricao(audio_silencioso(300), "pt", "cancelado00", tamanho_modelo="tiny",
+                                       intervalo_s=0.01, servico=servico)
+    next(andamento)
+    andamento.close()
+    (job,) = servico._jobs.values()
+    for _ in range(100):
+        if job["fim"] is not None:
+            break
+        time.sleep(0.05)
+    assert job["estado"] == "cancelado"
+    assert len(job["segmentos"]) < 10
+    assert cache_transcricoes.obter("cancelado00", "pt", "tiny", registrar=False) is None
+    assert not any(t.name.startswith("transcricao-") for t in threading.enumerate())
@@ -0,0 +1,91 @@
+# CLI sem interface: transcreve um arquivo local ou uma URL do YouTube usando
+# só o núcleo do pipeline (não importa o Dash nem depende do Colab). As
+# legendas são gravadas à medida que cada trecho do áudio é transcrito.
+#
+# Uso:
+#   python video_transcription_cli.py https://youtu.be/cgy9diQA6DM --idioma pt
+#   python video_transcription_cli.py aula.mp3 --formato srt --por-palavra --saida aula.srt
+import argparse
+import os
+import sys
+
+import video_transcription_core as core
+
+# Progresso em stderr para não misturar com a transcrição na saída padrão
+def imprimir_progresso(valor):
+    print(f"\r{valor:5.1f}%", end="", file=sys.stderr, flush=True)
+
+# Transcreve em trechos gravando cada lote de segmentos novos no exportador;
+# devolve a transcrição completa para o cache
+def transcrever_exportando(audio, args, exportador):
+    transcricao = []
+    for novos, segundos, duracao in core.transcrever_audio_stream(audio, args.idioma, args.modelo, args.processos,
+                                                                  palavras=args.por_palavra):
+        transcricao.extend(novos)
+        exportador.escrever(novos)
+        exportador.saida.flush()
+        imprimir_progresso(100 * segundos / max(duracao, 1e-6))
+    return transcricao
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcreve um arquivo de áudio/vídeo ou uma URL do YouTube.")
+    parser.add_argument("entrada", help="caminho de um arquivo local ou URL do YouTube")
+    parser.add_argument("--idioma", default="pt", choices=["pt", "en", "es"])
+    parser.add_argument("--modelo", default=None, help=f"tamanho do modelo Whisper (padrão: {core.MODELO_WHISPER_PADRAO})")
+    parser.add_argument("--processos", type=int, default=None,
+                        help="processos para a transcrição em trechos (padrão: WHISPER_PROCESSOS)")
+    parser.add_argument("--formato", default="txt", choices=core.ExportadorLegendas.FORMATOS)
+    parser.add_argument("--por-palavra", action="store_true",
+                        help="refaz as legendas a partir dos tempos por palavra (transcrição mais lenta)")
+    parser.add_argument("--max-caracteres", type=int, default=42, help="tamanho máximo de cada legenda por palavra")
+    parser.add_argument("--max-duracao", type=float, default=7.0, help="duração máxima, em segundos, de cada legenda por palavra")
+    parser.add_argument("--saida", default=None, help="arquivo de saída (padrão: saída padrão)")
+    args = parser.parse_args(argv)
+
+    video_id, audio, transcricao = None, None, None
+    opcoes = core.opcoes_decodificacao(args.por_palavra)
+    try:
+        if os.path.exists(args.entrada):
+            audio = core.decodificar_audio(args.entrada)
+        else:
+            video_id = core.extrair_video_id(args.entrada)
+            if not video_id:
+                print(f"Entrada inválida: {args.entrada} não é um arquivo nem uma URL do YouTube", file=sys.stderr)
+                return 2
+            transcricao = core.cache_transcricoes.obter(video_id, args.idioma, args.modelo, opcoes)
+            if not transcricao:
+                # O áudio fica reservado no armazém até ser decodificado
+                with core.audio_compactado_em_uso(args.entrada, update_callback=imprimir_progresso) as arquivo:
+                    if not arquivo:
+                        print("\nErro ao baixar o áudio.", file=sys.stderr)
+                        return 1
+                    audio = core.decodificar_audio(arquivo)
+    except Exception as e:
+        print(f"\nErro ao decodificar o áudio: {e}", file=sys.stderr)
+        return 1
+
+    saida = open(args.saida, "w", encoding="utf-8", newline="\n") if args.saida else sys.stdout
+    try:
+        exportador = core.ExportadorLegendas(saida, args.formato, args.por_palavra, args.max_caracteres,
+                                             args.max_duracao)
+        if transcricao:
+            exportador.escrever(transcricao)
+        else:
+            transcricao = transcrever_exportando(audio, args, exportador)
+            if video_id and transcricao:
+                core.cache_transcricoes.salvar(video_id, args.idioma, transcricao, args.modelo, opcoes)
+    except Exception as e:
+        print(f"\nErro na transcrição: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+
+    print(file=sys.stderr)
+    if args.saida:
+        print(f"Transcrição salva em {args.saida} ({len(transcricao)} segmentos, {exportador.legendas} legendas)",
+              file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,3148 @@
+# !pip install openai-whisper yt-dlp torch google-genai google-adk
+# !pip install faster-whisper  # opcional, só para WHISPER_BACKEND=ctranslate2
+# Núcleo do pipeline (download, decodificação, transcrição, cache, fila,
+# análise e agentes) sem o dashboard. torch, whisper, yt-dlp e as SDKs do
+# Google só são importados na primeira função que precisa deles, então o
+# módulo pode ser importado em jobs em lote, testes e na CLI.
+import asyncio
+import hashlib
+import heapq
+import inspect
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+import urllib.parse
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import date
+from multiprocessing.managers import BaseManager
+
+import numpy as np
+
+# Taxa de amostragem esperada pelo Whisper (whisper.audio.SAMPLE_RATE)
+TAXA_AMOSTRAGEM = 16000
+
+# Configuração dos modelos Whisper (tamanhos separados por vírgula em WHISPER_MODELOS_AQUECER)
+MODELO_WHISPER_PADRAO = os.environ.get("WHISPER_MODELO", "base")
+DEVICE_WHISPER = os.environ.get("WHISPER_DEVICE", "cpu")
+DTYPE_WHISPER = os.environ.get("WHISPER_DTYPE", "float32")
+MODELOS_AQUECER = [m.strip() for m in os.environ.get("WHISPER_MODELOS_AQUECER", MODELO_WHISPER_PADRAO).split(",") if m.strip()]
+ORCAMENTO_MEMORIA_MODELOS_MB = int(os.environ.get("WHISPER_ORCAMENTO_MB", "4096"))
+# Backend de inferência: "whisper" (openai-whisper), "whisper-int8" (PyTorch com
+# quantização dinâmica int8, só CPU) ou "ctranslate2" (faster-whisper)
+BACKEND_WHISPER = os.environ.get("WHISPER_BACKEND", "whisper")
+TIPO_COMPUTACAO_CT2 = os.environ.get("WHISPER_CT2_TIPO_COMPUTACAO", "int8")
+# Threads de inferência na CPU (0 mantém o padrão da biblioteca). intra-op: dentro
+# de cada operação; inter-op: operações (ou lotes, no CTranslate2) em paralelo
+THREADS_INTRA_OP = int(os.environ.get("WHISPER_THREADS_INTRA_OP", "0"))
+THREADS_INTER_OP = int(os.environ.get("WHISPER_THREADS_INTER_OP", "0"))
+# Política de modelos: com uma latência alvo (s), chamadas sem modelo explícito usam o
+# maior tamanho da lista cujo tempo estimado para a duração do áudio cabe no alvo
+LATENCIA_ALVO_S = float(os.environ.get("WHISPER_LATENCIA_ALVO_S", "0"))
+MODELOS_POLITICA = [m.strip() for m in os.environ.get("WHISPER_MODELOS_POLITICA", "tiny,base,small,medium").split(",")
+                    if m.strip()]
+
+# Transcrição em trechos paralelos (0 ou 1 processo desativa o modo em trechos)
+PROCESSOS_TRANSCRICAO = int(os.environ.get("WHISPER_PROCESSOS", "0"))
+DURACAO_TRECHO_S = float(os.environ.get("WHISPER_DURACAO_TRECHO_S", "300"))
+CONTEXTO_MULTIPROCESSING = os.environ.get("WHISPER_MP_CONTEXTO", "spawn")
+# Trabalhador de transcrição do servidor: intervalo entre as consultas de
+# andamento dos jobs do Dash e por quanto tempo um job terminado fica disponível
+INTERVALO_CONSULTA_TRABALHADOR_S = float(os.environ.get("WHISPER_INTERVALO_CONSULTA_S", "0.25"))
+RETENCAO_JOBS_TRABALHADOR_S = float(os.environ.get("WHISPER_RETENCAO_JOBS_S", "600"))
+# Opções de decodificação passadas ao Whisper; fazem parte da chave do cache de transcrições.
+# Tempos por palavra custam um alinhamento extra e só são pedidos quando uma exportação precisa deles.
+OPCOES_DECODIFICACAO = {"temperature": 0, "word_timestamps": False}
+CAMINHO_CACHE_TRANSCRICOES = os.environ.get("CACHE_TRANSCRICOES_DB", "./cache_transcricoes.sqlite3")
+# Termos presentes em mais segmentos que isso não são ranqueados por BM25 (custo proporcional às ocorrências):
+# a busca devolve os trechos indexados mais recentemente
+LIMITE_RANQUEAMENTO_BUSCA = int(os.environ.get("BUSCA_LIMITE_RANQUEAMENTO", "50000"))
+
+# Áudios decodificados acima desta duração vão para um arquivo mapeado em memória em vez da RAM
+LIMITE_AUDIO_EM_MEMORIA_S = float(os.environ.get("AUDIO_LIMITE_MEMORIA_S", "1800"))
+
+# Armazém dos áudios baixados: diretório próprio com orçamento de bytes (os menos usados são removidos)
+DIRETORIO_ARTEFATOS = os.environ.get("ARTEFATOS_DIR", "./artefatos_audio")
+ORCAMENTO_ARTEFATOS_MB = int(os.environ.get("ARTEFATOS_ORCAMENTO_MB", "10240"))
+
+# Fila de transcrição em lote: downloads (I/O) e transcrições (CPU) têm limites separados
+CAMINHO_FILA = os.environ.get("FILA_DB", "./fila_transcricao.sqlite3")
+LIMITE_DOWNLOADS_FILA = int(os.environ.get("FILA_LIMITE_DOWNLOADS", "2"))
+LIMITE_TRANSCRICOES_FILA = int(os.environ.get("FILA_LIMITE_TRANSCRICOES", "1"))
+
+# Serviço de análise da transcrição (resumo, sentimento e palavras-chave em uma única requisição)
+BACKEND_ANALISE = os.environ.get("ANALISE_BACKEND", "gemini")  # "gemini" ou "stub" (local, sem rede)
+TIMEOUT_ANALISE_S = float(os.environ.get("ANALISE_TIMEOUT_S", "60"))
+# Acima deste número de tokens o resumo é feito em map-reduce sobre janelas da transcrição
+ORCAMENTO_TOKENS_ANALISE = int(os.environ.get("ANALISE_ORCAMENTO_TOKENS", "24000"))
+DURACAO_JANELA_RESUMO_S = float(os.environ.get("ANALISE_DURACAO_JANELA_S", "600"))
+CONCORRENCIA_ANALISE = int(os.environ.get("ANALISE_CONCORRENCIA", "4"))
+# Sentimento por segmento: "lexico" (local, NumPy) ou "llm" (lotes de segmentos no serviço de análise)
+MODO_SENTIMENTO = os.environ.get("SENTIMENTO_MODO", "lexico")
+TAMANHO_LOTE_SENTIMENTO = int(os.environ.get("SENTIMENTO_TAMANHO_LOTE", "100"))
+
+# Agentes do post: tempo máximo de cada estágio (busca, plano, redação, revisão)
+TIMEOUT_ESTAGIO_POST_S = float(os.environ.get("POST_TIMEOUT_ESTAGIO_S", "120"))
+
+# Tamanho dos trechos da transcrição em streaming exibida no dashboard
+DURACAO_TRECHO_STREAM_S = float(os.environ.get("WHISPER_DURACAO_TRECHO_STREAM_S", "30"))
+
+# Spans de tempo dos estágios do pipeline; os mais antigos são descartados acima de METRICAS_MAX_SPANS
+CAMINHO_METRICAS = os.environ.get("METRICAS_DB", "./metricas_pipeline.sqlite3")
+MAX_SPANS_METRICAS = int(os.environ.get("METRICAS_MAX_SPANS", "20000"))
+
+# Stop words por idioma, compiladas uma única vez em frozensets
+STOP_WORDS = {
+    idioma: frozenset(palavras.split()) for idioma, palavras in {
+        "pt": """a à ao aos as às o os de do da dos das dum duma em no na nos nas num numa para pra pro
+                 com sem que e é ou mas se por pelo pela pelos pelas sobre entre até um uma uns umas
+                 eu tu ele ela nós vós eles elas você vocês me te lhe nos vos lhes meu minha seu sua
+                 nosso nossa isso isto aquilo esse essa este esta aquele aquela ser estar ter haver
+                 foi era são está estão tem têm há vai vou fazer faz muito mais menos também já não
+                 sim como quando onde porque então aqui ali lá só bem tipo coisa gente assim ainda
+                 agora depois antes cada todo toda todos todas outro outra mesmo mesma qual quem vamos""",
+        "en": """the a an and or but if in on at to for of with by from up down about into over after
+                 before is are was were be been being have has had do does did will would can could
+                 should may might must i you he she it we they me him her us them my your his its our
+                 their this that these those what which who whom there here when where why how all
+                 any both each few more most other some such no nor not only own same so than too
+                 very just also now then out off again once really like get got going know yeah okay""",
+        "es": """el la lo los las de del al en y o u que es un una unos unas para con sin por sobre
+                 entre hasta yo tú él ella nosotros vosotros ellos ellas usted ustedes me te se le les
+                 mi tu su nuestro nuestra este esta esto ese esa eso aquel aquella ser estar tener
+                 haber fue era son está están tiene hay va voy hacer hace muy más menos también ya
+                 no sí como cuando donde porque entonces aquí allí solo bien pues cosa así todavía
+                 ahora después antes cada todo toda todos todas otro otra mismo misma cual quien""",
+    }.items()
+}
+TOKENIZADOR_PALAVRAS = re.compile(r"\w+")
+
+# Função para extrair palavra-chave de um texto curto (n-gram mais frequente)
+def extrair_termo_principal(texto, idioma="pt", n_gram=2):
+    stop_words = STOP_WORDS.get(idioma, frozenset())
+    palavras = TOKENIZADOR_PALAVRAS.findall(texto.lower())
+    palavras_filtradas = [p for p in palavras if p not in stop_words and len(p) > 2]
+
+    # Gerar n-grams
+    n_grams = [" ".join(gram) for gram in zip(*(palavras_filtradas[i:] for i in range(n_gram)))]
+    contagem = Counter(n_grams)
+
+    return contagem.most_common(1)[0][0] if contagem else ""
+
+# Léxico de sentimento por idioma: palavras positivas (+1), negativas (-1),
+# negadores (invertem o sinal das duas palavras seguintes) e intensificadores
+# (multiplicam por 1,5 a palavra seguinte)
+LEXICOS_SENTIMENTO = {
+    "pt": {
+        "positivas": """bom boa bons boas ótimo ótima ótimos excelente excelentes incrível incríveis maravilhoso
+            maravilhosa feliz felizes alegria amor adoro adorei gosto gostei legal bacana sucesso ganho ganhar
+            vitória melhor melhores perfeito perfeita fácil eficiente útil positivo positiva sensacional fantástico
+            fantástica lindo linda obrigado obrigada parabéns recomendo eficaz rápido inovador interessante""",
+        "negativas": """ruim ruins péssimo péssima horrível terrível terríveis triste tristes ódio odeio problema
+            problemas erro erros falha falhas difícil fracasso perda perder pior piores lento lenta caro cara
+            chato chata negativo negativa medo raiva preocupação perigo perigoso perigosa crise dor mal errado
+            errada complicado inútil""",
+        "negadores": "não nunca nem jamais nada nenhum nenhuma sem",
+        "intensificadores": "muito muita muitos muitas super extremamente bastante demais totalmente",
+    },
+    "en": {
+        "positivas": """good great excellent amazing awesome wonderful happy joy love loved like liked nice success
+            win winning best better perfect easy efficient useful positive fantastic beautiful thanks thank
+            recommend effective fast innovative interesting brilliant""",
+        "negativas": """bad poor terrible horrible awful sad hate hated problem problems error errors failure fail
+            failed difficult hard loss lose worst worse slow expensive boring negative fear angry worry danger
+            dangerous crisis pain wrong complicated useless""",
+        "negadores": "not no never neither nor nothing none without dont don't isn't wasn't cannot",
+        "intensificadores": "very really super extremely so totally highly",
+    },
+    "es": {
+        "positivas": """bueno buena buenos buenas excelente excelentes increíble maravilloso maravillosa feliz
+            alegría amor encanta gusta genial éxito ganar victoria mejor mejores perfecto perfecta fácil eficiente
+            útil positivo positiva fantástico fantástica hermoso hermosa gracias recomiendo eficaz rápido
+            interesante""",
+        "negativas": """malo mala malos malas pésimo pésima horrible terrible triste odio problema problemas error
+            errores fallo fallos difícil fracaso pérdida perder peor peores lento lenta caro cara aburrido
+            aburrida negativo negativa miedo rabia preocupación peligro peligroso crisis dolor equivocado inútil""",
+        "negadores": "no nunca ni jamás nada ningún ninguna sin",
+        "intensificadores": "muy mucho mucha muchos muchas súper extremadamente bastante totalmente",
+    },
+}
+
+# Motor de sentimento local e vetorizado: tokeniza todos os segmentos de uma
+# vez, converte as palavras em pesos pelo léxico pré-compilado e soma por
+# segmento com NumPy. Milhares de segmentos são pontuados em milissegundos.
+class MotorSentimento:
+    def __init__(self, lexicos=LEXICOS_SENTIMENTO, alfa=4.0):
+        self.alfa = alfa
+        self._pesos = {}
+        for idioma, lexico in lexicos.items():
+            pesos = {}
+            pesos.update({p: 1.0 for p in lexico["positivas"].split()})
+            pesos.update({p: -1.0 for p in lexico["negativas"].split()})
+            self._pesos[idioma] = (
+                pesos,
+                frozenset(lexico["negadores"].split()),
+                frozenset(lexico["intensificadores"].split()),
+            )
+        self._tokenizador = re.compile(r"[\w']+")
+
+    # Notas em [-1, 1] para cada texto, normalizadas como no VADER: x / sqrt(x² + alfa)
+    def pontuar(self, textos, idioma="pt"):
+        pesos, negadores, intensificadores = self._pesos.get(idioma, self._pesos["pt"])
+        tokens, indices = [], []
+        for i, texto in enumerate(textos):
+            palavras = self._tokenizador.findall(texto.lower())
+            tokens.extend(palavras)
+            indices.extend([i] * len(palavras))
+        if not tokens:
+            return np.zeros(len(textos), dtype=np.float32)
+
+        indices = np.asarray(indices)
+        valores = np.fromiter((pesos.get(t, 0.0) for t in tokens), dtype=np.float32, count=len(tokens))
+        negador = np.fromiter((t in negadores for t in tokens), dtype=bool, count=len(tokens))
+        intensificador = np.fromiter((t in intensificadores for t in tokens), dtype=bool, count=len(tokens))
+
+        # Negação e intensificação olham para trás sem atravessar o limite do segmento
+        mesmo_1 = np.r_[False, indices[1:] == indices[:-1]]
+        mesmo_2 = np.r_[False, False, indices[2:] == indices[:-2]]
+        negado = (np.r_[False, negador[:-1]] & mesmo_1) | (np.r_[False, False, negador[:-2]] & mesmo_2)
+        intensificado = np.r_[False, intensificador[:-1]] & mesmo_1
+        valores = np.where(negado, -valores, valores) * np.where(intensificado, 1.5, 1.0)
+
+        soma = np.bincount(indices, weights=valores, minlength=len(textos))
+        return (soma / np.sqrt(soma * soma + self.alfa)).astype(np.float32)
+
+    @staticmethod
+    def rotular(nota, limiar=0.05):
+        if nota > limiar:
+            return "positivo"
+        if nota < -limiar:
+            return "negativo"
+        return "neutro"
+
+motor_sentimento = MotorSentimento()
+
+# Figura da linha do tempo: nota de cada segmento no seu ponto médio e uma
+# média móvel para mostrar a tendência do tom ao longo do vídeo
+def figura_linha_tempo_sentimento(segmentos, notas):
+    notas = np.asarray(notas, dtype=np.float32)
+    if any(seg["end"] for seg in segmentos):
+        x = [(seg["start"] + seg["end"]) / 2 for seg in segmentos]
+        titulo_x = "Tempo (s)"
+    else:
+        x = list(range(len(segmentos)))
+        titulo_x = "Segmento"
+    largura = max(1, len(notas) // 20)
+    tendencia = np.convolve(notas, np.ones(largura) / largura, mode="same") if len(notas) else notas
+    return {
+        "data": [
+            {"x": x, "y": notas.tolist(), "type": "scatter", "mode": "markers", "name": "Segmento",
+             "text": [seg["text"].strip()[:80] for seg in segmentos], "marker": {"size": 5, "opacity": 0.5}},
+            {"x": x, "y": tendencia.tolist(), "type": "scatter", "mode": "lines", "name": "Tendência"},
+        ],
+        "layout": {
+            "title": "Sentimento ao longo do vídeo",
+            "xaxis": {"title": titulo_x},
+            "yaxis": {"title": "Sentimento", "range": [-1.05, 1.05]},
+        },
+    }
+
+# Hosts aceitos como links do YouTube; qualquer outro (inclusive
+# notyoutube.com/embed/...) é recusado
+HOSTS_YOUTUBE = frozenset({"youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com",
+                           "youtube-nocookie.com", "www.youtube-nocookie.com"})
+CAMINHOS_ID_VIDEO = frozenset({"watch", "shorts", "embed", "live", "v", "e"})
+
+# Função para extrair ID do vídeo do URL do YouTube (watch, youtu.be, shorts,
+# embed, live, /v/, domínios m./music./youtube-nocookie e IDs puros)
+def extrair_video_id(url):
+    url = url.strip()
+    if re.fullmatch(r'[\w-]{11}', url):
+        return url
+    if "://" not in url and "%3A%2F%2F" in url.upper():
+        url = urllib.parse.unquote(url)
+    partes = urllib.parse.urlsplit(url if re.match(r'[a-z][a-z0-9+.-]*://', url, re.IGNORECASE) else "https://" + url)
+    host = partes.hostname or ""
+    parametros = urllib.parse.parse_qs(partes.query)
+    caminho = [parte for parte in partes.path.split("/") if parte]
+    candidato = None
+    if host == "youtu.be":
+        candidato = caminho[0] if caminho else None
+    elif host in HOSTS_YOUTUBE and caminho:
+        if caminho[0] == "attribution_link":
+            # Links de redirecionamento trazem o caminho do vídeo codificado em u=
+            destino = parametros.get("u", [""])[0]
+            return extrair_video_id("https://www.youtube.com" + destino) if destino.startswith("/") else None
+        if caminho[0] in CAMINHOS_ID_VIDEO:
+            candidato = caminho[1] if len(caminho) > 1 else None
+            if candidato is None and caminho[0] == "watch":
+                candidato = parametros.get("v", [None])[0]
+    elif host == "consent.youtube.com":
+        # A página de consentimento traz a URL do vídeo codificada em continue=
+        destino = parametros.get("continue", [""])[0]
+        return extrair_video_id(destino) if destino else None
+    if candidato and re.fullmatch(r'[\w-]{11}', candidato):
+        return candidato
+    return None
+
+# URL canônica do vídeo: a mesma para todas as formas de link (shorts, embed,
+# youtu.be, parâmetros extras como t=, si= ou list=, que faria o yt-dlp baixar a playlist)
+def normalizar_url_video(url):
+    video_id = extrair_video_id(url)
+    return f"https://www.youtube.com/watch?v={video_id}" if video_id else None
+
+# Hook do yt-dlp que reporta o download como 0-50% da barra de progresso
+def criar_progress_hook(update_callback):
+    def progress_hook(d):
+        if update_callback:
+            if d['status'] == 'downloading':
+                if d.get('total_bytes_estimate'):
+                    percent = (d['downloaded_bytes'] / d['total_bytes_estimate']) * 50
+                    update_callback(percent)
+                elif d.get('total_bytes'):
+                    percent = (d['downloaded_bytes'] / d['total_bytes']) * 50
+                    update_callback(percent)
+    return progress_hook
+
+# Armazém dos áudios baixados: cada vídeo é baixado uma única vez para um
+# diretório próprio, com orçamento de bytes. O download é feito em um
+# diretório temporário dentro do armazém e movido com os.replace, então
+# nenhum leitor vê um arquivo parcial; uma trava de arquivo por vídeo faz
+# pedidos simultâneos (de threads ou processos: jobs do Dash, fila, CLI)
+# esperarem o download em andamento em vez de repeti-lo. Acima do orçamento
+# os áudios usados há mais tempo são removidos (LRU). O índice e os
+# contadores ficam em SQLite no próprio diretório.
+class ArmazemArtefatos:
+    # Arquivos de trava fixos, compartilhados por hash da chave: não se
+    # acumulam e nunca são apagados (apagar uma trava em uso a quebraria)
+    TRAVAS = 256
+
+    def __init__(self, diretorio, orcamento_bytes):
+        self.diretorio = os.path.abspath(diretorio)
+        self.orcamento_bytes = orcamento_bytes
+        self.caminho = os.path.join(self.diretorio, "artefatos.sqlite3")
+        self._pronto = False
+        self._travas_locais = {}
+        self._condicao = threading.Condition()
+
+    # O diretório e o banco só são criados no primeiro uso
+    def _inicializar(self):
+        if self._pronto:
+            return
+        os.makedirs(os.path.join(self.diretorio, ".travas"), exist_ok=True)
+        with conectar_sqlite(self.caminho) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS artefatos (
+                    chave TEXT PRIMARY KEY,
+                    arquivo TEXT NOT NULL,
+                    bytes INTEGER NOT NULL,
+                    criado_em REAL NOT NULL,
+                    usado_em REAL NOT NULL,
+                    usos INTEGER NOT NULL DEFAULT 0
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_artefatos_usado_em ON artefatos (usado_em)")
+            conn.execute("CREATE TABLE IF NOT EXISTS estatisticas (nome TEXT PRIMARY KEY, valor INTEGER NOT NULL)")
+        # Downloads de processos encerrados no meio (job cancelado, servidor reiniciado)
+        for entrada in os.scandir(self.diretorio):
+            if entrada.name.startswith(".baixando-") and time.time() - entrada.stat().st_mtime > 86400:
+                shutil.rmtree(entrada.path, ignore_errors=True)
+        self._pronto = True
+
+    @staticmethod
+    def _incrementar(conn, nome, valor=1):
+        conn.execute("INSERT INTO estatisticas (nome, valor) VALUES (?, ?) "
+                     "ON CONFLICT(nome) DO UPDATE SET valor = valor + excluded.valor", (nome, valor))
+
+    # Trava por chave, entre processos (flock) e entre threads (cada uma abre o
+    # próprio descritor); sem fcntl, só entre threads do processo. `tipo`
+    # separa a trava de download ("") da de uso ("uso-"): quem consome um
+    # arquivo segura a de uso compartilhada e a evicção tenta a exclusiva, sem
+    # que um consumidor longo atrase downloads de outras chaves da mesma faixa
+    @contextmanager
+    def _trava(self, chave, bloquear=True, tipo="", compartilhada=False):
+        indice = int(hashlib.sha256(chave.encode("utf-8")).hexdigest()[:8], 16) % self.TRAVAS
+        try:
+            import fcntl
+        except ImportError:
+            with self._trava_local(f"{tipo}{indice}", bloquear, compartilhada) as obtida:
+                yield obtida
+            return
+        with open(os.path.join(self.diretorio, ".travas", f"{tipo}{indice:03d}.lock"), "a") as f:
+            modo = fcntl.LOCK_SH if compartilhada else fcntl.LOCK_EX
+            try:
+                fcntl.flock(f, modo | (0 if bloquear else fcntl.LOCK_NB))
+                obtida = True
+            except BlockingIOError:
+                obtida = False
+            try:
+                yield obtida
+            finally:
+                if obtida:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    # O mesmo que o flock, entre threads: ocupantes por trava (-1 = exclusiva)
+    @contextmanager
+    def _trava_local(self, nome, bloquear, compartilhada):
+        with self._condicao:
+            while True:
+                ocupantes = self._travas_locais.get(nome, 0)
+                livre = ocupantes >= 0 if compartilhada else ocupantes == 0
+                if livre or not bloquear:
+                    break
+                self._condicao.wait()
+            if livre:
+                self._travas_locais[nome] = ocupantes + 1 if compartilhada else -1
+        try:
+            yield livre
+        finally:
+            if livre:
+                with self._condicao:
+                    self._travas_locais[nome] = self._travas_locais[nome] - 1 if compartilhada else 0
+                    self._condicao.notify_all()
+
+    # Reserva o artefato da chave enquanto o bloco roda: a evicção pula
+    # arquivos reservados. Quem consome um arquivo do armazém reserva a chave
+    # antes de obtê-lo (produzir/obter) e só solta depois de lê-lo
+    @contextmanager
+    def reservar(self, chave):
+        self._inicializar()
+        with self._trava(chave, tipo="uso-", compartilhada=True):
+            yield
+
+    # Caminho do artefato se ele está no armazém (e no disco), marcando o uso
+    def _consultar(self, conn, chave):
+        linha = conn.execute("SELECT arquivo FROM artefatos WHERE chave = ?", (chave,)).fetchone()
+        if linha is None:
+            return None
+        caminho = os.path.join(self.diretorio, linha[0])
+        if not os.path.exists(caminho):
+            conn.execute("DELETE FROM artefatos WHERE chave = ?", (chave,))
+            return None
+        conn.execute("UPDATE artefatos SET usado_em = ?, usos = usos + 1 WHERE chave = ?", (time.time(), chave))
+        return caminho
+
+    def obter(self, chave):
+        self._inicializar()
+        with conectar_sqlite(self.caminho) as conn:
+            return self._consultar(conn, chave)
+
+    # Devolve o artefato da chave, baixando-o se preciso. `baixar` recebe um
+    # diretório temporário e devolve o arquivo criado nele (ou None). O arquivo
+    # no armazém tem o nome da chave; se a chave não tem extensão, ganha a do
+    # arquivo baixado
+    def produzir(self, chave, baixar):
+        self._inicializar()
+        with conectar_sqlite(self.caminho) as conn:
+            caminho = self._consultar(conn, chave)
+            if caminho:
+                self._incrementar(conn, "hits")
+        if caminho:
+            print(f"Arquivo {caminho} já está no armazém. Usando o arquivo existente.")
+            return caminho
+
+        with self._trava(chave):
+            # Outro pedido pode ter concluído o mesmo download enquanto este esperava
+            # a trava: conta como download compartilhado, não como miss
+            with conectar_sqlite(self.caminho) as conn:
+                caminho = self._consultar(conn, chave)
+                self._incrementar(conn, "downloads_compartilhados" if caminho else "misses")
+            if caminho:
+                return caminho
+            temporario = tempfile.mkdtemp(prefix=".baixando-", dir=self.diretorio)
+            try:
+                arquivo = baixar(temporario)
+                if not arquivo or not os.path.exists(arquivo):
+                    return None
+                nome = chave if os.path.splitext(chave)[1] else chave + os.path.splitext(arquivo)[1]
+                caminho = os.path.join(self.diretorio, nome)
+                os.replace(arquivo, caminho)
+                tamanho = os.path.getsize(caminho)
+                agora = time.time()
+                with conectar_sqlite(self.caminho) as conn:
+                    conn.execute("INSERT OR REPLACE INTO artefatos (chave, arquivo, bytes, criado_em, usado_em) "
+                                 "VALUES (?, ?, ?, ?, ?)", (chave, nome, tamanho, agora, agora))
+                    self._incrementar(conn, "downloads")
+                    self._incrementar(conn, "bytes_baixados", tamanho)
+            finally:
+                shutil.rmtree(temporario, ignore_errors=True)
+        self.evictar(protegida=chave)
+        return caminho
+
+    # Remove os artefatos usados há mais tempo até o total caber no orçamento.
+    # A chave recém-produzida, as que estão sendo baixadas e as reservadas por
+    # algum consumidor não são removidas
+    def evictar(self, protegida=None):
+        self._inicializar()
+        with conectar_sqlite(self.caminho) as conn:
+            total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM artefatos").fetchone()[0]
+            if total <= self.orcamento_bytes:
+                return 0
+            candidatos = conn.execute("SELECT chave, arquivo, bytes FROM artefatos WHERE chave != ? "
+                                      "ORDER BY usado_em", (protegida or "",)).fetchall()
+        removidos = 0
+        for chave, arquivo, tamanho in candidatos:
+            if total <= self.orcamento_bytes:
+                break
+            with self._trava(chave, bloquear=False) as obtida, \
+                    self._trava(chave, bloquear=False, tipo="uso-") as livre:
+                if not obtida or not livre:
+                    continue
+                try:
+                    os.remove(os.path.join(self.diretorio, arquivo))
+                except FileNotFoundError:
+                    pass
+                with conectar_sqlite(self.caminho) as conn:
+                    conn.execute("DELETE FROM artefatos WHERE chave = ?", (chave,))
+                    self._incrementar(conn, "evictados")
+                    self._incrementar(conn, "bytes_evictados", tamanho)
+            total -= tamanho
+            removidos += 1
+        if removidos:
+            print(f"Armazém de áudios: {removidos} arquivos removidos para caber em {self.orcamento_bytes >> 20} MB")
+        return removidos
+
+    def estatisticas(self):
+        self._inicializar()
+        with conectar_sqlite(self.caminho) as conn:
+            contadores = dict(conn.execute("SELECT nome, valor FROM estatisticas").fetchall())
+            entradas, tamanho = conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM artefatos").fetchone()
+        hits = contadores.get("hits", 0)
+        misses = contadores.get("misses", 0)
+        compartilhados = contadores.get("downloads_compartilhados", 0)
+        # Esperar o download de outro pedido também evita baixar de novo
+        evitados = hits + compartilhados
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": evitados / (evitados + misses) if evitados + misses else 0.0,
+            "downloads": contadores.get("downloads", 0),
+            "downloads_compartilhados": compartilhados,
+            "bytes_baixados": contadores.get("bytes_baixados", 0),
+            "evictados": contadores.get("evictados", 0),
+            "bytes_evictados": contadores.get("bytes_evictados", 0),
+            "entradas": entradas,
+            "bytes": tamanho,
+            "orcamento_bytes": self.orcamento_bytes,
+        }
+
+armazem_artefatos = ArmazemArtefatos(DIRETORIO_ARTEFATOS, ORCAMENTO_ARTEFATOS_MB << 20)
+
+# Função para baixar o áudio do YouTube usando yt-dlp, convertido para WAV
+def baixar_audio(url, update_callback=None):
+    video_id = extrair_video_id(url)
+    if not video_id:
+        print("Erro: Não foi possível extrair o ID do vídeo da URL")
+        return None
+
+    def baixar(diretorio):
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'outtmpl': os.path.join(diretorio, video_id),  # Usa o ID do vídeo como nome base
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'wav',
+            }],
+            'progress_hooks': [criar_progress_hook(update_callback)],
+            'overwrite': True,
+        }
+        nome_arquivo = os.path.join(diretorio, f"{video_id}.wav")
+        with metricas.medir("download", formato="wav") as span:
+            try:
+                import yt_dlp
+
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    ydl.download([normalizar_url_video(video_id)])
+
+                # Verifica se o arquivo foi criado com a extensão correta
+                if os.path.exists(nome_arquivo):
+                    span["bytes"] = os.path.getsize(nome_arquivo)
+                    return nome_arquivo
+                else:
+                    print(f"Erro: Arquivo {nome_arquivo} não foi criado")
+                    span["erro"] = "arquivo não criado"
+                    return None
+            except Exception as e:
+                print(f"Erro ao baixar o áudio: {e}")
+                span["erro"] = str(e)
+                return None
+
+    return armazem_artefatos.produzir(f"{video_id}.wav", baixar)
+
+# Função para baixar o áudio sem conversão: mantém o arquivo compactado
+# (webm/m4a) como veio do YouTube, sem o WAV intermediário do FFmpegExtractAudio
+def baixar_audio_compactado(url, update_callback=None):
+    video_id = extrair_video_id(url)
+    if not video_id:
+        print("Erro: Não foi possível extrair o ID do vídeo da URL")
+        return None
+
+    def baixar(diretorio):
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'outtmpl': os.path.join(diretorio, f"{video_id}.%(ext)s"),
+            'progress_hooks': [criar_progress_hook(update_callback)],
+        }
+        with metricas.medir("download", formato="compactado") as span:
+            try:
+                import yt_dlp
+
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    info = ydl.extract_info(normalizar_url_video(video_id), download=True)
+                    nome_arquivo = ydl.prepare_filename(info)
+                if os.path.exists(nome_arquivo):
+                    span["bytes"] = os.path.getsize(nome_arquivo)
+                    span["duracao_audio_s"] = info.get("duration") or 0
+                    return nome_arquivo
+                print(f"Erro: Arquivo {nome_arquivo} não foi criado")
+                span["erro"] = "arquivo não criado"
+                return None
+            except Exception as e:
+                print(f"Erro ao baixar o áudio: {e}")
+                span["erro"] = str(e)
+                return None
+
+    return armazem_artefatos.produzir(video_id, baixar)
+
+# Baixa (ou reaproveita) o áudio compactado e o mantém reservado no armazém
+# enquanto o bloco roda, para a evicção não removê-lo antes de ser decodificado.
+# Produz None se a URL for inválida ou o download falhar.
+@contextmanager
+def audio_compactado_em_uso(url, update_callback=None):
+    video_id = extrair_video_id(url)
+    if not video_id:
+        print("Erro: Não foi possível extrair o ID do vídeo da URL")
+        yield None
+        return
+    with armazem_artefatos.reservar(video_id):
+        yield baixar_audio_compactado(video_id, update_callback)
+
+# Decodifica o áudio uma única vez com ffmpeg direto para float32 mono 16 kHz,
+# o formato que o Whisper espera. Áudios longos são despejados em um arquivo
+# temporário e mapeados em memória (copy-on-write) em vez de ocupar a RAM.
+def decodificar_audio(caminho, taxa=16000, limite_memoria_s=LIMITE_AUDIO_EM_MEMORIA_S, diretorio_temp=None):
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-threads", "0", "-i", caminho,
+        "-f", "f32le", "-ac", "1", "-acodec", "pcm_f32le", "-ar", str(taxa),
+        # Mesmo nível do downmix em s16 usado pelo whisper.load_audio
+        "-rematrix_maxval", "1.0", "-",
+    ]
+    limite_bytes = int(limite_memoria_s * taxa * 4)
+    buffer = bytearray()
+    arquivo = None
+    with metricas.medir("decodificacao", bytes_entrada=os.path.getsize(caminho)) as span:
+        processo = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            while True:
+                bloco = processo.stdout.read(1 << 20)
+                if not bloco:
+                    break
+                if arquivo is None and len(buffer) + len(bloco) > limite_bytes:
+                    arquivo = tempfile.NamedTemporaryFile(suffix=".f32", dir=diretorio_temp, delete=False)
+                    arquivo.write(buffer)
+                    buffer = bytearray()
+                if arquivo is not None:
+                    arquivo.write(bloco)
+                else:
+                    buffer.extend(bloco)
+            erro = processo.stderr.read().decode("utf-8", "replace")
+        finally:
+            processo.stdout.close()
+            processo.stderr.close()
+            retorno = processo.wait()
+            if arquivo is not None:
+                arquivo.close()
+
+        if retorno != 0:
+            if arquivo is not None:
+                os.unlink(arquivo.name)
+            raise RuntimeError(f"Falha ao decodificar {caminho}: {erro.strip()}")
+        bytes_saida = os.path.getsize(arquivo.name) if arquivo is not None else len(buffer)
+        span.update(bytes_saida=bytes_saida, duracao_audio_s=bytes_saida / (4 * taxa),
+                    em_disco=int(arquivo is not None))
+    if arquivo is None:
+        return np.frombuffer(buffer, dtype=np.float32)
+
+    audio = np.memmap(arquivo.name, dtype=np.float32, mode="c")
+    try:
+        # Em sistemas POSIX o mapeamento continua válido depois de remover o arquivo
+        os.unlink(arquivo.name)
+    except OSError:
+        pass
+    return audio
+
+# Opções de decodificação com ou sem tempos por palavra (cada variante tem a sua entrada no cache)
+def opcoes_decodificacao(palavras=False):
+    return dict(OPCOES_DECODIFICACAO, word_timestamps=bool(palavras))
+
+# Converte um segmento do Whisper para o formato guardado no cache, com as palavras quando pedidas
+def converter_segmento(seg, palavras=False):
+    novo = {"start": seg["start"], "end": seg["end"], "text": seg["text"]}
+    if palavras:
+        novo["words"] = [{"start": p["start"], "end": p["end"], "word": p["word"]} for p in seg.get("words", [])]
+    return novo
+
+# Conexão SQLite de curta duração: confirma a transação ao sair do bloco e
+# fecha a conexão, o que permite usar o mesmo banco de várias threads e processos
+@contextmanager
+def conectar_sqlite(caminho):
+    conn = sqlite3.connect(caminho, timeout=30)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+# Base dos componentes com banco SQLite próprio: o esquema e as migrações só
+# rodam na primeira conexão, não na importação do módulo, então importar o
+# núcleo (CLI, benchmarks, testes) não cria arquivos no diretório atual
+class BancoSQLite:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._pronto = False
+        self._lock_esquema = threading.Lock()
+
+    def _criar_esquema(self, conn):
+        raise NotImplementedError
+
+    def _inicializar(self):
+        if self._pronto:
+            return
+        with self._lock_esquema:
+            if not self._pronto:
+                with conectar_sqlite(self.caminho) as conn:
+                    self._criar_esquema(conn)
+                self._pronto = True
+
+    def _conectar(self):
+        self._inicializar()
+        return conectar_sqlite(self.caminho)
+
+# Spans de tempo dos estágios do pipeline. Uso:
+#     with metricas.medir("download", formato="webm") as span:
+#         ...
+#         span["bytes"] = tamanho
+# Cada span guarda duração, sucesso, pico de RSS do processo (e dos filhos) e
+# os atributos preenchidos no bloco; com "duracao_audio_s" o fator de tempo
+# real (rtf) é calculado, e "erro" marca o span como falho sem exceção. Os
+# spans ficam em SQLite porque download e transcrição também rodam nos
+# processos dos background callbacks, do pool e da fila.
+class MetricasPipeline(BancoSQLite):
+    def __init__(self, caminho, max_spans=MAX_SPANS_METRICAS):
+        super().__init__(caminho)
+        self.max_spans = max_spans
+
+    def _criar_esquema(self, conn):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS metricas_spans (
+                id INTEGER PRIMARY KEY,
+                estagio TEXT NOT NULL,
+                inicio REAL NOT NULL,
+                duracao_s REAL NOT NULL,
+                sucesso INTEGER NOT NULL,
+                rss_pico_bytes INTEGER,
+                rss_inicio_bytes INTEGER,
+                rss_delta_bytes INTEGER,
+                pid INTEGER,
+                atributos TEXT NOT NULL
+            )
+        """)
+        # Bancos criados antes das colunas de memória por span
+        colunas = {linha[1] for linha in conn.execute("PRAGMA table_info(metricas_spans)")}
+        for coluna in ("rss_inicio_bytes", "rss_delta_bytes"):
+            if coluna not in colunas:
+                conn.execute(f"ALTER TABLE metricas_spans ADD COLUMN {coluna} INTEGER")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_metricas_inicio ON metricas_spans(inicio)")
+
+    # Memória do span: RSS no início e no fim e o pico durante o span. No Linux
+    # o pico vem do VmHWM, zerado no início de cada span por /proc/self/clear_refs;
+    # como o VmHWM é do processo, antes de zerá-lo o valor atual é repassado aos
+    # spans ainda abertos (aninhados ou em outras threads). Sem clear_refs, o
+    # pico só é conhecido quando o ru_maxrss do processo cresce durante o span.
+    _picos_abertos = {}
+    _lock_picos = threading.Lock()
+
+    # RSS atual do processo (Linux); None em outros sistemas
+    @staticmethod
+    def rss_atual_bytes():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError, AttributeError):
+            return None
+
+    # Maior RSS do processo desde o último clear_refs (Linux); None em outros sistemas
+    @staticmethod
+    def _vm_hwm_bytes():
+        try:
+            with open("/proc/self/status") as f:
+                for linha in f:
+                    if linha.startswith("VmHWM:"):
+                        return int(linha.split()[1]) * 1024
+        except (OSError, ValueError):
+            pass
+        return None
+
+    @staticmethod
+    def _zerar_vm_hwm():
+        try:
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")
+            return True
+        except OSError:
+            return False
+
+    # Maior RSS já atingido pelo processo (ou por um filho já encerrado, como o ffmpeg)
+    @staticmethod
+    def _ru_maxrss_bytes(filhos=False):
+        try:
+            import resource
+        except ImportError:
+            return None
+        # ru_maxrss vem em KiB no Linux e em bytes no macOS
+        fator = 1 if sys.platform == "darwin" else 1024
+        return fator * resource.getrusage(resource.RUSAGE_CHILDREN if filhos else resource.RUSAGE_SELF).ru_maxrss
+
+    # Num filho criado por fork os spans do pai não estão abertos e o lock pode ter sido copiado travado
+    @classmethod
+    def _apos_fork(cls):
+        cls._picos_abertos = {}
+        cls._lock_picos = threading.Lock()
+
+    @classmethod
+    def _abrir_memoria(cls):
+        rss = cls.rss_atual_bytes()
+        marca = object()
+        with cls._lock_picos:
+            pico = cls._vm_hwm_bytes() or 0
+            for aberto in cls._picos_abertos:
+                cls._picos_abertos[aberto] = max(cls._picos_abertos[aberto], pico)
+            zerado = cls._zerar_vm_hwm()
+            cls._picos_abertos[marca] = rss or 0
+        return {"marca": marca, "zerado": zerado, "rss_inicio": rss, "maxrss": cls._ru_maxrss_bytes(),
+                "maxrss_filhos": cls._ru_maxrss_bytes(filhos=True)}
+
+    @classmethod
+    def _fechar_memoria(cls, memoria):
+        rss = cls.rss_atual_bytes()
+        with cls._lock_picos:
+            pico = cls._picos_abertos.pop(memoria["marca"], 0)
+            if memoria["zerado"]:
+                pico = max(pico, cls._vm_hwm_bytes() or 0)
+        maxrss = cls._ru_maxrss_bytes()
+        if not memoria["zerado"] and maxrss is not None and maxrss > (memoria["maxrss"] or 0):
+            pico = max(pico, maxrss)
+        pico = max(pico, rss or 0, memoria["rss_inicio"] or 0) or None
+        resultado = {"rss_inicio_bytes": memoria["rss_inicio"], "rss_pico_bytes": pico,
+                     "rss_delta_bytes": rss - memoria["rss_inicio"] if rss is not None and memoria["rss_inicio"] is not None
+                     else None}
+        # Um filho (ffmpeg, por exemplo) encerrado durante o span bateu um pico novo entre os filhos
+        maxrss_filhos = cls._ru_maxrss_bytes(filhos=True)
+        if maxrss_filhos and maxrss_filhos > (memoria["maxrss_filhos"] or 0):
+            resultado["rss_pico_filhos_bytes"] = maxrss_filhos
+        return resultado
+
+    @contextmanager
+    def medir(self, estagio, **atributos):
+        inicio = time.time()
+        inicio_perf = time.perf_counter()
+        memoria = self._abrir_memoria()
+        sucesso = False
+        try:
+            yield atributos
+            sucesso = True
+        finally:
+            self.registrar(estagio, inicio, time.perf_counter() - inicio_perf, sucesso, atributos,
+                           self._fechar_memoria(memoria))
+
+    # `memoria` vem de _fechar_memoria; sem ela (span medido por fora), a memória fica em branco
+    def registrar(self, estagio, inicio, duracao_s, sucesso=True, atributos=None, memoria=None):
+        atributos = dict(atributos or {})
+        memoria = memoria or {}
+        sucesso = sucesso and not atributos.get("erro")
+        if atributos.get("duracao_audio_s"):
+            atributos["rtf"] = duracao_s / atributos["duracao_audio_s"]
+        if memoria.get("rss_pico_filhos_bytes"):
+            atributos["rss_pico_filhos_bytes"] = memoria["rss_pico_filhos_bytes"]
+        try:
+            with self._conectar() as conn:
+                cursor = conn.execute(
+                    "INSERT INTO metricas_spans (estagio, inicio, duracao_s, sucesso, rss_pico_bytes, rss_inicio_bytes, "
+                    "rss_delta_bytes, pid, atributos) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (estagio, inicio, duracao_s, int(sucesso), memoria.get("rss_pico_bytes"),
+                     memoria.get("rss_inicio_bytes"), memoria.get("rss_delta_bytes"), os.getpid(),
+                     json.dumps(atributos, ensure_ascii=False, default=str)))
+                conn.execute("DELETE FROM metricas_spans WHERE id <= ?", (cursor.lastrowid - self.max_spans,))
+        except sqlite3.Error as e:
+            # Métricas nunca interrompem o pipeline
+            print(f"Erro ao registrar métrica {estagio}: {e}")
+
+    # Agregado por estágio na janela: chamadas, erros, percentis da duração,
+    # memória (maior pico de RSS, maior acréscimo do pico sobre o RSS do início
+    # do span e variação média do RSS) e, para cada atributo numérico, total e média
+    def resumo(self, janela_s=3600):
+        with self._conectar() as conn:
+            linhas = conn.execute(
+                "SELECT estagio, duracao_s, sucesso, rss_pico_bytes, rss_inicio_bytes, rss_delta_bytes, atributos "
+                "FROM metricas_spans WHERE inicio >= ?", (time.time() - janela_s,)).fetchall()
+        por_estagio = {}
+        for estagio, duracao, sucesso, rss, rss_inicio, rss_delta, atributos in linhas:
+            grupo = por_estagio.setdefault(estagio, {"duracoes": [], "erros": 0, "rss": 0, "acrescimo": 0,
+                                                     "deltas": [], "atributos": {}})
+            grupo["duracoes"].append(duracao)
+            grupo["erros"] += not sucesso
+            grupo["rss"] = max(grupo["rss"], rss or 0)
+            if rss is not None and rss_inicio is not None:
+                grupo["acrescimo"] = max(grupo["acrescimo"], rss - rss_inicio)
+            if rss_delta is not None:
+                grupo["deltas"].append(rss_delta)
+            for nome, valor in json.loads(atributos).items():
+                if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                    grupo["atributos"].setdefault(nome, []).append(valor)
+
+        resumo = {}
+        for estagio, grupo in sorted(por_estagio.items()):
+            duracoes = np.array(grupo["duracoes"])
+            p50, p95 = np.percentile(duracoes, [50, 95])
+            resumo[estagio] = {
+                "chamadas": len(duracoes),
+                "erros": grupo["erros"],
+                "total_s": float(duracoes.sum()),
+                "media_s": float(duracoes.mean()),
+                "p50_s": float(p50),
+                "p95_s": float(p95),
+                "max_s": float(duracoes.max()),
+                "rss_pico_bytes": grupo["rss"],
+                "rss_acrescimo_pico_bytes": grupo["acrescimo"],
+                "rss_delta_medio_bytes": float(np.mean(grupo["deltas"])) if grupo["deltas"] else None,
+                "atributos": {nome: {"total": float(np.sum(valores)), "media": float(np.mean(valores))}
+                              for nome, valores in sorted(grupo["atributos"].items())},
+            }
+        return {"janela_s": janela_s, "estagios": resumo}
+
+    # Mediana de um atributo nos últimos spans bem-sucedidos do estágio que
+    # batem com os filtros (por exemplo, o RTF medido de um modelo); None sem dados
+    def mediana_atributo(self, estagio, atributo, limite=50, **filtros):
+        sql = "SELECT json_extract(atributos, ?) FROM metricas_spans WHERE estagio = ? AND sucesso = 1"
+        parametros = [f"$.{atributo}", estagio]
+        for nome, valor in filtros.items():
+            sql += " AND json_extract(atributos, ?) = ?"
+            parametros += [f"$.{nome}", valor]
+        sql += " ORDER BY id DESC LIMIT ?"
+        with self._conectar() as conn:
+            valores = [v for (v,) in conn.execute(sql, parametros + [limite]).fetchall() if v is not None]
+        return float(np.median(valores)) if valores else None
+
+    # Spans mais recentes, do mais novo para o mais antigo
+    def spans(self, limite=50, estagio=None):
+        sql = ("SELECT estagio, inicio, duracao_s, sucesso, rss_pico_bytes, rss_inicio_bytes, rss_delta_bytes, pid, "
+               "atributos FROM metricas_spans")
+        parametros = []
+        if estagio:
+            sql += " WHERE estagio = ?"
+            parametros.append(estagio)
+        sql += " ORDER BY id DESC LIMIT ?"
+        with self._conectar() as conn:
+            linhas = conn.execute(sql, parametros + [limite]).fetchall()
+        return [{"estagio": e, "inicio": i, "duracao_s": d, "sucesso": bool(s), "rss_pico_bytes": r,
+                 "rss_inicio_bytes": ri, "rss_delta_bytes": rd, "pid": p, "atributos": json.loads(a)}
+                for e, i, d, s, r, ri, rd, p, a in linhas]
+
+    def limpar(self):
+        with self._conectar() as conn:
+            return conn.execute("DELETE FROM metricas_spans").rowcount
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=MetricasPipeline._apos_fork)
+
+metricas = MetricasPipeline(CAMINHO_METRICAS)
+
+# Minúsculas sem acentos, como o tokenizador unicode61 com remove_diacritics
+def remover_acentos(texto):
+    return "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+
+# Índice de busca textual (SQLite FTS5) de todos os vídeos transcritos. Cada
+# (vídeo, idioma) guarda só a transcrição mais recente; seus segmentos ocupam
+# uma faixa contínua de rowids, registrada em busca_videos, para que
+# reindexar ou remover um vídeo não precise varrer a tabela FTS. O tokenizador
+# unicode61 sem diacríticos faz "agua" encontrar "água". O BM25 precisa
+# pontuar todas as ocorrências, então consultas cujo termo mais raro aparece em
+# mais de `limite_ranqueamento` segmentos são ordenadas dos mais recentes para
+# os mais antigos, o que o FTS5 resolve sem percorrer tudo.
+class IndiceBusca(BancoSQLite):
+    MARCADOR_INICIO = "\x02"
+    MARCADOR_FIM = "\x03"
+
+    def __init__(self, caminho, limite_ranqueamento=LIMITE_RANQUEAMENTO_BUSCA):
+        super().__init__(caminho)
+        self.limite_ranqueamento = limite_ranqueamento
+
+    def _criar_esquema(self, conn):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS busca_segmentos USING fts5("
+                     "texto, video_id UNINDEXED, idioma UNINDEXED, inicio UNINDEXED, fim UNINDEXED, "
+                     "tokenize = 'unicode61 remove_diacritics 2')")
+        # Em quantos segmentos cada termo aparece, para escolher a ordenação da consulta
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS busca_vocabulario USING fts5vocab(busca_segmentos, 'row')")
+        conn.execute("CREATE TABLE IF NOT EXISTS busca_videos (video_id TEXT NOT NULL, idioma TEXT NOT NULL, "
+                     "primeiro INTEGER NOT NULL, ultimo INTEGER NOT NULL, indexado_em REAL NOT NULL, "
+                     "PRIMARY KEY (video_id, idioma))")
+
+    # Com `conn`, roda na transação de quem chama (o cache de transcrições)
+    def remover(self, video_id, idioma, conn=None):
+        if conn is None:
+            with self._conectar() as conn:
+                return self.remover(video_id, idioma, conn)
+        self._inicializar()
+        faixa = conn.execute("SELECT primeiro, ultimo FROM busca_videos WHERE video_id = ? AND idioma = ?",
+                             (video_id, idioma)).fetchone()
+        if faixa:
+            conn.execute("DELETE FROM busca_segmentos WHERE rowid BETWEEN ? AND ?", faixa)
+            conn.execute("DELETE FROM busca_videos WHERE video_id = ? AND idioma = ?", (video_id, idioma))
+
+    # Substitui os segmentos do vídeo no índice (chamado a cada transcrição salva no cache)
+    def indexar(self, video_id, idioma, segmentos, conn=None):
+        if conn is None:
+            with self._conectar() as conn:
+                return self.indexar(video_id, idioma, segmentos, conn)
+        self._inicializar()
+        self.remover(video_id, idioma, conn)
+        primeiro = conn.execute("SELECT COALESCE(MAX(rowid), 0) + 1 FROM busca_segmentos").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO busca_segmentos (rowid, texto, video_id, idioma, inicio, fim) VALUES (?, ?, ?, ?, ?, ?)",
+            [(primeiro + i, seg["text"], video_id, idioma, seg["start"], seg["end"]) for i, seg in enumerate(segmentos)])
+        conn.execute("INSERT INTO busca_videos (video_id, idioma, primeiro, ultimo, indexado_em) VALUES (?, ?, ?, ?, ?)",
+                     (video_id, idioma, primeiro, primeiro + len(segmentos) - 1, time.time()))
+        return len(segmentos)
+
+    # Separa o texto digitado em termos: cada palavra solta ou trecho entre
+    # aspas. Palavras soltas que são stop words saem, a menos que só haja elas.
+    @staticmethod
+    def separar_termos(texto):
+        termos = [(frase, True) if frase else (palavra, False)
+                  for frase, palavra in re.findall(r'"([^"]+)"|(\S+)', texto or "")]
+        termos = [(t.replace('"', ""), frase) for t, frase in termos if t.replace('"', "").strip()]
+        stop_words = frozenset().union(*STOP_WORDS.values())
+        relevantes = [t for t, frase in termos if frase or t.lower() not in stop_words]
+        return relevantes or [t for t, _ in termos]
+
+    # Consulta FTS5 segura: cada termo vira uma frase entre aspas e todos precisam aparecer
+    @staticmethod
+    def montar_consulta(termos):
+        return " ".join(f'"{termo}"' for termo in termos)
+
+    # Menor número de segmentos em que algum termo da consulta aparece
+    # (para frases, o da palavra mais rara; é um limite superior das ocorrências)
+    def _ocorrencias_estimadas(self, conn, termos):
+        palavras = {p for termo in termos for p in TOKENIZADOR_PALAVRAS.findall(remover_acentos(termo.lower()))}
+        if not palavras:
+            return 0
+        return min((conn.execute("SELECT doc FROM busca_vocabulario WHERE term = ?", (p,)).fetchone() or (0,))[0]
+                   for p in palavras)
+
+    # Trechos mais relevantes (BM25) com vídeo, tempos e o texto com os termos marcados;
+    # para termos muito frequentes, os trechos indexados mais recentemente
+    def buscar(self, texto, idioma=None, limite=20):
+        termos = self.separar_termos(texto)
+        if not termos:
+            return []
+        sql = ("SELECT video_id, idioma, inicio, fim, texto, "
+               f"highlight(busca_segmentos, 0, '{self.MARCADOR_INICIO}', '{self.MARCADOR_FIM}'), bm25(busca_segmentos) "
+               "FROM busca_segmentos WHERE busca_segmentos MATCH ?")
+        parametros = [self.montar_consulta(termos)]
+        if idioma:
+            sql += " AND idioma = ?"
+            parametros.append(idioma)
+        with self._conectar() as conn:
+            if self._ocorrencias_estimadas(conn, termos) > self.limite_ranqueamento:
+                sql += " ORDER BY rowid DESC LIMIT ?"
+            else:
+                sql += " ORDER BY bm25(busca_segmentos) LIMIT ?"
+            linhas = conn.execute(sql, parametros + [limite]).fetchall()
+        return [{"video_id": v, "idioma": i, "start": a, "end": b, "text": t, "destaque": d, "pontuacao": -p}
+                for v, i, a, b, t, d, p in linhas]
+
+    def estatisticas(self):
+        with self._conectar() as conn:
+            videos, segmentos = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(ultimo - primeiro + 1), 0) FROM busca_videos").fetchone()
+        return {"videos": videos, "segmentos": segmentos}
+
+# Cache persistente (SQLite) das listas de segmentos. A chave é o hash de
+# vídeo, idioma, modelo e opções de decodificação, então uma nova requisição
+# do mesmo vídeo não passa pelo yt-dlp nem pelo torch. Os contadores ficam no
+# próprio banco porque os jobs em segundo plano rodam em outros processos.
+class CacheTranscricoes(BancoSQLite):
+    def __init__(self, caminho, indice=None):
+        super().__init__(caminho)
+        self.indice = indice
+
+    def _criar_esquema(self, conn):
+        # O índice é criado antes: a migração abaixo escreve nele pela conexão do cache
+        if self.indice is not None:
+            self.indice._inicializar()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS transcricoes (
+                chave TEXT PRIMARY KEY,
+                video_id TEXT NOT NULL,
+                idioma TEXT NOT NULL,
+                modelo TEXT NOT NULL,
+                opcoes TEXT NOT NULL,
+                segmentos TEXT NOT NULL,
+                criado_em REAL NOT NULL,
+                acessado_em REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_transcricoes_video ON transcricoes (video_id)")
+        conn.execute("CREATE TABLE IF NOT EXISTS estatisticas (nome TEXT PRIMARY KEY, valor INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS resumos_janelas "
+                     "(chave TEXT PRIMARY KEY, resumo TEXT NOT NULL, criado_em REAL NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS resultados_agentes (chave TEXT PRIMARY KEY, "
+                     "estagio TEXT NOT NULL, resultado TEXT NOT NULL, criado_em REAL NOT NULL)")
+        # Um segmento por linha, para o visualizador paginar e buscar sem carregar a transcrição inteira
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS segmentos_transcricao (
+                chave TEXT NOT NULL,
+                indice INTEGER NOT NULL,
+                inicio REAL NOT NULL,
+                fim REAL NOT NULL,
+                texto TEXT NOT NULL,
+                PRIMARY KEY (chave, indice)
+            ) WITHOUT ROWID""")
+        # Transcrições gravadas antes da tabela de segmentos existir
+        pendentes = conn.execute("SELECT chave, segmentos FROM transcricoes WHERE chave NOT IN "
+                                 "(SELECT DISTINCT chave FROM segmentos_transcricao)").fetchall()
+        for chave, segmentos in pendentes:
+            self._gravar_segmentos(conn, chave, json.loads(segmentos))
+        if self.indice is not None:
+            # Vídeos do cache que ainda não estão no índice de busca (a versão mais recente vence)
+            pendentes = conn.execute(
+                "SELECT video_id, idioma, segmentos FROM transcricoes t WHERE NOT EXISTS "
+                "(SELECT 1 FROM busca_videos b WHERE b.video_id = t.video_id AND b.idioma = t.idioma) "
+                "ORDER BY criado_em").fetchall()
+            for video_id, idioma, segmentos in pendentes:
+                self.indice.indexar(video_id, idioma, json.loads(segmentos), conn)
+
+    @staticmethod
+    def calcular_chave(video_id, idioma, modelo, opcoes):
+        conteudo = json.dumps({"video_id": video_id, "idioma": idioma, "modelo": modelo, "opcoes": opcoes},
+                              sort_keys=True)
+        return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+    # Chave com os padrões de modelo e opções aplicados; é o ID usado pelo dashboard
+    def chave(self, video_id, idioma, modelo=None, opcoes=None):
+        return self.calcular_chave(video_id, idioma, identificador_modelo(modelo), opcoes or OPCOES_DECODIFICACAO)
+
+    @staticmethod
+    def _gravar_segmentos(conn, chave, segmentos):
+        conn.execute("DELETE FROM segmentos_transcricao WHERE chave = ?", (chave,))
+        conn.executemany(
+            "INSERT INTO segmentos_transcricao (chave, indice, inicio, fim, texto) VALUES (?, ?, ?, ?, ?)",
+            [(chave, i, seg["start"], seg["end"], seg["text"]) for i, seg in enumerate(segmentos)])
+
+    def _incrementar(self, conn, nome):
+        conn.execute("INSERT INTO estatisticas (nome, valor) VALUES (?, 1) "
+                     "ON CONFLICT(nome) DO UPDATE SET valor = valor + 1", (nome,))
+
+    # registrar=False consulta sem afetar os contadores de hit/miss (uso interno do dashboard)
+    def obter(self, video_id, idioma, modelo=None, opcoes=None, registrar=True):
+        chave = self.chave(video_id, idioma, modelo, opcoes)
+        with self._conectar() as conn:
+            linha = conn.execute("SELECT segmentos FROM transcricoes WHERE chave = ?", (chave,)).fetchone()
+            if not registrar:
+                return json.loads(linha[0]) if linha else None
+            if linha is None:
+                self._incrementar(conn, "misses")
+                return None
+            conn.execute("UPDATE transcricoes SET hits = hits + 1, acessado_em = ? WHERE chave = ?",
+                         (time.time(), chave))
+            self._incrementar(conn, "hits")
+        return json.loads(linha[0])
+
+    def salvar(self, video_id, idioma, segmentos, modelo=None, opcoes=None):
+        modelo = identificador_modelo(modelo)
+        opcoes = opcoes or OPCOES_DECODIFICACAO
+        chave = self.calcular_chave(video_id, idioma, modelo, opcoes)
+        agora = time.time()
+        with self._conectar() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO transcricoes "
+                "(chave, video_id, idioma, modelo, opcoes, segmentos, criado_em, acessado_em, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (chave, video_id, idioma, modelo, json.dumps(opcoes, sort_keys=True),
+                 json.dumps(segmentos, ensure_ascii=False), agora, agora))
+            self._gravar_segmentos(conn, chave, segmentos)
+            if self.indice is not None:
+                self.indice.indexar(video_id, idioma, segmentos, conn)
+        return chave
+
+    # Acesso pelo ID (chave) guardado no dashboard, sem afetar os contadores
+    def obter_por_chave(self, chave):
+        with self._conectar() as conn:
+            linha = conn.execute("SELECT segmentos FROM transcricoes WHERE chave = ?", (chave,)).fetchone()
+        return json.loads(linha[0]) if linha else None
+
+    # Metadados da transcrição: vídeo, idioma, modelo, número de segmentos e duração
+    def descrever(self, chave):
+        with self._conectar() as conn:
+            linha = conn.execute("SELECT video_id, idioma, modelo FROM transcricoes WHERE chave = ?",
+                                 (chave,)).fetchone()
+            if linha is None:
+                return None
+            total, duracao = conn.execute("SELECT COUNT(*), COALESCE(MAX(fim), 0) FROM segmentos_transcricao "
+                                          "WHERE chave = ?", (chave,)).fetchone()
+        return {"video_id": linha[0], "idioma": linha[1], "modelo": linha[2], "segmentos": total, "duracao": duracao}
+
+    # Segmentos [inicio, inicio + quantidade) da transcrição, com o índice de cada um
+    def pagina(self, chave, inicio, quantidade):
+        with self._conectar() as conn:
+            linhas = conn.execute("SELECT indice, inicio, fim, texto FROM segmentos_transcricao "
+                                  "WHERE chave = ? AND indice >= ? ORDER BY indice LIMIT ?",
+                                  (chave, inicio, quantidade)).fetchall()
+        return [{"indice": i, "start": a, "end": b, "text": t} for i, a, b, t in linhas]
+
+    # Busca sem diferenciar maiúsculas (inclusive acentuadas) dentro de uma
+    # transcrição; devolve o total de ocorrências e os primeiros `limite` segmentos
+    def buscar(self, chave, termo, limite=50):
+        termo = termo.strip().lower()
+        if not termo:
+            return 0, []
+        with self._conectar() as conn:
+            conn.create_function("minusculas", 1, str.lower, deterministic=True)
+            filtro = "FROM segmentos_transcricao WHERE chave = ? AND instr(minusculas(texto), ?) > 0"
+            total = conn.execute(f"SELECT COUNT(*) {filtro}", (chave, termo)).fetchone()[0]
+            linhas = conn.execute(f"SELECT indice, inicio, fim, texto {filtro} ORDER BY indice LIMIT ?",
+                                  (chave, termo, limite)).fetchall()
+        return total, [{"indice": i, "start": a, "end": b, "text": t} for i, a, b, t in linhas]
+
+    # Resumos parciais da sumarização map-reduce, indexados pelo hash do texto da janela
+    def obter_resumo_janela(self, chave):
+        with self._conectar() as conn:
+            linha = conn.execute("SELECT resumo FROM resumos_janelas WHERE chave = ?", (chave,)).fetchone()
+        return linha[0] if linha else None
+
+    def salvar_resumo_janela(self, chave, resumo):
+        with self._conectar() as conn:
+            conn.execute("INSERT OR REPLACE INTO resumos_janelas (chave, resumo, criado_em) VALUES (?, ?, ?)",
+                         (chave, resumo, time.time()))
+
+    # Resultado de um estágio do pipeline de post, pela chave (modelo, instrução e entrada do estágio)
+    def obter_resultado_agente(self, chave):
+        with self._conectar() as conn:
+            linha = conn.execute("SELECT resultado FROM resultados_agentes WHERE chave = ?", (chave,)).fetchone()
+        return linha[0] if linha else None
+
+    def salvar_resultado_agente(self, chave, estagio, resultado):
+        with self._conectar() as conn:
+            conn.execute("INSERT OR REPLACE INTO resultados_agentes (chave, estagio, resultado, criado_em) "
+                         "VALUES (?, ?, ?, ?)", (chave, estagio, resultado, time.time()))
+
+    # Remove as entradas que casam com os filtros informados; sem filtros limpa tudo
+    def invalidar(self, video_id=None, idioma=None, modelo=None):
+        filtros = [(coluna, valor) for coluna, valor in
+                   (("video_id", video_id), ("idioma", idioma), ("modelo", modelo)) if valor is not None]
+        where = " AND ".join(f"{coluna} = ?" for coluna, _ in filtros) or "1 = 1"
+        with self._conectar() as conn:
+            afetados = conn.execute(f"SELECT DISTINCT video_id, idioma FROM transcricoes WHERE {where}",
+                                    [v for _, v in filtros]).fetchall()
+            conn.execute(f"DELETE FROM segmentos_transcricao WHERE chave IN (SELECT chave FROM transcricoes WHERE {where})",
+                         [v for _, v in filtros])
+            removidas = conn.execute(f"DELETE FROM transcricoes WHERE {where}", [v for _, v in filtros]).rowcount
+            if self.indice is not None:
+                # O vídeo só sai do índice se não sobrou transcrição dele (de outro
+                # modelo ou opções); senão é reindexado pela mais recente que restou
+                for video, lingua in afetados:
+                    restante = conn.execute("SELECT segmentos FROM transcricoes WHERE video_id = ? AND idioma = ? "
+                                            "ORDER BY criado_em DESC LIMIT 1", (video, lingua)).fetchone()
+                    if restante is None:
+                        self.indice.remover(video, lingua, conn)
+                    else:
+                        self.indice.indexar(video, lingua, json.loads(restante[0]), conn)
+            conn.execute("INSERT INTO estatisticas (nome, valor) VALUES ('invalidacoes', ?) "
+                         "ON CONFLICT(nome) DO UPDATE SET valor = valor + excluded.valor", (removidas,))
+        return removidas
+
+    def estatisticas(self):
+        with self._conectar() as conn:
+            contadores = dict(conn.execute("SELECT nome, valor FROM estatisticas").fetchall())
+            entradas, tamanho = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(segmentos)), 0) FROM transcricoes").fetchone()
+        hits = contadores.get("hits", 0)
+        misses = contadores.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "invalidacoes": contadores.get("invalidacoes", 0),
+            "entradas": entradas,
+            "bytes_segmentos": tamanho,
+        }
+
+indice_busca = IndiceBusca(CAMINHO_CACHE_TRANSCRICOES)
+cache_transcricoes = CacheTranscricoes(CAMINHO_CACHE_TRANSCRICOES, indice_busca)
+
+# Estatísticas de corpus para o TF-IDF das palavras-chave: em quantos vídeos
+# de cada idioma um termo apareceu entre os candidatos. Cada vídeo é contado
+# uma única vez, então reprocessar o mesmo vídeo não distorce as frequências.
+class CorpusPalavrasChave(BancoSQLite):
+    def _criar_esquema(self, conn):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS corpus_documentos "
+                     "(idioma TEXT NOT NULL, video_id TEXT NOT NULL, PRIMARY KEY (idioma, video_id))")
+        conn.execute("CREATE TABLE IF NOT EXISTS corpus_termos (idioma TEXT NOT NULL, termo TEXT NOT NULL, "
+                     "documentos INTEGER NOT NULL, PRIMARY KEY (idioma, termo)) WITHOUT ROWID")
+
+    # Soma os termos do vídeo às frequências; devolve False se o vídeo já estava no corpus
+    def registrar(self, video_id, idioma, termos):
+        with self._conectar() as conn:
+            novo = conn.execute("INSERT OR IGNORE INTO corpus_documentos (idioma, video_id) VALUES (?, ?)",
+                                (idioma, video_id)).rowcount
+            if not novo:
+                return False
+            conn.executemany("INSERT INTO corpus_termos (idioma, termo, documentos) VALUES (?, ?, 1) "
+                             "ON CONFLICT(idioma, termo) DO UPDATE SET documentos = documentos + 1",
+                             [(idioma, termo) for termo in termos])
+        return True
+
+    # Total de vídeos do idioma e frequência de documento de cada termo pedido
+    def frequencias(self, idioma, termos, lote=500):
+        termos = list(termos)
+        frequencias = {}
+        with self._conectar() as conn:
+            total = conn.execute("SELECT COUNT(*) FROM corpus_documentos WHERE idioma = ?", (idioma,)).fetchone()[0]
+            for i in range(0, len(termos), lote):
+                parte = termos[i:i + lote]
+                marcadores = ", ".join("?" * len(parte))
+                frequencias.update(conn.execute(
+                    f"SELECT termo, documentos FROM corpus_termos WHERE idioma = ? AND termo IN ({marcadores})",
+                    [idioma] + parte).fetchall())
+        return total, frequencias
+
+    def estatisticas(self):
+        with self._conectar() as conn:
+            documentos = dict(conn.execute(
+                "SELECT idioma, COUNT(*) FROM corpus_documentos GROUP BY idioma").fetchall())
+            termos = dict(conn.execute("SELECT idioma, COUNT(*) FROM corpus_termos GROUP BY idioma").fetchall())
+        return {"documentos": documentos, "termos": termos}
+
+# Palavras-chave da transcrição inteira: n-grams de 1 a 3 palavras pontuados
+# por TF-IDF (tf sublinear, idf suavizado) contra as estatísticas do corpus.
+# Um n-gram não começa nem termina em stop word, mas pode contê-la no meio
+# ("aprendizado de máquina"). Só os candidatos mais frequentes consultam o
+# banco e entram no corpus, o que limita o custo em transcrições de horas.
+class MotorPalavrasChave:
+    def __init__(self, corpus=None, stop_words=STOP_WORDS, max_n=3, candidatos=2000, tempos_por_termo=5):
+        self.corpus = corpus
+        self.stop_words = stop_words
+        self.max_n = max_n
+        self.candidatos = candidatos
+        self.tempos_por_termo = tempos_por_termo
+
+    def _termos(self, segmentos, idioma):
+        stop_words = self.stop_words.get(idioma, frozenset())
+        termos, indices = [], []
+        for i, seg in enumerate(segmentos):
+            palavras = TOKENIZADOR_PALAVRAS.findall(seg["text"].lower())
+            conteudo = [len(p) > 2 and p not in stop_words and not p.isdigit() for p in palavras]
+            antes = len(termos)
+            for n in range(1, self.max_n + 1):
+                for j in range(len(palavras) - n + 1):
+                    if conteudo[j] and conteudo[j + n - 1]:
+                        termos.append(" ".join(palavras[j:j + n]))
+            indices.extend([i] * (len(termos) - antes))
+        return termos, indices
+
+    # Lista ordenada de {"termo", "pontuacao", "ocorrencias", "tempos"}; com
+    # video_id o vídeo é somado ao corpus antes de calcular o idf
+    def extrair(self, segmentos, idioma="pt", top_n=10, video_id=None):
+        termos, indices = self._termos(segmentos, idioma)
+        if not termos:
+            return []
+        contagem = Counter(termos)
+        # Expressões de 2 ou 3 palavras que aparecem uma única vez costumam ser acaso, não tema
+        elegiveis = [t for t, c in contagem.items() if c > 1 or " " not in t]
+        candidatos = heapq.nlargest(self.candidatos, elegiveis,
+                                    key=lambda t: contagem[t] * (1 + 0.5 * t.count(" ")))
+
+        total, frequencias = 0, {}
+        if self.corpus is not None:
+            if video_id:
+                self.corpus.registrar(video_id, idioma, candidatos)
+            total, frequencias = self.corpus.frequencias(idioma, candidatos)
+
+        pontuacoes = {}
+        for termo in candidatos:
+            idf = np.log((1 + total) / (1 + frequencias.get(termo, 0))) + 1
+            pontuacoes[termo] = (1 + np.log(contagem[termo])) * idf * (1 + 0.5 * termo.count(" "))
+
+        # Descarta termos contidos em (ou que contêm) um termo já escolhido
+        escolhidos = []
+        for termo in sorted(pontuacoes, key=pontuacoes.get, reverse=True):
+            if any(f" {termo} " in f" {e} " or f" {e} " in f" {termo} " for e in escolhidos):
+                continue
+            escolhidos.append(termo)
+            if len(escolhidos) == top_n:
+                break
+
+        tempos = {termo: [] for termo in escolhidos}
+        for termo, i in zip(termos, indices):
+            lista = tempos.get(termo)
+            if lista is not None and len(lista) < self.tempos_por_termo and (not lista or lista[-1] != segmentos[i]["start"]):
+                lista.append(segmentos[i]["start"])
+        return [{"termo": termo, "pontuacao": round(float(pontuacoes[termo]), 4),
+                 "ocorrencias": contagem[termo], "tempos": tempos[termo]} for termo in escolhidos]
+
+motor_palavras_chave = MotorPalavrasChave(CorpusPalavrasChave(CAMINHO_CACHE_TRANSCRICOES))
+
+# Threads de inferência do processo. O PyTorch só aceita mudar os threads
+# inter-op uma vez, antes do primeiro trabalho paralelo; o CTranslate2 recebe
+# os valores ao carregar cada modelo.
+_threads_inferencia = {"intra": THREADS_INTRA_OP, "inter": THREADS_INTER_OP}
+_threads_inter_op_aplicados = False
+
+def configurar_threads(intra=None, inter=None):
+    if intra:
+        _threads_inferencia["intra"] = intra
+    if inter:
+        _threads_inferencia["inter"] = inter
+    if "torch" in sys.modules:
+        _aplicar_threads_torch()
+
+def _aplicar_threads_torch():
+    global _threads_inter_op_aplicados
+    import torch
+
+    if _threads_inferencia["intra"] and torch.get_num_threads() != _threads_inferencia["intra"]:
+        torch.set_num_threads(_threads_inferencia["intra"])
+    if _threads_inferencia["inter"] and not _threads_inter_op_aplicados:
+        _threads_inter_op_aplicados = True
+        try:
+            torch.set_num_interop_threads(_threads_inferencia["inter"])
+        except RuntimeError as e:
+            print(f"Não foi possível definir os threads inter-op: {e}")
+
+# Backends de inferência. Cada um carrega um modelo com a interface de
+# whisper.transcribe(audio, language=..., initial_prompt=..., **opcoes), que
+# devolve {"segments": [{"start", "end", "text", "words"?}]}, então o restante
+# do pipeline não depende do backend.
+class BackendWhisper:
+    nome = "whisper"
+    dtype_padrao = DTYPE_WHISPER
+
+    def carregar(self, tamanho, device, dtype):
+        import torch
+        import whisper
+
+        _aplicar_threads_torch()
+        # Define a precisão correta para FP32 na CPU
+        torch.set_default_dtype(torch.float32)
+        modelo = whisper.load_model(tamanho, device=device)
+        if dtype != "float32":
+            modelo = modelo.to(getattr(torch, dtype))
+        return modelo
+
+# Quantização dinâmica int8 das camadas lineares (a maior parte do custo do
+# encoder e do decoder): pesos em int8, ativações quantizadas em tempo de execução
+class BackendWhisperInt8(BackendWhisper):
+    nome = "whisper-int8"
+    dtype_padrao = "qint8"
+
+    def carregar(self, tamanho, device, dtype):
+        import torch
+        import whisper
+
+        if device != "cpu":
+            raise ValueError("O backend whisper-int8 só roda na CPU")
+        modelo = super().carregar(tamanho, "cpu", "float32")
+        # whisper.model.Linear só converte o dtype dos pesos no forward; em FP32
+        # equivale ao nn.Linear, o único tipo que quantize_dynamic sabe trocar
+        for modulo in modelo.modules():
+            if type(modulo) is whisper.model.Linear:
+                modulo.__class__ = torch.nn.Linear
+        return torch.ao.quantization.quantize_dynamic(modelo, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+# faster-whisper: o mesmo modelo convertido para o CTranslate2, com kernels de
+# CPU otimizados e pesos int8 (ou "int8_float32", "float32", ...)
+class BackendCTranslate2:
+    nome = "ctranslate2"
+    dtype_padrao = TIPO_COMPUTACAO_CT2
+
+    def carregar(self, tamanho, device, dtype):
+        from faster_whisper import WhisperModel
+        from faster_whisper.utils import download_model
+
+        caminho = download_model(tamanho)
+        modelo = WhisperModel(caminho, device=device, compute_type=dtype,
+                              cpu_threads=_threads_inferencia["intra"], num_workers=max(1, _threads_inferencia["inter"]))
+        # Aproximado: os pesos convertidos ficam em float16 no disco
+        bytes_modelo = os.path.getsize(os.path.join(caminho, "model.bin"))
+        return ModeloCTranslate2(modelo, bytes_modelo // 2 if "int8" in dtype else bytes_modelo * 2)
+
+# Adapta o WhisperModel do faster-whisper à interface de whisper.transcribe
+class ModeloCTranslate2:
+    def __init__(self, modelo, bytes_modelo=0):
+        self.modelo = modelo
+        self.bytes_modelo = bytes_modelo
+
+    def tamanho_bytes(self):
+        return self.bytes_modelo
+
+    def transcribe(self, audio, language=None, initial_prompt=None, temperature=0, word_timestamps=False,
+                   **opcoes_ignoradas):
+        # beam_size=1 é a decodificação gulosa do openai-whisper com temperature=0
+        segmentos, info = self.modelo.transcribe(np.asarray(audio, dtype=np.float32), language=language,
+                                                 initial_prompt=initial_prompt, temperature=temperature,
+                                                 word_timestamps=word_timestamps, beam_size=1)
+        convertidos = []
+        for seg in segmentos:
+            novo = {"start": seg.start, "end": seg.end, "text": seg.text}
+            if word_timestamps:
+                novo["words"] = [{"start": p.start, "end": p.end, "word": p.word} for p in seg.words or []]
+            convertidos.append(novo)
+        return {"segments": convertidos, "text": "".join(s["text"] for s in convertidos), "language": info.language}
+
+BACKENDS_INFERENCIA = {b.nome: b for b in (BackendWhisper(), BackendWhisperInt8(), BackendCTranslate2())}
+
+# Nome do modelo guardado no cache de transcrições: o tamanho (ou a política
+# automática, quando há latência alvo) e, fora do backend padrão, o backend
+def identificador_modelo(tamanho=None):
+    nome = tamanho or (f"auto-{LATENCIA_ALVO_S:g}s" if LATENCIA_ALVO_S > 0 else MODELO_WHISPER_PADRAO)
+    return nome if BACKEND_WHISPER == "whisper" else f"{BACKEND_WHISPER}:{nome}"
+
+# RTF aproximado (segundos de inferência por segundo de áudio) de cada tamanho
+# em uma CPU de 8 núcleos; a política prefere o RTF medido nos spans de inferência
+RTF_ESTIMADO = {
+    "whisper": {"tiny": 0.04, "base": 0.08, "small": 0.25, "medium": 0.75, "large-v3": 1.5},
+    "whisper-int8": {"tiny": 0.03, "base": 0.05, "small": 0.15, "medium": 0.4, "large-v3": 0.8},
+    "ctranslate2": {"tiny": 0.015, "base": 0.03, "small": 0.08, "medium": 0.25, "large-v3": 0.5},
+}
+
+# Política de modelos: o maior tamanho da lista (do menor para o maior) cujo
+# tempo estimado, dividido entre os processos, cabe na latência alvo; se nenhum
+# couber, o menor. Sem alvo, o modelo padrão.
+def escolher_modelo(duracao_audio_s, latencia_alvo_s=None, processos=1, backend=None, candidatos=None):
+    latencia_alvo_s = LATENCIA_ALVO_S if latencia_alvo_s is None else latencia_alvo_s
+    backend = backend or BACKEND_WHISPER
+    candidatos = candidatos or MODELOS_POLITICA
+    if latencia_alvo_s <= 0:
+        return MODELO_WHISPER_PADRAO
+    escolhido = candidatos[0]
+    for tamanho in candidatos:
+        rtf = (metricas.mediana_atributo("inferencia", "rtf", modelo=tamanho, backend=backend)
+               or RTF_ESTIMADO.get(backend, {}).get(tamanho))
+        if rtf is not None and duracao_audio_s * rtf / max(1, processos) <= latencia_alvo_s:
+            escolhido = tamanho
+    return escolhido
+
+# Registro de modelos Whisper compartilhado pelo processo: carrega cada
+# (backend, tamanho, device, dtype) uma única vez e descarta o menos usado
+# recentemente quando a soma dos pesos passa do orçamento de memória.
+class RegistroModelos:
+    def __init__(self, orcamento_bytes, carregador=None):
+        self.orcamento_bytes = orcamento_bytes
+        self._carregador = carregador or self._carregar_backend
+        self._modelos = OrderedDict()  # chave -> {"modelo", "bytes", "lock", "em_uso"}
+        self._carregando = {}  # chave -> threading.Lock, evita carregar o mesmo modelo duas vezes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "tempo_carga": {}}
+
+    @staticmethod
+    def _carregar_backend(backend, tamanho, device, dtype):
+        return BACKENDS_INFERENCIA[backend].carregar(tamanho, device, dtype)
+
+    # Bytes dos pesos; o state_dict inclui os pesos int8 empacotados da quantização dinâmica
+    @staticmethod
+    def _tamanho_bytes(modelo):
+        if hasattr(modelo, "tamanho_bytes"):
+            return modelo.tamanho_bytes()
+        try:
+            tensores = []
+            for valor in modelo.state_dict().values():
+                tensores.extend(valor if isinstance(valor, tuple) else [valor])
+            return sum(t.numel() * t.element_size() for t in tensores if hasattr(t, "element_size"))
+        except AttributeError:
+            return 0
+
+    def _obter_entrada(self, chave):
+        with self._lock:
+            entrada = self._modelos.get(chave)
+            if entrada is not None:
+                self._modelos.move_to_end(chave)
+                self._stats["hits"] += 1
+                entrada["em_uso"] += 1
+                return entrada
+            lock_carga = self._carregando.setdefault(chave, threading.Lock())
+
+        with lock_carga:
+            with self._lock:
+                # Outro callback pode ter terminado de carregar enquanto esperávamos
+                entrada = self._modelos.get(chave)
+                if entrada is not None:
+                    self._modelos.move_to_end(chave)
+                    self._stats["hits"] += 1
+                    entrada["em_uso"] += 1
+                    return entrada
+                self._stats["misses"] += 1
+
+            inicio = time.perf_counter()
+            with metricas.medir("carga_modelo", modelo="/".join(chave)) as span:
+                modelo = self._carregador(*chave)
+                span["bytes_modelo"] = self._tamanho_bytes(modelo)
+            duracao = time.perf_counter() - inicio
+            print(f"Modelo Whisper {chave} carregado em {duracao:.2f}s")
+
+            with self._lock:
+                entrada = {"modelo": modelo, "bytes": self._tamanho_bytes(modelo),
+                           "lock": threading.Lock(), "em_uso": 1}
+                self._modelos[chave] = entrada
+                self._stats["tempo_carga"]["/".join(chave)] = duracao
+                self._carregando.pop(chave, None)
+                self._despejar()
+                return entrada
+
+    def _despejar(self):
+        # Chamado com self._lock adquirido; nunca descarta modelos em uso
+        total = sum(e["bytes"] for e in self._modelos.values())
+        for chave in list(self._modelos):
+            if total <= self.orcamento_bytes:
+                break
+            entrada = self._modelos[chave]
+            if entrada["em_uso"] > 0:
+                continue
+            del self._modelos[chave]
+            total -= entrada["bytes"]
+            self._stats["evictions"] += 1
+            print(f"Modelo Whisper {chave} removido da memória (LRU)")
+
+    # Uso: with registro_modelos.usar("base") as modelo: modelo.transcribe(...)
+    # O lock por modelo serializa as inferências, já que o Whisper instala
+    # hooks de kv-cache no próprio modelo durante a decodificação.
+    @contextmanager
+    def usar(self, tamanho=None, device=None, dtype=None, backend=None):
+        backend = backend or BACKEND_WHISPER
+        if backend not in BACKENDS_INFERENCIA:
+            raise ValueError(f"Backend de inferência desconhecido: {backend} (opções: {', '.join(BACKENDS_INFERENCIA)})")
+        chave = (backend, tamanho or MODELO_WHISPER_PADRAO, device or DEVICE_WHISPER,
+                 dtype or BACKENDS_INFERENCIA[backend].dtype_padrao)
+        entrada = self._obter_entrada(chave)
+        try:
+            with entrada["lock"]:
+                yield entrada["modelo"]
+        finally:
+            with self._lock:
+                entrada["em_uso"] -= 1
+                self._despejar()
+
+    def aquecer(self, tamanhos, device=None, dtype=None, backend=None):
+        for tamanho in tamanhos:
+            try:
+                with self.usar(tamanho, device, dtype, backend) as modelo:
+                    # Um segundo de silêncio força a compilação dos kernels antes da primeira requisição
+                    silencio = np.zeros(TAXA_AMOSTRAGEM, dtype=np.float32)
+                    modelo.transcribe(silencio, temperature=0, fp16=False)
+            except Exception as e:
+                print(f"Erro ao aquecer o modelo {tamanho}: {e}")
+
+    def estatisticas(self):
+        with self._lock:
+            total = self._stats["hits"] + self._stats["misses"]
+            return {
+                "hits": self._stats["hits"],
+                "misses": self._stats["misses"],
+                "hit_rate": self._stats["hits"] / total if total else 0.0,
+                "evictions": self._stats["evictions"],
+                "tempo_carga_s": dict(self._stats["tempo_carga"]),
+                "carregados": ["/".join(c) for c in self._modelos],
+                "bytes_em_memoria": sum(e["bytes"] for e in self._modelos.values()),
+                "orcamento_bytes": self.orcamento_bytes,
+            }
+
+registro_modelos = RegistroModelos(ORCAMENTO_MEMORIA_MODELOS_MB * 1024 * 1024)
+
+# Procura cortes em pausas da fala: a cada `duracao_trecho` segundos escolhe o
+# ponto de menor energia dentro de uma janela de busca, para que nenhuma
+# palavra fique dividida entre dois trechos. Retorna os limites em amostras.
+def encontrar_cortes_silencio(audio, taxa=16000, duracao_trecho=DURACAO_TRECHO_S, janela_busca=15.0, quadro=0.02):
+    amostras_quadro = int(taxa * quadro)
+    n_quadros = len(audio) // amostras_quadro
+    if n_quadros == 0 or len(audio) < 2 * duracao_trecho * taxa:
+        return [0, len(audio)]
+
+    quadros = audio[:n_quadros * amostras_quadro].reshape(n_quadros, amostras_quadro)
+    energia = np.sqrt(np.mean(quadros.astype(np.float32) ** 2, axis=1))
+    # Média móvel de ~300 ms para preferir pausas reais a cruzamentos por zero
+    suavizacao = max(1, int(0.3 / quadro))
+    energia = np.convolve(energia, np.ones(suavizacao) / suavizacao, mode="same")
+
+    quadros_trecho = int(duracao_trecho / quadro)
+    quadros_busca = int(janela_busca / quadro)
+    cortes = [0]
+    while cortes[-1] + 2 * quadros_trecho <= n_quadros:
+        alvo = cortes[-1] + quadros_trecho
+        inicio = max(cortes[-1] + quadros_trecho // 2, alvo - quadros_busca)
+        fim = min(n_quadros, alvo + quadros_busca)
+        cortes.append(inicio + int(np.argmin(energia[inicio:fim])))
+    return [c * amostras_quadro for c in cortes] + [len(audio)]
+
+# Acrescenta a `transcricao` os segmentos de um trecho já convertidos para
+# tempos globais, descartando repetições do Whisper na emenda entre trechos
+# e segmentos que começam depois do fim do trecho.
+# Retorna apenas os segmentos efetivamente acrescentados.
+def anexar_segmentos_trecho(transcricao, deslocamento, fim_trecho, segmentos):
+    novos = []
+    for seg in segmentos:
+        texto = seg["text"]
+        if not texto.strip():
+            continue
+        start = deslocamento + seg["start"]
+        # Segmento que começa no fim do trecho ou depois dele é o Whisper
+        # adivinhando o áudio seguinte; essas palavras vêm do próximo trecho
+        if start >= fim_trecho:
+            continue
+        end = min(deslocamento + seg["end"], fim_trecho)
+        if transcricao:
+            anterior = transcricao[-1]
+            if texto.strip() == anterior["text"].strip() and start - anterior["end"] < 1.0:
+                continue
+            start = max(start, anterior["end"])
+            end = max(end, start)
+        novo = {"start": start, "end": end, "text": texto}
+        if "words" in seg:
+            # Palavras no tempo global, presas aos limites do segmento já ajustado
+            novo["words"] = []
+            for p in seg["words"]:
+                inicio_palavra = min(max(deslocamento + p["start"], start), end)
+                fim_palavra = min(max(deslocamento + p["end"], inicio_palavra), end)
+                novo["words"].append({"start": inicio_palavra, "end": fim_palavra, "word": p["word"]})
+        transcricao.append(novo)
+        novos.append(novo)
+    return novos
+
+# Junta os segmentos dos trechos em uma única lista com tempos globais
+def costurar_segmentos(resultados_trechos):
+    transcricao = []
+    for deslocamento, fim_trecho, segmentos in sorted(resultados_trechos, key=lambda r: r[0]):
+        anexar_segmentos_trecho(transcricao, deslocamento, fim_trecho, segmentos)
+    return transcricao
+
+def _inicializar_trabalhador(threads):
+    # Cada processo usa apenas a sua fatia dos núcleos para não disputar CPU com os demais
+    configurar_threads(threads, THREADS_INTER_OP or 1)
+
+# Executado em cada processo do pool; o modelo fica no registro_modelos do próprio processo
+def _transcrever_trecho(audio, deslocamento, idioma, tamanho_modelo, prompt=None, palavras=False):
+    with registro_modelos.usar(tamanho_modelo) as modelo:
+        with metricas.medir("inferencia", modelo=tamanho_modelo or MODELO_WHISPER_PADRAO, backend=BACKEND_WHISPER,
+                            duracao_audio_s=len(audio) / TAXA_AMOSTRAGEM, caracteres_prompt=len(prompt or "")):
+            resultado = modelo.transcribe(audio, language=idioma, fp16=False, **opcoes_decodificacao(palavras),
+                                          initial_prompt=prompt)
+    segmentos = [converter_segmento(seg, palavras) for seg in resultado["segments"]]
+    return deslocamento, deslocamento + len(audio) / TAXA_AMOSTRAGEM, segmentos
+
+# Cada processo do pool devolve, junto com o trecho, as estatísticas do seu
+# registro_modelos, guardadas aqui (pid -> estatísticas) para estatisticas_modelos()
+def _transcrever_trecho_pool(*argumentos):
+    return _transcrever_trecho(*argumentos), os.getpid(), registro_modelos.estatisticas()
+
+def _resultado_trecho_pool(futuro):
+    resultado, pid, estatisticas = futuro.result()
+    _estatisticas_pool[pid] = estatisticas
+    return resultado
+
+_pool_transcricao = None
+_pool_processos = 0
+_pool_lock = threading.Lock()
+_estatisticas_pool = {}
+
+# O pool é mantido entre as requisições para que os modelos já carregados nos processos sejam reaproveitados
+def obter_pool_transcricao(processos):
+    global _pool_transcricao, _pool_processos
+    with _pool_lock:
+        if _pool_transcricao is None or _pool_processos != processos:
+            if _pool_transcricao is not None:
+                _pool_transcricao.shutdown(wait=False)
+                _estatisticas_pool.clear()
+            threads = max(1, (os.cpu_count() or 1) // processos)
+            _pool_transcricao = ProcessPoolExecutor(
+                max_workers=processos,
+                mp_context=multiprocessing.get_context(CONTEXTO_MULTIPROCESSING),
+                initializer=_inicializar_trabalhador,
+                initargs=(threads,),
+            )
+            _pool_processos = processos
+        return _pool_transcricao
+
+def transcrever_em_trechos(audio, idioma, processos, update_callback=None, tamanho_modelo=None, palavras=False):
+    taxa = TAXA_AMOSTRAGEM
+    cortes = encontrar_cortes_silencio(audio, taxa)
+    pool = obter_pool_transcricao(processos)
+    futuros = [
+        pool.submit(_transcrever_trecho_pool, audio[inicio:fim], inicio / taxa, idioma, tamanho_modelo, None,
+                    palavras)
+        for inicio, fim in zip(cortes, cortes[1:])
+    ]
+    print(f"Áudio dividido em {len(futuros)} trechos para {processos} processos")
+    resultados = []
+    for concluidos, futuro in enumerate(as_completed(futuros), 1):
+        resultados.append(_resultado_trecho_pool(futuro))
+        if update_callback:
+            update_callback(50 + 50 * concluidos / len(futuros))
+    return costurar_segmentos(resultados)
+
+# Gerador que transcreve o áudio em trechos curtos e produz, a cada trecho
+# concluído, (segmentos_novos, segundos_processados, duracao_total). No modo
+# sequencial o fim do trecho anterior vai como prompt do seguinte para manter
+# o contexto; com processos > 1 os trechos rodam no pool e saem em ordem.
+def transcrever_audio_stream(nome_arquivo, idioma, tamanho_modelo=None, processos=None,
+                             duracao_trecho=DURACAO_TRECHO_STREAM_S, palavras=False):
+    processos = PROCESSOS_TRANSCRICAO if processos is None else processos
+    taxa = TAXA_AMOSTRAGEM
+    audio = decodificar_audio(nome_arquivo) if isinstance(nome_arquivo, str) else nome_arquivo
+    duracao_total = len(audio) / taxa
+    modelo = tamanho_modelo or escolher_modelo(duracao_total, processos=processos)
+    cortes = encontrar_cortes_silencio(audio, taxa, duracao_trecho=duracao_trecho, janela_busca=duracao_trecho / 4)
+    limites = list(zip(cortes, cortes[1:]))
+    transcricao = []
+
+    # O span inclui o tempo em que o consumidor processa cada lote; se o
+    # gerador for abandonado antes do fim, fica registrado como falho
+    with metricas.medir("transcricao", modelo=modelo, backend=BACKEND_WHISPER, processos=processos,
+                        duracao_audio_s=duracao_total, trechos=len(limites), streaming=1) as span:
+        if processos > 1:
+            pool = obter_pool_transcricao(processos)
+            futuros = [pool.submit(_transcrever_trecho_pool, audio[inicio:fim], inicio / taxa, idioma, modelo,
+                                   None, palavras)
+                       for inicio, fim in limites]
+            resultados = (_resultado_trecho_pool(futuro) for futuro in futuros)
+        else:
+            def resultados_sequenciais():
+                for inicio, fim in limites:
+                    prompt = " ".join(seg["text"] for seg in transcricao[-3:])[-200:] or None
+                    yield _transcrever_trecho(audio[inicio:fim], inicio / taxa, idioma, modelo, prompt, palavras)
+            resultados = resultados_sequenciais()
+
+        for deslocamento, fim_trecho, segmentos in resultados:
+            novos = anexar_segmentos_trecho(transcricao, deslocamento, fim_trecho, segmentos)
+            span["segmentos"] = len(transcricao)
+            yield novos, fim_trecho, duracao_total
+
+# Função para transcrever o áudio usando Whisper (aceita caminho do arquivo ou array 16 kHz).
+# Com video_id, consulta e alimenta o cache persistente de transcrições; com
+# palavras=True cada segmento leva também a lista "words" com os tempos por palavra.
+def transcrever_audio(nome_arquivo, idioma, update_callback=None, tamanho_modelo=None, processos=None, video_id=None,
+                      palavras=False):
+    processos = PROCESSOS_TRANSCRICAO if processos is None else processos
+    opcoes = opcoes_decodificacao(palavras)
+    if video_id:
+        transcricao_formatada = cache_transcricoes.obter(video_id, idioma, tamanho_modelo, opcoes)
+        if transcricao_formatada:
+            if update_callback:
+                update_callback(100)
+            return transcricao_formatada
+    with metricas.medir("transcricao", backend=BACKEND_WHISPER, processos=processos) as span:
+        try:
+            # Decodifica antes para que a decodificação tenha o seu próprio span e o RTF use a duração real
+            audio = decodificar_audio(nome_arquivo) if isinstance(nome_arquivo, str) else nome_arquivo
+            span["duracao_audio_s"] = len(audio) / TAXA_AMOSTRAGEM
+            # Sem modelo explícito, a política escolhe o tamanho pela duração e pela latência alvo
+            span["modelo"] = modelo_nome = tamanho_modelo or escolher_modelo(span["duracao_audio_s"],
+                                                                             processos=processos)
+            if processos > 1:
+                transcricao_formatada = transcrever_em_trechos(audio, idioma, processos, update_callback,
+                                                               modelo_nome, palavras)
+            else:
+                with registro_modelos.usar(modelo_nome) as modelo:
+                    with metricas.medir("inferencia", modelo=modelo_nome, backend=BACKEND_WHISPER,
+                                        duracao_audio_s=span["duracao_audio_s"]):
+                        resultado = modelo.transcribe(audio, language=idioma, **opcoes)
+                transcricao_formatada = [converter_segmento(seg, palavras) for seg in resultado["segments"]]
+            span["segmentos"] = len(transcricao_formatada)
+            if video_id:
+                cache_transcricoes.salvar(video_id, idioma, transcricao_formatada, tamanho_modelo, opcoes)
+            if update_callback:
+                update_callback(100)
+            return transcricao_formatada
+        except Exception as e:
+            print(f"Erro ao transcrever o áudio: {e}")
+            span["erro"] = str(e)
+            return ["Erro na transcrição."]
+
+# Estatísticas do registro de modelos deste processo somadas às dos processos
+# do pool de trechos, cada um com os próprios modelos carregados
+def estatisticas_modelos():
+    processos = {"principal": registro_modelos.estatisticas()}
+    processos.update({f"trecho-{pid}": estatisticas for pid, estatisticas in list(_estatisticas_pool.items())})
+    hits = sum(e["hits"] for e in processos.values())
+    misses = sum(e["misses"] for e in processos.values())
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        "evictions": sum(e["evictions"] for e in processos.values()),
+        "processos": processos,
+    }
+
+# Serviço de transcrição com jobs consultados de forma incremental. No
+# dashboard roda no processo trabalhador do servidor (iniciar_trabalhador_transcricao),
+# dono do registro de modelos e do pool de trechos: os jobs de cada clique só
+# enviam o arquivo e leem o andamento, então os modelos carregados e os
+# processos do pool sobrevivem entre as requisições. Cada transcrição roda em
+# uma thread; progresso(job_id, desde) devolve os segmentos a partir de `desde`.
+class ServicoTranscricao:
+    ESTADOS_FINAIS = ("concluido", "erro", "cancelado")
+
+    def __init__(self, retencao_s=RETENCAO_JOBS_TRABALHADOR_S):
+        self.retencao_s = retencao_s
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._proximo_id = 0
+
+    def iniciar(self, arquivo, idioma, video_id=None, tamanho_modelo=None, processos=None, palavras=False):
+        with self._lock:
+            self._remover_antigos()
+            self._proximo_id += 1
+            job_id = self._proximo_id
+            self._jobs[job_id] = {"estado": "decodificando", "segmentos": [], "segundos": 0.0, "duracao": 0.0,
+                                  "erro": None, "cancelar": False, "fim": None}
+        threading.Thread(target=self._executar, name=f"transcricao-{job_id}", daemon=True,
+                         args=(job_id, arquivo, idioma, video_id, tamanho_modelo, processos, palavras)).start()
+        return job_id
+
+    def _executar(self, job_id, arquivo, idioma, video_id, tamanho_modelo, processos, palavras):
+        job = self._jobs[job_id]
+        estado, erro = "concluido", None
+        try:
+            audio = decodificar_audio(arquivo) if isinstance(arquivo, str) else arquivo
+            with self._lock:
+                job["estado"], job["duracao"] = "transcrevendo", len(audio) / TAXA_AMOSTRAGEM
+            transcricao = []
+            andamento = transcrever_audio_stream(audio, idioma, tamanho_modelo, processos, palavras=palavras)
+            try:
+                for novos, segundos, _ in andamento:
+                    transcricao.extend(novos)
+                    with self._lock:
+                        job["segmentos"].extend(novos)
+                        job["segundos"] = segundos
+                    if job["cancelar"]:
+                        break
+            finally:
+                andamento.close()
+            if job["cancelar"]:
+                estado = "cancelado"
+            elif not transcricao:
+                estado, erro = "erro", "Nenhum segmento transcrito."
+            elif video_id:
+                cache_transcricoes.salvar(video_id, idioma, transcricao, tamanho_modelo, opcoes_decodificacao(palavras))
+        except Exception as e:
+            print(f"Erro ao transcrever o áudio: {e}")
+            estado, erro = "erro", str(e)
+        with self._lock:
+            job.update(estado=estado, erro=erro, fim=time.time())
+
+    def progresso(self, job_id, desde=0):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return {"estado": "erro", "erro": "Job de transcrição desconhecido.", "segmentos": [],
+                        "segundos": 0.0, "duracao": 0.0}
+            return {"estado": job["estado"], "erro": job["erro"], "segmentos": job["segmentos"][desde:],
+                    "segundos": job["segundos"], "duracao": job["duracao"]}
+
+    def cancelar(self, job_id):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id]["cancelar"] = True
+
+    # Chamado pelo cliente depois de ler o estado final; jobs abandonados saem após a retenção
+    def descartar(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job["estado"] in self.ESTADOS_FINAIS:
+                del self._jobs[job_id]
+
+    def _remover_antigos(self):
+        # Chamado com self._lock adquirido
+        limite = time.time() - self.retencao_s
+        for job_id in [j for j, job in self._jobs.items() if job["fim"] is not None and job["fim"] < limite]:
+            del self._jobs[job_id]
+
+    def aquecer(self, tamanhos):
+        registro_modelos.aquecer(tamanhos)
+
+    def estatisticas(self):
+        with self._lock:
+            ativos = sum(1 for job in self._jobs.values() if job["estado"] not in self.ESTADOS_FINAIS)
+        return {**estatisticas_modelos(), "pid": os.getpid(), "jobs_ativos": ativos}
+
+_servico_transcricao_local = None
+_servico_transcricao_lock = threading.Lock()
+
+def _obter_servico_local():
+    global _servico_transcricao_local
+    with _servico_transcricao_lock:
+        if _servico_transcricao_local is None:
+            _servico_transcricao_local = ServicoTranscricao()
+        return _servico_transcricao_local
+
+class GerenciadorTranscricao(BaseManager):
+    pass
+
+GerenciadorTranscricao.register("servico", callable=_obter_servico_local)
+
+# O endereço e a chave do trabalhador vão para o ambiente, herdado pelos
+# processos dos jobs do Dash, que se conectam com obter_servico_transcricao()
+VARIAVEL_ENDERECO_TRABALHADOR = "TRABALHADOR_TRANSCRICAO_ENDERECO"
+VARIAVEL_CHAVE_TRABALHADOR = "TRABALHADOR_TRANSCRICAO_CHAVE"
+_gerenciador_transcricao = None
+_servico_conectado = (None, None)  # (pid, proxy): cada processo abre a própria conexão
+
+# Inicia o processo trabalhador de transcrição do servidor e aquece nele os
+# modelos. Usa "spawn" para não herdar as threads do servidor; o
+# inicializador (opcional) roda no trabalhador antes do primeiro job.
+def iniciar_trabalhador_transcricao(aquecer=(), inicializador=None, argumentos=()):
+    global _gerenciador_transcricao
+    if _gerenciador_transcricao is None:
+        if hasattr(socket, "AF_UNIX"):
+            endereco = os.path.join(tempfile.mkdtemp(prefix="trabalhador_transcricao_"), "socket")
+        else:
+            endereco = ("127.0.0.1", 0)
+        chave = os.urandom(16)
+        gerenciador = GerenciadorTranscricao(address=endereco, authkey=chave, ctx=multiprocessing.get_context("spawn"))
+        gerenciador.start(inicializador, argumentos)
+        os.environ[VARIAVEL_ENDERECO_TRABALHADOR] = json.dumps(gerenciador.address)
+        os.environ[VARIAVEL_CHAVE_TRABALHADOR] = chave.hex()
+        _gerenciador_transcricao = gerenciador
+        print(f"Trabalhador de transcrição iniciado em {gerenciador.address}")
+    servico = obter_servico_transcricao()
+    if aquecer:
+        servico.aquecer(list(aquecer))
+    return servico
+
+def encerrar_trabalhador_transcricao():
+    global _gerenciador_transcricao, _servico_conectado
+    if _gerenciador_transcricao is None:
+        return
+    endereco = _gerenciador_transcricao.address
+    _gerenciador_transcricao.shutdown()
+    _gerenciador_transcricao, _servico_conectado = None, (None, None)
+    os.environ.pop(VARIAVEL_ENDERECO_TRABALHADOR, None)
+    os.environ.pop(VARIAVEL_CHAVE_TRABALHADOR, None)
+    if isinstance(endereco, str):
+        shutil.rmtree(os.path.dirname(endereco), ignore_errors=True)
+
+# Serviço de transcrição deste processo: o do trabalhador do servidor, se
+# houver um em execução, ou uma instância local (CLI, testes, app sem servidor)
+def obter_servico_transcricao():
+    global _servico_conectado
+    endereco = os.environ.get(VARIAVEL_ENDERECO_TRABALHADOR)
+    if not endereco:
+        return _obter_servico_local()
+    with _servico_transcricao_lock:
+        pid, servico = _servico_conectado
+        if pid == os.getpid():
+            return servico
+        endereco = json.loads(endereco)
+        try:
+            gerenciador = GerenciadorTranscricao(address=tuple(endereco) if isinstance(endereco, list) else endereco,
+                                                 authkey=bytes.fromhex(os.environ[VARIAVEL_CHAVE_TRABALHADOR]))
+            gerenciador.connect()
+            servico = gerenciador.servico()
+        except (OSError, EOFError, KeyError, ValueError, multiprocessing.AuthenticationError) as e:
+            print(f"Erro ao conectar ao trabalhador de transcrição ({e}); transcrevendo neste processo")
+            return _obter_servico_local()
+        _servico_conectado = (os.getpid(), servico)
+        return servico
+
+# Gerador que transcreve no serviço e produz o estado a cada consulta:
+# {"estado", "segmentos" (só os novos), "segundos", "duracao", "erro"}. O
+# estado começa em "decodificando" e termina em concluido, erro ou cancelado;
+# se o consumidor abandonar o gerador antes, o job é cancelado.
+def acompanhar_transcricao(arquivo, idioma, video_id=None, tamanho_modelo=None, palavras=False,
+                           intervalo_s=INTERVALO_CONSULTA_TRABALHADOR_S, servico=None):
+    servico = servico or obter_servico_transcricao()
+    job_id = servico.iniciar(arquivo, idioma, video_id, tamanho_modelo, None, palavras)
+    desde, estado = 0, None
+    try:
+        while True:
+            estado = servico.progresso(job_id, desde)
+            desde += len(estado["segmentos"])
+            yield estado
+            if estado["estado"] in ServicoTranscricao.ESTADOS_FINAIS:
+                return
+            time.sleep(intervalo_s)
+    finally:
+        try:
+            if estado is None or estado["estado"] not in ServicoTranscricao.ESTADOS_FINAIS:
+                servico.cancelar(job_id)
+            servico.descartar(job_id)
+        except (OSError, EOFError) as e:
+            print(f"Erro ao encerrar o job de transcrição {job_id}: {e}")
+
+# Expande playlists e canais em URLs de vídeos usando a extração "flat" do
+# yt-dlp, que lista as entradas sem baixar nada. Canais retornam as abas
+# (vídeos, shorts, lives) como sublistas, expandidas recursivamente.
+def expandir_lista(url, profundidade=2):
+    import yt_dlp
+
+    with yt_dlp.YoutubeDL({'extract_flat': 'in_playlist', 'quiet': True, 'skip_download': True}) as ydl:
+        info = ydl.extract_info(url, download=False)
+    urls = []
+    for entrada in info.get('entries') or []:
+        if not entrada:
+            continue
+        url_entrada = entrada.get('url') or entrada.get('webpage_url') or ""
+        video_id = extrair_video_id(url_entrada) or extrair_video_id(entrada.get('id') or "")
+        if video_id:
+            urls.append(f"https://www.youtube.com/watch?v={video_id}")
+        elif url_entrada and profundidade > 0:
+            urls.extend(expandir_lista(url_entrada, profundidade - 1))
+    return urls
+
+# Executado no pool de CPU: decodifica e transcreve o arquivo baixado em um
+# processo próprio, com o registro_modelos daquele processo. O áudio fica
+# reservado no armazém durante a decodificação; se saiu dele (orçamento de
+# bytes) entre o download e este job, é baixado de novo.
+def _transcrever_arquivo_job(video_id, arquivo, idioma, tamanho_modelo):
+    with armazem_artefatos.reservar(video_id):
+        if not os.path.exists(arquivo or ""):
+            arquivo = baixar_audio_compactado(video_id)
+            if not arquivo:
+                raise RuntimeError("Erro ao baixar o áudio.")
+        audio = decodificar_audio(arquivo)
+    transcricao = transcrever_audio(audio, idioma, tamanho_modelo=tamanho_modelo, processos=1)
+    if transcricao and not isinstance(transcricao[0], dict):
+        raise RuntimeError("Erro na transcrição.")
+    return transcricao, len(audio) / TAXA_AMOSTRAGEM
+
+# Fila persistente (SQLite) de transcrições em lote. Cada job passa pelos
+# estágios pendente -> baixando -> baixado -> transcrevendo -> concluido (ou
+# erro); playlists e canais passam de expandir para expandido criando um job
+# por vídeo. Downloads rodam em um pool de threads
+# e transcrições em um pool de processos, cada um com seu limite, então o
+# próximo vídeo é baixado enquanto o atual é transcrito. Ao reiniciar, jobs
+# interrompidos voltam ao último estágio concluído.
+class FilaTranscricao(BancoSQLite):
+    ESTAGIOS = ["expandir", "pendente", "baixando", "baixado", "transcrevendo", "concluido", "expandido", "erro"]
+
+    def __init__(self, caminho, limite_downloads, limite_transcricoes, tamanho_modelo=None):
+        super().__init__(caminho)
+        self.limite_downloads = limite_downloads
+        self.limite_transcricoes = limite_transcricoes
+        self.tamanho_modelo = tamanho_modelo
+        self._pool_io = None
+        self._pool_cpu = None
+        self._em_download = 0
+        self._em_transcricao = 0
+        # Reentrante: um futuro que termina antes do add_done_callback roda o
+        # callback na própria thread do despachante, que já segura o lock
+        self._lock = threading.RLock()
+        self._evento = threading.Event()
+        self._thread = None
+
+    def _criar_esquema(self, conn):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                video_id TEXT,
+                idioma TEXT NOT NULL,
+                estagio TEXT NOT NULL,
+                arquivo_audio TEXT,
+                erro TEXT,
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                criado_em REAL NOT NULL,
+                atualizado_em REAL NOT NULL,
+                baixado_em REAL,
+                concluido_em REAL,
+                duracao_download REAL,
+                duracao_transcricao REAL,
+                duracao_audio REAL,
+                UNIQUE (video_id, idioma)
+            )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_estagio ON jobs (estagio, id)")
+
+    # Aceita uma lista (ou texto com uma URL por linha) de vídeos, shorts,
+    # links embed, playlists e canais. Retorna quantos jobs foram criados.
+    def adicionar(self, urls, idioma):
+        if isinstance(urls, str):
+            urls = urls.split()
+        criados = 0
+        agora = time.time()
+        with self._conectar() as conn:
+            for url in (u.strip() for u in urls):
+                if not url:
+                    continue
+                video_id = extrair_video_id(url)
+                if video_id is None:
+                    conn.execute("INSERT INTO jobs (url, idioma, estagio, criado_em, atualizado_em) "
+                                 "VALUES (?, ?, 'expandir', ?, ?)", (url, idioma, agora, agora))
+                    criados += 1
+                    continue
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO jobs (url, video_id, idioma, estagio, criado_em, atualizado_em) "
+                    "VALUES (?, ?, ?, 'pendente', ?, ?)", (url, video_id, idioma, agora, agora))
+                if cursor.rowcount == 0:
+                    # Vídeo já na fila: só volta a ser processado se tiver falhado
+                    cursor = conn.execute("UPDATE jobs SET estagio = 'pendente', erro = NULL, atualizado_em = ? "
+                                          "WHERE video_id = ? AND idioma = ? AND estagio = 'erro'",
+                                          (agora, video_id, idioma))
+                criados += cursor.rowcount
+        self._evento.set()
+        return criados
+
+    def iniciar(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._retomar()
+            self._pool_io = ThreadPoolExecutor(max_workers=self.limite_downloads, thread_name_prefix="fila-io")
+            self._pool_cpu = ProcessPoolExecutor(
+                max_workers=self.limite_transcricoes,
+                mp_context=multiprocessing.get_context(CONTEXTO_MULTIPROCESSING),
+                initializer=_inicializar_trabalhador,
+                initargs=(max(1, (os.cpu_count() or 1) // self.limite_transcricoes),),
+            )
+            self._thread = threading.Thread(target=self._despachar, name="fila-despachante", daemon=True)
+            self._thread.start()
+
+    # Jobs interrompidos por um reinício voltam ao último estágio concluído;
+    # um áudio já baixado não é baixado de novo
+    def _retomar(self):
+        with self._conectar() as conn:
+            # Playlists e canais (sem video_id) também são reivindicados como 'baixando'
+            conn.execute("UPDATE jobs SET estagio = CASE WHEN video_id IS NULL THEN 'expandir' ELSE 'pendente' END "
+                         "WHERE estagio = 'baixando'")
+            for job_id, arquivo in conn.execute(
+                    "SELECT id, arquivo_audio FROM jobs WHERE estagio IN ('baixado', 'transcrevendo')").fetchall():
+                estagio = "baixado" if arquivo and os.path.exists(arquivo) else "pendente"
+                conn.execute("UPDATE jobs SET estagio = ? WHERE id = ?", (estagio, job_id))
+
+    def _atualizar(self, job_id, **campos):
+        campos["atualizado_em"] = time.time()
+        colunas = ", ".join(f"{coluna} = ?" for coluna in campos)
+        with self._conectar() as conn:
+            conn.execute(f"UPDATE jobs SET {colunas} WHERE id = ?", [*campos.values(), job_id])
+
+    # Passa o job mais antigo de um estágio para o seguinte; o UPDATE
+    # condicional garante que dois despachantes nunca peguem o mesmo job
+    def _reivindicar(self, estagios, proximo):
+        marcadores = ", ".join("?" for _ in estagios)
+        with self._conectar() as conn:
+            while True:
+                linha = conn.execute(
+                    f"SELECT id, url, video_id, idioma, estagio, arquivo_audio FROM jobs "
+                    f"WHERE estagio IN ({marcadores}) ORDER BY id LIMIT 1", estagios).fetchone()
+                if linha is None:
+                    return None
+                cursor = conn.execute("UPDATE jobs SET estagio = ?, tentativas = tentativas + 1, atualizado_em = ? "
+                                      "WHERE id = ? AND estagio = ?", (proximo, time.time(), linha[0], linha[4]))
+                if cursor.rowcount:
+                    chaves = ["id", "url", "video_id", "idioma", "estagio", "arquivo_audio"]
+                    return dict(zip(chaves, linha))
+
+    def _despachar(self):
+        while True:
+            try:
+                self._despachar_pendentes()
+            except Exception as e:
+                print(f"Erro no despachante da fila: {e}")
+            self._evento.wait(1.0)
+            self._evento.clear()
+
+    def _despachar_pendentes(self):
+        with self._lock:
+            while self._em_download < self.limite_downloads:
+                job = self._reivindicar(["expandir", "pendente"], "baixando")
+                if job is None:
+                    break
+                self._em_download += 1
+                futuro = self._pool_io.submit(self._executar_download, job)
+                futuro.add_done_callback(lambda f, job=job: self._download_concluido(job, f))
+            while self._em_transcricao < self.limite_transcricoes:
+                job = self._reivindicar(["baixado"], "transcrevendo")
+                if job is None:
+                    break
+                if not os.path.exists(job["arquivo_audio"] or ""):
+                    # O áudio saiu do armazém (orçamento de bytes) antes da transcrição: baixa de novo
+                    self._atualizar(job["id"], estagio="pendente", arquivo_audio=None)
+                    continue
+                self._em_transcricao += 1
+                inicio = time.perf_counter()
+                futuro = self._pool_cpu.submit(_transcrever_arquivo_job, job["video_id"], job["arquivo_audio"],
+                                               job["idioma"], self.tamanho_modelo)
+                futuro.add_done_callback(
+                    lambda f, job=job, inicio=inicio: self._transcricao_concluida(job, f, inicio))
+
+    def _executar_download(self, job):
+        if job["estagio"] == "expandir":
+            return "expandido", self.adicionar(expandir_lista(job["url"]), job["idioma"])
+        if cache_transcricoes.obter(job["video_id"], job["idioma"], self.tamanho_modelo) is not None:
+            return "concluido", None
+        inicio = time.perf_counter()
+        arquivo = baixar_audio_compactado(job["url"])
+        if not arquivo:
+            raise RuntimeError("Erro ao baixar o áudio.")
+        return "baixado", (arquivo, time.perf_counter() - inicio)
+
+    def _download_concluido(self, job, futuro):
+        try:
+            estagio, resultado = futuro.result()
+            agora = time.time()
+            if estagio == "baixado":
+                arquivo, duracao = resultado
+                self._atualizar(job["id"], estagio="baixado", arquivo_audio=arquivo, baixado_em=agora,
+                                duracao_download=duracao)
+            else:
+                self._atualizar(job["id"], estagio=estagio, concluido_em=agora)
+        except Exception as e:
+            print(f"Erro no job {job['id']} ({job['url']}): {e}")
+            self._atualizar(job["id"], estagio="erro", erro=str(e))
+        finally:
+            with self._lock:
+                self._em_download -= 1
+            self._evento.set()
+
+    def _transcricao_concluida(self, job, futuro, inicio):
+        try:
+            transcricao, duracao_audio = futuro.result()
+            cache_transcricoes.salvar(job["video_id"], job["idioma"], transcricao, self.tamanho_modelo)
+            motor_palavras_chave.extrair(transcricao, job["idioma"], video_id=job["video_id"])
+            self._atualizar(job["id"], estagio="concluido", concluido_em=time.time(),
+                            duracao_transcricao=time.perf_counter() - inicio, duracao_audio=duracao_audio)
+        except Exception as e:
+            print(f"Erro no job {job['id']} ({job['url']}): {e}")
+            self._atualizar(job["id"], estagio="erro", erro=str(e))
+        finally:
+            with self._lock:
+                self._em_transcricao -= 1
+            self._evento.set()
+
+    # Profundidade por estágio e vazão da última janela de tempo: vídeos por
+    # minuto em cada estágio e segundos de áudio transcritos por segundo de CPU
+    def estatisticas(self, janela_s=3600):
+        desde = time.time() - janela_s
+        with self._conectar() as conn:
+            profundidade = dict(conn.execute("SELECT estagio, COUNT(*) FROM jobs GROUP BY estagio").fetchall())
+            baixados, tempo_download = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(duracao_download), 0) FROM jobs WHERE baixado_em >= ?",
+                (desde,)).fetchone()
+            transcritos, tempo_transcricao, audio = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(duracao_transcricao), 0), COALESCE(SUM(duracao_audio), 0) "
+                "FROM jobs WHERE concluido_em >= ? AND duracao_transcricao IS NOT NULL", (desde,)).fetchone()
+        minutos = janela_s / 60
+        return {
+            "profundidade": {estagio: profundidade.get(estagio, 0) for estagio in self.ESTAGIOS},
+            "downloads": {
+                "concluidos": baixados,
+                "por_minuto": baixados / minutos,
+                "duracao_media_s": tempo_download / baixados if baixados else 0.0,
+            },
+            "transcricoes": {
+                "concluidas": transcritos,
+                "por_minuto": transcritos / minutos,
+                "duracao_media_s": tempo_transcricao / transcritos if transcritos else 0.0,
+                "audio_por_segundo": audio / tempo_transcricao if tempo_transcricao else 0.0,
+            },
+            "em_andamento": {"downloads": self._em_download, "transcricoes": self._em_transcricao},
+        }
+
+    def listar(self, limite=20):
+        with self._conectar() as conn:
+            linhas = conn.execute("SELECT id, url, video_id, idioma, estagio, erro, atualizado_em FROM jobs "
+                                  "ORDER BY atualizado_em DESC LIMIT ?", (limite,)).fetchall()
+        chaves = ["id", "url", "video_id", "idioma", "estagio", "erro", "atualizado_em"]
+        return [dict(zip(chaves, linha)) for linha in linhas]
+
+fila_transcricao = FilaTranscricao(CAMINHO_FILA, LIMITE_DOWNLOADS_FILA, LIMITE_TRANSCRICOES_FILA)
+
+# Tempo de legenda HH:MM:SS,mmm (SRT) ou HH:MM:SS.mmm (WebVTT), calculado em milissegundos inteiros
+def formatar_tempo_legenda(segundos, separador=","):
+    ms = max(0, int(round(float(segundos) * 1000)))
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}{separador}{ms % 1000:03d}"
+
+# Reagrupa as palavras de um segmento em legendas de até `max_caracteres`
+# caracteres e `max_duracao_s` segundos. As legendas nunca atravessam o
+# limite do segmento, então podem ser geradas à medida que os segmentos chegam.
+# Segmentos sem a lista "words" viram uma única legenda.
+def ressegmentar_palavras(segmento, max_caracteres=42, max_duracao_s=7.0):
+    if not segmento.get("words"):
+        yield {"start": segmento["start"], "end": segmento["end"], "text": segmento["text"].strip()}
+        return
+    inicio, fim, texto = None, None, ""
+    for p in segmento["words"]:
+        palavra = p["word"].strip()
+        if not palavra:
+            continue
+        candidato = f"{texto} {palavra}" if texto else palavra
+        if texto and (len(candidato) > max_caracteres or p["end"] - inicio > max_duracao_s):
+            yield {"start": inicio, "end": fim, "text": texto}
+            inicio, candidato = None, palavra
+        if inicio is None:
+            inicio = p["start"]
+        fim, texto = p["end"], candidato
+    if texto:
+        yield {"start": inicio, "end": fim, "text": texto}
+
+# Escreve legendas em SRT, WebVTT, JSON Lines ou texto puro à medida que os
+# segmentos são produzidos: cada chamada de `escrever` formata só os segmentos
+# novos e os grava de uma vez no arquivo (ou em qualquer objeto com write).
+# Com por_palavra=True as legendas são refeitas a partir dos tempos por palavra.
+class ExportadorLegendas:
+    FORMATOS = ("srt", "vtt", "jsonl", "txt")
+
+    def __init__(self, saida, formato="srt", por_palavra=False, max_caracteres=42, max_duracao_s=7.0):
+        if formato not in self.FORMATOS:
+            raise ValueError(f"Formato de exportação desconhecido: {formato}")
+        self.saida = saida
+        self.formato = formato
+        self.por_palavra = por_palavra
+        self.max_caracteres = max_caracteres
+        self.max_duracao_s = max_duracao_s
+        self.legendas = 0
+        if formato == "vtt":
+            saida.write("WEBVTT\n\n")
+
+    def escrever(self, segmentos):
+        partes = []
+        for segmento in segmentos:
+            if self.por_palavra:
+                legendas = ressegmentar_palavras(segmento, self.max_caracteres, self.max_duracao_s)
+            else:
+                legendas = ({"start": segmento["start"], "end": segmento["end"], "text": segmento["text"].strip()},)
+            for legenda in legendas:
+                self.legendas += 1
+                if self.formato == "srt":
+                    partes.append(f"{self.legendas}\n{formatar_tempo_legenda(legenda['start'])} --> "
+                                  f"{formatar_tempo_legenda(legenda['end'])}\n{legenda['text']}\n\n")
+                elif self.formato == "vtt":
+                    partes.append(f"{formatar_tempo_legenda(legenda['start'], '.')} --> "
+                                  f"{formatar_tempo_legenda(legenda['end'], '.')}\n{legenda['text']}\n\n")
+                elif self.formato == "jsonl":
+                    partes.append(json.dumps(legenda, ensure_ascii=False) + "\n")
+                else:
+                    partes.append(legenda["text"] + "\n")
+        self.saida.write("".join(partes))
+        return len(partes)
+
+# Exporta uma transcrição completa; sem formato, ele vem da extensão do arquivo
+def exportar_legendas(transcricao, nome_arquivo, formato=None, por_palavra=False, max_caracteres=42, max_duracao_s=7.0):
+    formato = formato or os.path.splitext(nome_arquivo)[1].lstrip(".").lower()
+    try:
+        with open(nome_arquivo, "w", encoding="utf-8", newline="\n") as f:
+            ExportadorLegendas(f, formato, por_palavra, max_caracteres, max_duracao_s).escrever(transcricao)
+        return nome_arquivo
+    except Exception as e:
+        print(f"Erro ao exportar {formato.upper()}: {e}")
+        return None
+
+# Função para exportar transcrição em formato SRT
+def exportar_srt(transcricao, nome_arquivo="legendas.srt"):
+    return exportar_legendas(transcricao, nome_arquivo, "srt")
+
+# Configura o cliente da SDK do Gemini
+# (userdata do Colab quando disponível, senão a variável de ambiente GOOGLE_API_KEY)
+def config_ai():
+    try:
+        from google import genai
+
+        try:
+            from google.colab import userdata
+            api_key = userdata.get('GOOGLE_API_KEY')
+        except ImportError:
+            api_key = os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            print("Erro:4: GOOGLE_API_KEY não encontrada no userdata nem no ambiente.")
+            return None, None
+        os.environ["GOOGLE_API_KEY"] = api_key
+        client = genai.Client()
+        MODEL_ID = "gemini-2.0-flash"
+        return client, MODEL_ID
+    except Exception as e:
+        print(f"Erro ao configurar a API do Gemini: {str(e)}")
+        return None, None
+
+# Função auxiliar para chamar agentes. Com ANALISE_BACKEND=stub a resposta
+# vem do backend local, sem ADK nem rede, para benchmarks offline
+def call_agent(name, description, topico, subject, instrucao, model_id, client, tools=False):
+    message_text = f"Tópico: {topico}-{subject}"
+    with metricas.medir("agente", agente=name, ferramentas=int(tools),
+                        caracteres_prompt=len(instrucao) + len(message_text)) as span:
+        try:
+            if BACKEND_ANALISE == "stub":
+                backend = BackendStub()
+                time.sleep(backend.latencia_s(estimar_tokens(instrucao + message_text)))
+                final_response, uso = backend.responder(instrucao, message_text)
+                span.update(uso)
+            else:
+                from google.adk.agents import Agent
+                from google.adk.runners import Runner
+                from google.adk.sessions import InMemorySessionService
+                from google.adk.tools import google_search
+                from google.genai import types
+
+                agent = Agent(name=name, model=model_id, description=description, instruction=instrucao)
+                agent.tools = [google_search] if tools else []
+                session_service = InMemorySessionService()
+                session = session_service.create_session(app_name=agent.name, user_id="user1", session_id="session1")
+                if inspect.isawaitable(session):
+                    session = asyncio.run(session)
+                runner = Runner(agent=agent, app_name=agent.name, session_service=session_service)
+                content = types.Content(role="user", parts=[types.Part(text=message_text)])
+                final_response = ""
+                for event in runner.run(user_id="user1", session_id="session1", new_message=content):
+                    uso = getattr(event, "usage_metadata", None)
+                    if uso:
+                        span["tokens_prompt"] = span.get("tokens_prompt", 0) + (uso.prompt_token_count or 0)
+                        span["tokens_resposta"] = span.get("tokens_resposta", 0) + (uso.candidates_token_count or 0)
+                    if event.is_final_response():
+                        for part in event.content.parts:
+                            if part.text is not None:
+                                final_response += part.text + "\n"
+            span["caracteres_resposta"] = len(final_response)
+            if not final_response.strip():
+                print(f"Agente {name} retornou resposta vazia para o tópico: {topico}")
+                span["erro"] = "resposta vazia"
+            return final_response
+        except Exception as e:
+            print(f"Erro no agente {name}: {str(e)}")
+            span["erro"] = str(e)
+            return ""
+
+# Agente Resumidor
+def agente_resumidor(texto, model_id, client):
+    name = "agente_resumidor"
+    description = "Agente que gera resumos concisos de textos."
+    instruction = """
+    Gere um resumo conciso do texto fornecido, destacando os pontos principais em até 100 palavras.
+    """
+    subject = f"Texto a ser resumido: {texto}"
+    resumo = call_agent(name, description, "resumo", subject, instruction, model_id, client, tools=False)
+    return resumo
+
+# Agente Analisador de Sentimentos
+def agente_analisador_sentimentos(texto, model_id, client):
+    name = "agente_analisador_sentimentos"
+    description = "Agente que analisa o sentimento geral de um texto."
+    instruction = """
+    Analise o sentimento geral do texto fornecido e classifique-o como 'positivo', 'negativo' ou 'neutro'.
+    Forneça apenas a classificação do sentimento.
+    """
+    subject = f"Texto a ser analisado: {texto}"
+    sentimento = call_agent(name, description, "sentimento", subject, instruction, model_id, client, tools=False)
+    return sentimento
+
+# Estimativa grosseira de tokens (~4 caracteres por token), usada pelo backend stub
+def estimar_tokens(texto):
+    return max(1, len(texto) // 4)
+
+INSTRUCAO_ANALISE = """
+Você analisa transcrições de vídeos. Responda apenas com o JSON pedido, no idioma "{idioma}":
+- resumo: resumo conciso destacando os pontos principais em até 100 palavras;
+- sentimento: sentimento geral do texto, 'positivo', 'negativo' ou 'neutro';
+- palavras_chave: até 5 termos curtos (1 a 3 palavras) que melhor representam o tema, do mais ao menos relevante.
+"""
+
+ESQUEMA_ANALISE = {
+    "type": "OBJECT",
+    "properties": {
+        "resumo": {"type": "STRING"},
+        "sentimento": {"type": "STRING", "enum": ["positivo", "negativo", "neutro"]},
+        "palavras_chave": {"type": "ARRAY", "items": {"type": "STRING"}},
+    },
+    "required": ["resumo", "sentimento", "palavras_chave"],
+}
+
+INSTRUCAO_RESUMO_JANELA = """
+Você recebe um trecho de uma transcrição de vídeo, identificado pelo intervalo de tempo. Resuma os pontos
+principais do trecho em até 80 palavras, no idioma "{idioma}", sem introduções.
+"""
+
+INSTRUCAO_SENTIMENTO_LOTE = """
+Você recebe trechos numerados de uma transcrição de vídeo no idioma "{idioma}". Para cada trecho, dê uma nota de
+sentimento entre -1 (muito negativo) e 1 (muito positivo), com 0 para neutro. Responda apenas com um array JSON de
+números, um por trecho, na mesma ordem.
+"""
+
+ESQUEMA_SENTIMENTO_LOTE = {"type": "ARRAY", "items": {"type": "NUMBER"}}
+
+INSTRUCAO_REDUCAO = """
+Você recebe resumos parciais e consecutivos de uma transcrição de vídeo, cada um com seu intervalo de tempo.
+Considere-os como o texto completo do vídeo.
+""" + INSTRUCAO_ANALISE
+
+def formatar_tempo(segundos):
+    segundos = int(segundos or 0)
+    return f"{segundos // 3600:02d}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}"
+
+# Segmentos sem tempo a partir de texto puro (uma "frase" por segmento)
+def segmentos_de_texto(texto):
+    return [{"start": 0.0, "end": 0.0, "text": frase}
+            for frase in re.split(r'(?<=[.!?])\s+', texto) if frase.strip()]
+
+def _montar_janela(segmentos):
+    return {
+        "inicio": segmentos[0]["start"],
+        "fim": segmentos[-1]["end"],
+        "texto": " ".join(seg["text"].strip() for seg in segmentos),
+    }
+
+# Segmento maior que o orçamento (texto puro sem pontuação vira um segmento
+# só) é quebrado por palavras, com os tempos repartidos proporcionalmente ao texto
+def quebrar_segmento(seg, orcamento_tokens):
+    if estimar_tokens(seg["text"]) <= orcamento_tokens:
+        return [seg]
+    # Maior texto com estimar_tokens(texto) <= orcamento_tokens
+    limite = 4 * (orcamento_tokens + 1) - 1
+    partes, atual, tamanho = [], [], 0
+    for palavra in seg["text"].split():
+        if atual and tamanho + 1 + len(palavra) > limite:
+            partes.append(" ".join(atual))
+            atual, tamanho = [], 0
+        tamanho += len(palavra) + (1 if atual else 0)
+        atual.append(palavra)
+    if atual:
+        partes.append(" ".join(atual))
+    inicio = seg["start"] or 0.0
+    duracao = (seg["end"] or 0.0) - inicio
+    total = sum(len(parte) for parte in partes)
+    quebrados, acumulado = [], 0
+    for parte in partes:
+        inicio_parte = inicio + duracao * acumulado / total
+        acumulado += len(parte)
+        quebrados.append({"start": inicio_parte, "end": inicio + duracao * acumulado / total, "text": " " + parte})
+    return quebrados
+
+# Divide os segmentos em janelas alinhadas aos tempos: primeiro por uma grade
+# fixa de `duracao_janela_s` segundos (assim editar um segmento só muda a sua
+# janela) e depois, dentro de cada célula, pelo orçamento de tokens
+def dividir_janelas(segmentos, orcamento_tokens=ORCAMENTO_TOKENS_ANALISE, duracao_janela_s=DURACAO_JANELA_RESUMO_S):
+    celulas = OrderedDict()
+    for seg in (parte for seg in segmentos for parte in quebrar_segmento(seg, orcamento_tokens)):
+        celulas.setdefault(int((seg["start"] or 0) // duracao_janela_s), []).append(seg)
+    janelas = []
+    for celula in celulas.values():
+        atual, tokens = [], 0
+        for seg in celula:
+            tokens_seg = estimar_tokens(seg["text"])
+            if atual and tokens + tokens_seg > orcamento_tokens:
+                janelas.append(_montar_janela(atual))
+                atual, tokens = [], 0
+            atual.append(seg)
+            tokens += tokens_seg
+        if atual:
+            janelas.append(_montar_janela(atual))
+    return janelas
+
+# Backend que chama o Gemini pelo cliente assíncrono da SDK, com saída JSON estruturada
+class BackendGemini:
+    def __init__(self, client, model_id):
+        self.client = client
+        self.model_id = model_id
+
+    async def gerar(self, instrucao, texto, esquema=None):
+        from google.genai import types
+
+        config = types.GenerateContentConfig(
+            system_instruction=instrucao,
+            temperature=0,
+            response_mime_type="application/json" if esquema else None,
+            response_schema=esquema,
+        )
+        resposta = await self.client.aio.models.generate_content(model=self.model_id, contents=texto, config=config)
+        uso = resposta.usage_metadata
+        return resposta.text or "", {
+            "tokens_prompt": (uso.prompt_token_count or 0) if uso else estimar_tokens(instrucao + texto),
+            "tokens_resposta": (uso.candidates_token_count or 0) if uso else estimar_tokens(resposta.text or ""),
+        }
+
+# Backend local e determinístico para testes e benchmarks offline: responde
+# com o mesmo formato do Gemini e simula latência proporcional aos tokens
+class BackendStub:
+    def __init__(self, latencia_base_s=0.05, latencia_por_mil_tokens_s=0.02):
+        self.latencia_base_s = latencia_base_s
+        self.latencia_por_mil_tokens_s = latencia_por_mil_tokens_s
+
+    def latencia_s(self, tokens_prompt):
+        return self.latencia_base_s + self.latencia_por_mil_tokens_s * tokens_prompt / 1000
+
+    async def gerar(self, instrucao, texto, esquema=None):
+        await asyncio.sleep(self.latencia_s(estimar_tokens(instrucao + texto)))
+        return self.responder(instrucao, texto, esquema)
+
+    # Resposta sem a latência simulada (também usada pelos agentes no modo stub)
+    def responder(self, instrucao, texto, esquema=None):
+        tokens_prompt = estimar_tokens(instrucao + texto)
+        if esquema is ESQUEMA_SENTIMENTO_LOTE:
+            trechos = [linha.split(". ", 1)[-1] for linha in texto.splitlines()]
+            resposta = json.dumps([round(float(n), 3) for n in motor_sentimento.pontuar(trechos)])
+        elif esquema:
+            palavras_chave = MotorPalavrasChave().extrair(segmentos_de_texto(texto), top_n=5)
+            resposta = json.dumps({
+                "resumo": " ".join(texto.split()[:100]),
+                "sentimento": "neutro",
+                "palavras_chave": [p["termo"] for p in palavras_chave],
+            }, ensure_ascii=False)
+        else:
+            resposta = " ".join(texto.split()[:100])
+        return resposta, {"tokens_prompt": tokens_prompt, "tokens_resposta": estimar_tokens(resposta)}
+
+# Serviço de análise da transcrição: uma única requisição estruturada devolve
+# resumo, sentimento e palavras-chave, em vez de duas chamadas com a
+# transcrição inteira. O cliente é criado uma vez e as corrotinas rodam em um
+# event loop próprio, em uma thread dedicada, compartilhado pelos callbacks.
+class ServicoAnalise:
+    def __init__(self, backend, timeout_s=TIMEOUT_ANALISE_S, orcamento_tokens=ORCAMENTO_TOKENS_ANALISE,
+                 concorrencia=CONCORRENCIA_ANALISE, cache=None):
+        self.backend = backend
+        self.timeout_s = timeout_s
+        self.orcamento_tokens = orcamento_tokens
+        self.concorrencia = concorrencia
+        self.cache = cache
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="servico-analise", daemon=True).start()
+        self._lock = threading.Lock()
+        self._stats = {"chamadas": 0, "erros": 0, "timeouts": 0, "latencia_total_s": 0.0,
+                       "tokens_prompt": 0, "tokens_resposta": 0, "janelas_cache": 0, "janelas_resumidas": 0}
+
+    # Executa uma corrotina no loop do serviço a partir de código síncrono
+    def executar(self, corrotina):
+        return asyncio.run_coroutine_threadsafe(corrotina, self._loop).result()
+
+    async def _chamar(self, instrucao, texto, esquema=None):
+        inicio = time.perf_counter()
+        with metricas.medir("analise_llm", estruturada=int(esquema is not None),
+                            caracteres_prompt=len(instrucao) + len(texto)) as span:
+            try:
+                resposta, uso = await asyncio.wait_for(self.backend.gerar(instrucao, texto, esquema), self.timeout_s)
+            except asyncio.TimeoutError:
+                with self._lock:
+                    self._stats["timeouts"] += 1
+                span["erro"] = "timeout"
+                raise
+            except Exception:
+                with self._lock:
+                    self._stats["erros"] += 1
+                raise
+            span.update(uso, caracteres_resposta=len(resposta))
+        with self._lock:
+            self._stats["chamadas"] += 1
+            self._stats["latencia_total_s"] += time.perf_counter() - inicio
+            self._stats["tokens_prompt"] += uso["tokens_prompt"]
+            self._stats["tokens_resposta"] += uso["tokens_resposta"]
+        return resposta, uso
+
+    # Devolve o resumo e o uso de tokens da chamada (zerado quando vem do cache)
+    async def _resumir_janela(self, janela, idioma, semaforo):
+        instrucao = INSTRUCAO_RESUMO_JANELA.format(idioma=idioma)
+        texto = f"[{formatar_tempo(janela['inicio'])} - {formatar_tempo(janela['fim'])}] {janela['texto']}"
+        modelo = getattr(self.backend, "model_id", type(self.backend).__name__)
+        chave = hashlib.sha256(f"{modelo}\n{instrucao}\n{texto}".encode("utf-8")).hexdigest()
+        if self.cache is not None:
+            resumo = await asyncio.to_thread(self.cache.obter_resumo_janela, chave)
+            if resumo is not None:
+                with self._lock:
+                    self._stats["janelas_cache"] += 1
+                return resumo, {"tokens_prompt": 0, "tokens_resposta": 0}
+        async with semaforo:
+            resumo, uso = await self._chamar(instrucao, texto)
+        resumo = resumo.strip()
+        with self._lock:
+            self._stats["janelas_resumidas"] += 1
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.salvar_resumo_janela, chave, resumo)
+        return resumo, uso
+
+    # Etapa "map": resume as janelas em paralelo (limitado pelo semáforo). Se
+    # os resumos juntos ainda passam do orçamento, repete sobre eles com uma
+    # grade de tempo maior, para que cada rodada junte resumos vizinhos.
+    # Devolve o texto dos resumos e o uso de tokens somado de todas as rodadas.
+    async def _reduzir_segmentos(self, segmentos, idioma):
+        semaforo = asyncio.Semaphore(self.concorrencia)
+        duracao_janela_s = DURACAO_JANELA_RESUMO_S
+        uso = {"tokens_prompt": 0, "tokens_resposta": 0}
+        texto = None
+        while True:
+            janelas = dividir_janelas(segmentos, self.orcamento_tokens, duracao_janela_s)
+            if texto is not None and len(janelas) >= len(segmentos):
+                # Resumos que não cabem nem dois por janela: segue com os da rodada anterior
+                return texto, uso
+            resultados = await asyncio.gather(*(self._resumir_janela(j, idioma, semaforo) for j in janelas))
+            for _, uso_janela in resultados:
+                for chave in uso:
+                    uso[chave] += uso_janela[chave]
+            segmentos = [{"start": j["inicio"], "end": j["fim"], "text": r} for j, (r, _) in zip(janelas, resultados)]
+            texto = "\n".join(f"[{formatar_tempo(s['start'])} - {formatar_tempo(s['end'])}] {s['text']}"
+                              for s in segmentos)
+            if estimar_tokens(texto) <= self.orcamento_tokens or len(janelas) == 1:
+                return texto, uso
+            duracao_janela_s *= 8
+
+    # Transcrições dentro do orçamento vão em uma única requisição; as maiores
+    # são resumidas por janelas (map) e a análise final é feita sobre os
+    # resumos parciais (reduce). O uso de tokens devolvido soma todas as chamadas.
+    async def analisar_async(self, texto, idioma="pt", segmentos=None):
+        inicio = time.perf_counter()
+        uso_mapa = {"tokens_prompt": 0, "tokens_resposta": 0}
+        if estimar_tokens(texto) <= self.orcamento_tokens:
+            instrucao, conteudo, janelas = INSTRUCAO_ANALISE.format(idioma=idioma), texto, 1
+        else:
+            conteudo, uso_mapa = await self._reduzir_segmentos(segmentos or segmentos_de_texto(texto), idioma)
+            instrucao, janelas = INSTRUCAO_REDUCAO.format(idioma=idioma), conteudo.count("\n") + 1
+        resposta, uso_final = await self._chamar(instrucao, conteudo, ESQUEMA_ANALISE)
+        uso = {chave: uso_mapa[chave] + uso_final[chave] for chave in uso_mapa}
+        dados = json.loads(resposta)
+        return {
+            "resumo": dados.get("resumo", "").strip(),
+            "sentimento": dados.get("sentimento", "neutro").strip().lower(),
+            "palavras_chave": [p.strip() for p in dados.get("palavras_chave", []) if p.strip()],
+            "uso": uso,
+            "janelas": janelas,
+            "latencia_s": time.perf_counter() - inicio,
+        }
+
+    def analisar(self, texto, idioma="pt", segmentos=None):
+        return self.executar(self.analisar_async(texto, idioma, segmentos))
+
+    # Modo LLM do sentimento por segmento: envia os segmentos em lotes
+    # numerados, em paralelo, e recebe um array de notas por lote
+    async def pontuar_segmentos_async(self, textos, idioma="pt", tamanho_lote=TAMANHO_LOTE_SENTIMENTO):
+        semaforo = asyncio.Semaphore(self.concorrencia)
+        instrucao = INSTRUCAO_SENTIMENTO_LOTE.format(idioma=idioma)
+
+        async def pontuar_lote(lote):
+            conteudo = "\n".join(f"{i}. {' '.join(texto.split())}" for i, texto in enumerate(lote, 1))
+            async with semaforo:
+                resposta, _ = await self._chamar(instrucao, conteudo, ESQUEMA_SENTIMENTO_LOTE)
+            notas = [float(n) for n in json.loads(resposta)][:len(lote)]
+            return notas + [0.0] * (len(lote) - len(notas))
+
+        lotes = [textos[i:i + tamanho_lote] for i in range(0, len(textos), tamanho_lote)]
+        resultados = await asyncio.gather(*(pontuar_lote(lote) for lote in lotes))
+        return np.clip(np.array([n for notas in resultados for n in notas], dtype=np.float32), -1.0, 1.0)
+
+    def pontuar_segmentos(self, textos, idioma="pt"):
+        return self.executar(self.pontuar_segmentos_async(textos, idioma))
+
+    def estatisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["latencia_media_s"] = stats["latencia_total_s"] / stats["chamadas"] if stats["chamadas"] else 0.0
+        return stats
+
+_servico_analise = None
+_servico_analise_lock = threading.Lock()
+
+# Cria o serviço de análise na primeira chamada, configurando o cliente do Gemini uma única vez
+def obter_servico_analise():
+    global _servico_analise
+    with _servico_analise_lock:
+        if _servico_analise is None:
+            if BACKEND_ANALISE == "stub":
+                backend = BackendStub()
+            else:
+                client, model_id = config_ai()
+                if client is None or model_id is None:
+                    return None
+                backend = BackendGemini(client, model_id)
+            _servico_analise = ServicoAnalise(backend, cache=cache_transcricoes)
+        return _servico_analise
+
+# Estatísticas do serviço de análise sem criá-lo (vazio enquanto nenhuma análise rodou)
+def estatisticas_servico_analise():
+    servico = _servico_analise
+    return servico.estatisticas() if servico else {}
+
+# Estágios do post, em ordem. Cada um recebe o tópico e a saída do anterior
+ESTAGIOS_POST = [
+    {
+        "estagio": "buscador",
+        "titulo": "Lançamentos",
+        "nome": "agente_buscador",
+        "descricao": "Agente que busca informações no Google.",
+        "ferramentas": True,
+        "instrucao": """
+    Você é um assistente de pesquisa. Use a ferramenta de busca do Google (google_search) para recuperar as últimas notícias de lançamentos muito relevantes sobre o tópico abaixo. Foque em no máximo 5 lançamentos relevantes, com base na quantidade e entusiasmo das notícias. Lançamentos devem ser atuais, de no máximo um mês antes da data de hoje.
+    """,
+    },
+    {
+        "estagio": "planejador",
+        "titulo": "Plano",
+        "nome": "agente_planejador",
+        "descricao": "Agente que planeja posts.",
+        "ferramentas": True,
+        "instrucao": """
+    Você é um planejador de conteúdo especialista em redes sociais. Com base na lista de lançamentos fornecida, use a ferramenta de busca do Google para criar um plano sobre os pontos mais relevantes a abordar em um post para cada lançamento. Escolha o tema mais relevante e retorne o tema, seus pontos principais e um plano com os assuntos a serem abordados no post.
+    """,
+    },
+    {
+        "estagio": "redator",
+        "titulo": "Rascunho",
+        "nome": "agente_redator",
+        "descricao": "Agente redator de posts engajadores para Instagram.",
+        "ferramentas": False,
+        "instrucao": """
+    Você é um Redator Criativo especializado em posts virais para redes sociais. Escreve posts para a Alura, a maior escola online de tecnologia do Brasil. Utilize o plano de post fornecido e escreva um rascunho de post para Instagram. O post deve ser engajador, informativo, com linguagem simples e incluir 2 a 4 hashtags. Se vierem um rascunho anterior e a revisão dele, reescreva o rascunho corrigindo os pontos apontados.
+    """,
+    },
+    {
+        "estagio": "revisor",
+        "titulo": "Revisão",
+        "nome": "agente_revisor",
+        "descricao": "Agente revisor de post para redes sociais.",
+        "ferramentas": False,
+        "instrucao": """
+    Você é um Editor e Revisor de Conteúdo meticuloso, especializado em posts para Instagram. Revise o rascunho abaixo, verificando clareza, concisão, correção e tom (adequado para público jovem, 18-30 anos). Se estiver bom, responda 'O rascunho está ótimo e pronto para publicar!'. Caso contrário, aponte problemas e sugira melhorias.
+    """,
+    },
+]
+ESTAGIO_POST = {e["estagio"]: e for e in ESTAGIOS_POST}
+APROVACAO_REVISOR = "O rascunho está ótimo e pronto para publicar!"
+
+# Texto enviado a cada estágio. Com os resultados de uma execução rejeitada
+# pelo revisor, o redator recebe o rascunho anterior e a revisão dele: só
+# redação e revisão mudam de entrada e voltam ao modelo
+def entrada_estagio_post(estagio, topico, resultados, data_de_hoje, anteriores=None):
+    if estagio == "buscador":
+        return f"Tópico: {topico}\nData de hoje: {data_de_hoje}"
+    if estagio == "planejador":
+        return f"Tópico: {topico}\nLançamentos buscados: {resultados['buscador']}"
+    if estagio == "redator":
+        entrada = f"Tópico: {topico}\nPlano de post: {resultados['planejador']}"
+        if anteriores and anteriores.get("redator") and anteriores.get("revisor"):
+            entrada += (f"\nRascunho anterior: {anteriores['redator']}"
+                        f"\nRevisão do rascunho anterior: {anteriores['revisor']}")
+        return entrada
+    return f"Tópico: {topico}\nRascunho: {resultados['redator']}"
+
+def post_aprovado(revisao):
+    return APROVACAO_REVISOR.lower() in (revisao or "").lower()
+
+# Pipeline do post como job assíncrono: os agentes, o Runner de cada estágio
+# e o serviço de sessões são criados uma vez por pipeline, e cada estágio do
+# job tem a sua sessão nele (runners de agentes diferentes não compartilham
+# a mesma sessão no ADK). A resposta de cada estágio chega em streaming
+# (SSE), com timeout por estágio, e os estágios concluídos ficam no cache
+# SQLite, então um job cancelado, que estourou o tempo ou que é refeito após
+# a revisão recomeça do primeiro estágio cuja entrada mudou.
+class PipelinePost:
+    APP = "post_instagram"
+    USUARIO = "user1"
+
+    def __init__(self, model_id, cache=None, timeout_estagio_s=TIMEOUT_ESTAGIO_POST_S, stub=None):
+        self.model_id = model_id
+        self.cache = cache
+        self.timeout_estagio_s = timeout_estagio_s
+        self.stub = BACKEND_ANALISE == "stub" if stub is None else stub
+        self._runners = {}
+        self._sessoes = None
+        self._sessoes_criadas = set()
+
+    def _runner(self, estagio):
+        if estagio["estagio"] not in self._runners:
+            from google.adk.agents import Agent
+            from google.adk.runners import Runner
+            from google.adk.sessions import InMemorySessionService
+            from google.adk.tools import google_search
+
+            if self._sessoes is None:
+                self._sessoes = InMemorySessionService()
+            agente = Agent(name=estagio["nome"], model=self.model_id, description=estagio["descricao"],
+                           instruction=estagio["instrucao"], tools=[google_search] if estagio["ferramentas"] else [])
+            self._runners[estagio["estagio"]] = Runner(agent=agente, app_name=self.APP, session_service=self._sessoes)
+        return self._runners[estagio["estagio"]]
+
+    async def _sessao(self, job_id, estagio):
+        sessao_id = f"{job_id}:{estagio['estagio']}"
+        if sessao_id not in self._sessoes_criadas:
+            # create_session é síncrona nas versões antigas do ADK e corrotina nas atuais
+            sessao = self._sessoes.create_session(app_name=self.APP, user_id=self.USUARIO, session_id=sessao_id)
+            if inspect.isawaitable(sessao):
+                await sessao
+            self._sessoes_criadas.add(sessao_id)
+        return sessao_id
+
+    # Trechos de texto da resposta de um estágio, à medida que chegam
+    async def _transmitir(self, estagio, entrada, job_id, span):
+        if self.stub:
+            backend = BackendStub()
+            resposta, uso = backend.responder(estagio["instrucao"], entrada)
+            span.update(uso)
+            palavras = resposta.split(" ")
+            atraso = backend.latencia_s(estimar_tokens(estagio["instrucao"] + entrada)) / len(palavras)
+            for palavra in palavras:
+                await asyncio.sleep(atraso)
+                yield palavra + " "
+            return
+
+        from google.adk.agents import RunConfig
+        from google.adk.agents.run_config import StreamingMode
+        from google.genai import types
+
+        runner = self._runner(estagio)
+        sessao_id = await self._sessao(job_id, estagio)
+        conteudo = types.Content(role="user", parts=[types.Part(text=entrada)])
+        parcial = False
+        async for evento in runner.run_async(user_id=self.USUARIO, session_id=sessao_id, new_message=conteudo,
+                                             run_config=RunConfig(streaming_mode=StreamingMode.SSE)):
+            uso = getattr(evento, "usage_metadata", None)
+            if uso and not evento.partial:
+                span["tokens_prompt"] = span.get("tokens_prompt", 0) + (uso.prompt_token_count or 0)
+                span["tokens_resposta"] = span.get("tokens_resposta", 0) + (uso.candidates_token_count or 0)
+            if not evento.content or not evento.content.parts:
+                continue
+            texto = "".join(p.text for p in evento.content.parts if p.text and not p.thought)
+            if evento.partial:
+                parcial = True
+                yield texto
+            elif parcial:
+                # Evento agregado com o texto que já veio nos parciais
+                parcial = False
+            elif evento.is_final_response():
+                yield texto
+
+    # Executa um estágio e repassa o texto acumulado a cada trecho recebido
+    async def _executar_estagio(self, estagio, entrada, job_id, cancelar):
+        texto = ""
+        with metricas.medir("agente", agente=estagio["nome"], ferramentas=int(estagio["ferramentas"]),
+                            caracteres_prompt=len(estagio["instrucao"]) + len(entrada)) as span:
+            trechos = self._transmitir(estagio, entrada, job_id, span)
+            limite = time.monotonic() + self.timeout_estagio_s
+            try:
+                while True:
+                    if cancelar is not None and cancelar.is_set():
+                        span["erro"] = "cancelado"
+                        yield texto, "cancelado"
+                        return
+                    try:
+                        trecho = await asyncio.wait_for(trechos.__anext__(), max(limite - time.monotonic(), 0))
+                    except StopAsyncIteration:
+                        break
+                    texto += trecho
+                    yield texto, "executando"
+            except asyncio.TimeoutError:
+                print(f"Agente {estagio['nome']} excedeu {self.timeout_estagio_s:g}s")
+                span["erro"] = "timeout"
+                yield texto, "timeout"
+                return
+            except Exception as e:
+                print(f"Erro no agente {estagio['nome']}: {str(e)}")
+                span["erro"] = str(e)
+                yield texto, "erro"
+                return
+            finally:
+                await trechos.aclose()
+            span["caracteres_resposta"] = len(texto)
+            if not texto.strip():
+                print(f"Agente {estagio['nome']} retornou resposta vazia para a entrada: {entrada[:100]}")
+                span["erro"] = "resposta vazia"
+                yield texto, "erro"
+                return
+            yield texto, "concluido"
+
+    # Gera o post estágio por estágio. Cada evento traz o estágio, o texto
+    # acumulado dele, o estado ("cache", "executando", "concluido", "timeout",
+    # "erro" ou "cancelado") e os resultados dos estágios já concluídos; a
+    # execução para no primeiro estágio que não conclui. `anteriores` são os
+    # resultados de uma execução rejeitada pelo revisor e `cancelar` um
+    # threading.Event verificado a cada trecho recebido.
+    async def gerar_async(self, topico, anteriores=None, job_id=None, cancelar=None):
+        job_id = job_id or uuid.uuid4().hex
+        data_de_hoje = date.today().strftime("%d/%m/%Y")
+        resultados = {}
+        with metricas.medir("agentes", caracteres_topico=len(topico), estagios_cache=0) as span:
+            for estagio in ESTAGIOS_POST:
+                nome = estagio["estagio"]
+                entrada = entrada_estagio_post(nome, topico, resultados, data_de_hoje, anteriores)
+                chave = f"{self.model_id}\n{estagio['instrucao']}\n{entrada}"
+                chave = hashlib.sha256(chave.encode("utf-8")).hexdigest()
+                resultado = await asyncio.to_thread(self.cache.obter_resultado_agente, chave) if self.cache else None
+                if resultado is not None:
+                    resultados[nome] = resultado
+                    span["estagios_cache"] += 1
+                    yield {"estagio": nome, "texto": resultado, "estado": "cache", "resultados": dict(resultados)}
+                    continue
+                async for texto, estado in self._executar_estagio(estagio, entrada, job_id, cancelar):
+                    if estado == "concluido":
+                        resultados[nome] = texto
+                        if self.cache is not None:
+                            await asyncio.to_thread(self.cache.salvar_resultado_agente, chave, nome, texto)
+                    yield {"estagio": nome, "texto": texto, "estado": estado, "resultados": dict(resultados)}
+                if nome not in resultados:
+                    span["erro"] = f"{nome}: interrompido"
+                    return
+            span["caracteres_post"] = len(resultados["redator"])
+            span["aprovado"] = int(post_aprovado(resultados["revisor"]))
+
+    # Versão síncrona, para background callbacks e scripts: consome o gerador
+    # assíncrono em um event loop próprio
+    def gerar(self, topico, anteriores=None, job_id=None, cancelar=None):
+        loop = asyncio.new_event_loop()
+        eventos = self.gerar_async(topico, anteriores, job_id, cancelar)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(eventos.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            loop.run_until_complete(eventos.aclose())
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+# Cria o pipeline do post com o modelo configurado (None se a API não pôde ser configurada)
+def criar_pipeline_post(cache=None):
+    if BACKEND_ANALISE == "stub":
+        return PipelinePost("stub", cache=cache)
+    client, model_id = config_ai()
+    if client is None or model_id is None:
+        return None
+    return PipelinePost(model_id, cache=cache)
+
+# Chamada avulsa de um estágio, sem streaming nem cache
+def _chamar_estagio_post(estagio, topico, subject, model_id, client):
+    e = ESTAGIO_POST[estagio]
+    return call_agent(e["nome"], e["descricao"], topico, subject, e["instrucao"], model_id, client, e["ferramentas"])
+
+# Agente Buscador
+def agente_buscador(topico, data_de_hoje, model_id, client):
+    subject = entrada_estagio_post("buscador", topico, {}, data_de_hoje)
+    return _chamar_estagio_post("buscador", topico, subject, model_id, client)
+
+# Agente Planejador
+def agente_planejador(topico, lancamentos_buscados, model_id, client):
+    subject = entrada_estagio_post("planejador", topico, {"buscador": lancamentos_buscados}, None)
+    return _chamar_estagio_post("planejador", topico, subject, model_id, client)
+
+# Agente Redator
+def agente_redator(topico, plano_de_post, model_id, client):
+    subject = entrada_estagio_post("redator", topico, {"planejador": plano_de_post}, None)
+    return _chamar_estagio_post("redator", topico, subject, model_id, client)
+
+# Agente Revisor
+def agente_revisor(topico, rascunho_gerado, model_id, client):
+    subject = entrada_estagio_post("revisor", topico, {"redator": rascunho_gerado}, None)
+    return _chamar_estagio_post("revisor", topico, subject, model_id, client)
+
+# Função para executar todos os agentes: percorre o pipeline do post e
+# devolve a resposta do revisor (vazia se algum estágio falhar)
+def run_agentes(topico, model_id, client):
+    pipeline = PipelinePost(model_id, cache=cache_transcricoes)
+    resultados = {}
+    for evento in pipeline.gerar(topico):
+        resultados = evento["resultados"]
+    return resultados.get("revisor", "")
@@ -1,271 +1,51 @@
-# !pip install dash dash-bootstrap-components openai-whisper yt-dlp torch nltk requests google.adk
-import nltk
-from nltk.util import ngrams
-import dash
-import dash_bootstrap_components as dbc
-from dash import dcc, html
-from dash.dependencies import Input, Output, State
-from datetime import date
+# !pip install "dash[diskcache]" dash-bootstrap-components openai-whisper yt-dlp torch google-genai google-adk
+import io
+import itertools
 import os
-import requests
-import textwrap
+import sys
 import time
-import torch
-import warnings
-import whisper
-import yt_dlp
-from google.colab import userdata
-from google import genai
-from google.adk.agents import Agent
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.adk.tools import google_search
-from google.genai import types
-from IPython.display import display, Markdown, HTML
 from collections import Counter
-import re
-
-# Baixar recursos do NLTK
-nltk.download('stopwords')
-
-# Define a precisão correta para FP32 na CPU
-torch.set_default_dtype(torch.float32)
-
-# Inicializa o app Dash
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.DARKLY])
-
-# Função para extrair palavra-chave do resumo
-def extrair_termo_principal(texto, idioma="pt", n_gram=2):
-    stop_words = {
-        "pt": ["a", "o", "as", "os", "de", "do", "da", "dos", "das", "em", "no", "na", "nos", "nas",
-               "para", "com", "que", "e", "é", "um", "uma", "uns", "umas", "se", "por", "sobre"],
-        "en": ["the", "a", "an", "and", "or", "but", "in", "on", "at", "to", "for", "of", "with",
-               "by", "from", "up", "about", "into", "over", "after"],
-        "es": ["el", "la", "los", "las", "de", "del", "en", "y", "o", "que", "es", "un", "una",
-               "unos", "unas", "para", "con", "por", "sobre"]
-    }.get(idioma, [])
-    
-    texto_limpo = re.sub(r'[^\w\s]', '', texto.lower())
-    palavras = texto_limpo.split()
-    palavras_filtradas = [p for p in palavras if p not in stop_words and len(p) > 2]
-    
-    # Gerar n-grams
-    n_grams = [' '.join(gram) for gram in ngrams(palavras_filtradas, n_gram)]
-    contagem = Counter(n_grams)
-    
-    return contagem.most_common(1)[0][0] if contagem else ""
-
-# Função para extrair ID do vídeo do URL do YouTube
-def extrair_video_id(url):
-    pattern = r'(?:https?://)?(?:www\.)?(?:youtube\.com/watch\?v=|youtu\.be/)([\w-]+)'
-    match = re.search(pattern, url)
-    return match.group(1) if match else None
-
-# Função para baixar o áudio do YouTube usando yt-dlp
-def baixar_audio(url, update_callback=None):
-    video_id = extrair_video_id(url)
-    if not video_id:
-        print("Erro: Não foi possível extrair o ID do vídeo da URL")
-        return None
-    
-    nome_arquivo = f"{video_id}.wav"
-    
-    # Verifica se o arquivo já existe
-    if os.path.exists(nome_arquivo):
-        print(f"Arquivo {nome_arquivo} já existe. Usando o arquivo existente.")
-        return nome_arquivo
-
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'outtmpl': video_id,  # Usa o ID do vídeo como nome base
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'wav',
-            'preferredquality': '192',
-        }],
-        'progress_hooks': [],
-        'overwrite': True,
-    }
-    
-    def progress_hook(d):
-        if update_callback:
-            if d['status'] == 'downloading':
-                if d.get('total_bytes_estimate'):
-                    percent = (d['downloaded_bytes'] / d['total_bytes_estimate']) * 50
-                    update_callback(percent)
-                elif d.get('total_bytes'):
-                    percent = (d['downloaded_bytes'] / d['total_bytes']) * 50
-                    update_callback(percent)
-    
-    ydl_opts['progress_hooks'].append(progress_hook)
-    
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
-        
-        # Verifica se o arquivo foi criado com a extensão correta
-        if os.path.exists(nome_arquivo):
-            return nome_arquivo
-        else:
-            print(f"Erro: Arquivo {nome_arquivo} não foi criado")
-            return None
-    except Exception as e:
-        print(f"Erro ao baixar o áudio: {e}")
-        return None
-
-# Função para transcrever o áudio usando Whisper
-def transcrever_audio(nome_arquivo, idioma, update_callback=None):
-    try:
-        modelo = whisper.load_model("base", device="cpu")
-        resultado = modelo.transcribe(nome_arquivo, language=idioma, temperature=0, word_timestamps=True)
-        transcricao_formatada = [
-            {"start": seg["start"], "end": seg["end"], "text": seg["text"]}
-            for seg in resultado["segments"]
-        ]
-        if update_callback:
-            update_callback(100)
-        return transcricao_formatada
-    except Exception as e:
-        print(f"Erro ao transcrever o áudio: {e}")
-        return ["Erro na transcrição."]
-
-# Função para exportar transcrição em formato SRT
-def exportar_srt(transcricao, nome_arquivo="legendas.srt"):
-    try:
-        with open(nome_arquivo, "w", encoding="utf-8") as f:
-            for i, seg in enumerate(transcricao, 1):
-                start = float(seg["start"])
-                end = float(seg["end"])
-                text = seg["text"]
-                f.write(f"{i}\n")
-                f.write(f"{start//3600:02d}:{(start%3600)//60:02d}:{start%60:06.3f} --> {end//3600:02d}:{(end%3600)//60:02d}:{end%60:06.3f}\n")
-                f.write(f"{text}\n\n")
-        return nome_arquivo
-    except Exception as e:
-        print(f"Erro ao exportar SRT: {e}")
-        return None
-
-# Configura o cliente da SDK do Gemini
-def config_ai():
-    try:
-        api_key = userdata.get('GOOGLE_API_KEY')
-        if not api_key:
-            print("Erro:4: GOOGLE_API_KEY não encontrada no userdata.")
-            return None, None
-        os.environ["GOOGLE_API_KEY"] = api_key
-        client = genai.Client()
-        MODEL_ID = "gemini-2.0-flash"
-        return client, MODEL_ID
-    except Exception as e:
-        print(f"Erro ao configurar a API do Gemini: {str(e)}")
-        return None, None
 
-# Função auxiliar para chamar agentes
-def call_agent(name, description, topico, subject, instrucao, model_id, client, tools=False):
-    try:
-        agent = Agent(name=name, model=model_id, description=description, instruction=instrucao)
-        agent.tools = [google_search] if tools else []
-        message_text = f"Tópico: {topico}-{subject}"
-        session_service = InMemorySessionService()
-        session = session_service.create_session(app_name=agent.name, user_id="user1", session_id="session1")
-        runner = Runner(agent=agent, app_name=agent.name, session_service=session_service)
-        content = types.Content(role="user", parts=[types.Part(text=message_text)])
-        final_response = ""
-        for event in runner.run(user_id="user1", session_id="session1", new_message=content):
-            if event.is_final_response():
-                for part in event.content.parts:
-                    if part.text is not None:
-                        final_response += part.text + "\n"
-        if not final_response.strip():
-            print(f"Agente {name} retornou resposta vazia para o tópico: {topico}")
-        return final_response
-    except Exception as e:
-        print(f"Erro no agente {name}: {str(e)}")
-        return ""
+import dash
+import dash_bootstrap_components as dbc
+import diskcache
+import flask
+import numpy as np
+from dash import DiskcacheManager, dcc, html
+from dash.dependencies import ALL, Input, Output, State
+
+from video_transcription_core import (
+    ESTAGIOS_POST, MODELOS_AQUECER, MODO_SENTIMENTO, ExportadorLegendas, MotorSentimento, acompanhar_transcricao,
+    armazem_artefatos, audio_compactado_em_uso, cache_transcricoes, criar_pipeline_post, estatisticas_servico_analise,
+    extrair_termo_principal, extrair_video_id, figura_linha_tempo_sentimento, fila_transcricao, formatar_tempo,
+    indice_busca, iniciar_trabalhador_transcricao, metricas, motor_palavras_chave, motor_sentimento,
+    obter_servico_analise, obter_servico_transcricao, opcoes_decodificacao, post_aprovado,
+)
 
-# Agente Resumidor
-def agente_resumidor(texto, model_id, client):
-    name = "agente_resumidor"
-    description = "Agente que gera resumos concisos de textos."
-    instruction = """
-    Gere um resumo conciso do texto fornecido, destacando os pontos principais em até 100 palavras.
-    """
-    subject = f"Texto a ser resumido: {texto}"
-    resumo = call_agent(name, description, texto, subject, instruction, model_id, client, tools=False)
-    return resumo
-
-# Agente Analisador de Sentimentos
-def agente_analisador_sentimentos(texto, model_id, client):
-    name = "agente_analisador_sentimentos"
-    description = "Agente que analisa o sentimento geral de um texto."
-    instruction = """
-    Analise o sentimento geral do texto fornecido e classifique-o como 'positivo', 'negativo' ou 'neutro'.
-    Forneça apenas a classificação do sentimento.
-    """
-    subject = f"Texto a ser analisado: {texto}"
-    sentimento = call_agent(name, description, texto, subject, instruction, model_id, client, tools=False)
-    return sentimento
-
-# Agente Buscador
-def agente_buscador(topico, data_de_hoje, model_id, client):
-    name = "agente_buscador"
-    description = "Agente que busca informações no Google."
-    tools = True
-    instruction = """
-    Você é um assistente de pesquisa. Use a ferramenta de busca do Google (google_search) para recuperar as últimas notícias de lançamentos muito relevantes sobre o tópico abaixo. Foque em no máximo 5 lançamentos relevantes, com base na quantidade e entusiasmo das notícias. Lançamentos devem ser atuais, de no máximo um mês antes da data de hoje.
-    """
-    subject = f"Tópico: {topico}\nData de hoje: {data_de_hoje}"
-    lancamento = call_agent(name, description, topico, subject, instruction, model_id, client, tools)
-    return lancamento
-
-# Agente Planejador
-def agente_planejador(topico, lancamentos_buscados, model_id, client):
-    name = "agente_planejador"
-    description = "Agente que planeja posts."
-    tools = True
-    instruction = """
-    Você é um planejador de conteúdo especialista em redes sociais. Com base na lista de lançamentos fornecida, use a ferramenta de busca do Google para criar um plano sobre os pontos mais relevantes a abordar em um post para cada lançamento. Escolha o tema mais relevante e retorne o tema, seus pontos principais e um plano com os assuntos a serem abordados no post.
-    """
-    subject = f"Tópico: {topico}\nLançamentos buscados: {lancamentos_buscados}"
-    plano_do_post = call_agent(name, description, topico, subject, instruction, model_id, client, tools)
-    return plano_do_post
-
-# Agente Redator
-def agente_redator(topico, plano_de_post, model_id, client):
-    name = "agente_redator"
-    description = "Agente redator de posts engajadores para Instagram."
-    instruction = """
-    Você é um Redator Criativo especializado em posts virais para redes sociais. Escreve posts para a Alura, a maior escola online de tecnologia do Brasil. Utilize o plano de post fornecido e escreva um rascunho de post para Instagram. O post deve ser engajador, informativo, com linguagem simples e incluir 2 a 4 hashtags.
-    """
-    subject = f"Tópico: {topico}\nPlano de post: {plano_de_post}"
-    rascunho = call_agent(name, description, topico, subject, instruction, model_id, client, tools=False)
-    return rascunho
-
-# Agente Revisor
-def agente_revisor(topico, rascunho_gerado, model_id, client):
-    name = "agente_revisor"
-    description = "Agente revisor de post para redes sociais."
-    instruction = """
-    Você é um Editor e Revisor de Conteúdo meticuloso, especializado em posts para Instagram. Revise o rascunho abaixo, verificando clareza, concisão, correção e tom (adequado para público jovem, 18-30 anos). Se estiver bom, responda 'O rascunho está ótimo e pronto para publicar!'. Caso contrário, aponte problemas e sugira melhorias.
-    """
-    subject = f"Tópico: {topico}\nRascunho: {rascunho_gerado}"
-    texto_revisado = call_agent(name, description, topico, subject, instruction, model_id, client, tools=False)
-    return texto_revisado
-
-# Função para executar todos os agentes
-def run_agentes(topico, model_id, client):
-    data_de_hoje = date.today().strftime("%d/%m/%Y")
-    lancamentos_buscados = agente_buscador(topico, data_de_hoje, model_id, client)
-    plano_de_post = agente_planejador(topico, lancamentos_buscados, model_id, client)
-    rascunho_de_post = agente_redator(topico, plano_de_post, model_id, client)
-    post_final = agente_revisor(topico, rascunho_de_post, model_id, client)
-    return post_final
+# Inicializa o app Dash; a transcrição roda como background callback para não
+# prender um worker web durante o download e a inferência. O job de cada
+# clique só baixa o áudio e acompanha a inferência, que roda no trabalhador de
+# transcrição do servidor (processo de longa duração com os modelos carregados).
+DIRETORIO_JOBS = os.environ.get("DASH_DIRETORIO_JOBS", "./cache_jobs")
+# A transcrição fica no servidor (cache SQLite); o navegador recebe só o ID e uma página de segmentos por vez
+SEGMENTOS_POR_PAGINA = int(os.environ.get("DASH_SEGMENTOS_POR_PAGINA", "100"))
+SEGMENTOS_PROGRESSO = int(os.environ.get("DASH_SEGMENTOS_PROGRESSO", "20"))
+RESULTADOS_BUSCA = 50
+RESULTADOS_BUSCA_GLOBAL = int(os.environ.get("DASH_RESULTADOS_BUSCA_GLOBAL", "50"))
+# Intervalo mínimo entre atualizações do post em streaming (cada uma é gravada no diskcache do job)
+INTERVALO_PROGRESSO_POST_S = float(os.environ.get("DASH_INTERVALO_PROGRESSO_POST_S", "0.25"))
+background_callback_manager = DiskcacheManager(diskcache.Cache(DIRETORIO_JOBS))
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.DARKLY],
+                background_callback_manager=background_callback_manager)
 
 # Layout do dashboard
 app.layout = dbc.Container([
     html.H1("🎤 Transcrição e Análise de Vídeos do YouTube", className="text-center my-4"),
-    dcc.Store(id="transcricao-store", data={"completed": False, "texto": ""}),
+    dcc.Store(id="transcricao-store", data={"completed": False}),
+    dcc.Store(id="pedido-transcricao", data=None),
+    dcc.Store(id="segmento-destacado", data=None),
     dcc.Store(id="palavra-chave-store", data=""),
+    dcc.Store(id="post-store", data=None),
     dbc.Row([
         dbc.Col([
             html.H2("Transcrição de Áudio do YouTube", className="mt-4 text-secondary"),
@@ -289,15 +69,50 @@ app.layout = dbc.Container([
             html.Label("Tópico do Post:", className="fw-bold"),
             dcc.Input(id="input-topico-agente", type="text", placeholder="Digite o tópico aqui...", className="form-control mb-2"),
             dbc.Button("Gerar Post", id="btn-gerar-post", color="success", className="mt-2 w-100"),
+            dbc.Row([
+                dbc.Col(dbc.Button("Regenerar com a Revisão", id="btn-regenerar-post", color="secondary",
+                                   className="w-100"), width=6),
+                dbc.Col(dbc.Button("Cancelar", id="btn-cancelar-post", color="danger", disabled=True,
+                                   className="w-100"), width=6),
+            ], className="mt-2"),
         ], width=6, md=6),
     ]),
     dbc.Tabs([
         dbc.Tab(label="Transcrição", children=[
+            dbc.Row([
+                dbc.Col(dcc.Dropdown(
+                    id="formato-exportacao",
+                    options=[
+                        {"label": "SRT", "value": "srt"},
+                        {"label": "WebVTT", "value": "vtt"},
+                        {"label": "JSON Lines", "value": "jsonl"},
+                        {"label": "Texto", "value": "txt"},
+                    ],
+                    value="srt",
+                    clearable=False
+                ), width=3),
+                dbc.Col(dcc.Checklist(
+                    id="exportar-por-palavra",
+                    options=[{"label": " Legendas por palavra", "value": "palavra"}],
+                    value=[]
+                ), width=3),
+                dbc.Col(dbc.Button("Exportar Legendas", id="btn-exportar", color="secondary", className="w-100"), width=3),
+            ], className="my-2 align-items-center"),
+            dcc.Download(id="download-legendas"),
+            dbc.Row([
+                dbc.Col(dcc.Input(id="busca-transcricao", type="text", placeholder="Buscar na transcrição...",
+                                  className="form-control", debounce=True), width=6),
+                dbc.Col(dbc.Button("Buscar", id="btn-buscar-transcricao", color="secondary", className="w-100"), width=3),
+            ], className="my-2"),
+            html.Div(id="resultados-busca"),
             dcc.Loading(
                 id="loading-transcricao",
                 type="circle",
                 children=html.Div(id="transcricao", children="Aguardando transcrição...", className="p-3 border rounded bg-light")
-            )
+            ),
+            dbc.Pagination(id="transcricao-paginacao", max_value=1, active_page=1, fully_expanded=False,
+                           first_last=True, previous_next=True, className="mt-2"),
+            html.Div(id="transcricao-segmentos", className="p-3 border rounded bg-light"),
         ]),
         dbc.Tab(label="Resumo", children=[
             dcc.Loading(
@@ -317,122 +132,385 @@ app.layout = dbc.Container([
             )
         ]),
         dbc.Tab(label="Post", children=[
-            dcc.Loading(
-                id="loading-post",
-                type="circle",
-                children=html.Div(id="output-agente", className="p-3 border rounded bg-light")
-            )
+            html.Div(id="output-agente", className="p-3 border rounded bg-light")
+        ]),
+        dbc.Tab(label="Busca", children=[
+            html.Div([
+                dbc.Row([
+                    dbc.Col(dcc.Input(id="busca-global", type="text", debounce=True, className="form-control",
+                                      placeholder='Buscar em todos os vídeos transcritos (use aspas para frases)...'),
+                            width=6),
+                    dbc.Col(dcc.Dropdown(
+                        id="busca-global-idioma",
+                        options=[
+                            {"label": "Todos os idiomas", "value": ""},
+                            {"label": "Inglês", "value": "en"},
+                            {"label": "Português", "value": "pt"},
+                            {"label": "Espanhol", "value": "es"},
+                        ],
+                        value="",
+                        clearable=False
+                    ), width=3),
+                    dbc.Col(dbc.Button("Buscar", id="btn-busca-global", color="primary", className="w-100"), width=3),
+                ], className="mb-2"),
+                dcc.Loading(id="loading-busca-global", type="circle", children=html.Div(id="busca-global-resultados")),
+            ], className="p-3 border rounded bg-light")
+        ]),
+        dbc.Tab(label="Fila", children=[
+            html.Div([
+                html.Label("URLs de vídeos, playlists ou canais (uma por linha):", className="fw-bold"),
+                dcc.Textarea(id="fila-urls", className="form-control mb-2", style={"height": "120px"}),
+                dbc.Button("Adicionar à Fila", id="btn-fila-adicionar", color="primary", className="mb-2"),
+                html.Div(id="fila-mensagem", className="mb-2"),
+                html.Div(id="fila-estatisticas"),
+                html.Div(id="fila-jobs"),
+                dcc.Interval(id="fila-intervalo", interval=2000),
+            ], className="p-3 border rounded bg-light")
         ])
     ], className="mt-4")
 ], fluid=True)
 
-# Callback para processar o áudio e atualizar a transcrição
+# Lista exibida na aba de transcrição (uma página ou a cauda durante o streaming).
+# Só os segmentos paginados têm índice; o Dash recusa id=None
+def renderizar_segmentos(transcricao, destacado=None):
+    return html.Ul([
+        html.Li(f"[{seg['start']:.2f}s - {seg['end']:.2f}s] {seg['text']}",
+                **({"id": f"segmento-{seg['indice']}"} if "indice" in seg else {}),
+                className="bg-warning text-dark" if destacado is not None and seg.get("indice") == destacado else None)
+        for seg in transcricao
+    ])
+
+# Resumo exibido no lugar da lista completa: o conteúdo fica no visualizador paginado
+def descrever_transcricao(chave):
+    info = cache_transcricoes.descrever(chave)
+    if info is None:
+        return "Transcrição não encontrada no servidor."
+    return f"{info['segmentos']} segmentos, {formatar_tempo(info['duracao'])} de áudio (vídeo {info['video_id']})."
+
+# Dados guardados no navegador: só a referência à transcrição no servidor
+def referencia_transcricao(chave, video_id, idioma, segmentos):
+    return {"completed": True, "id": chave, "video_id": video_id, "idioma": idioma, "segmentos": segmentos}
+
+# Palavras-chave com os tempos das primeiras ocorrências, cada um com link para o ponto do vídeo
+def renderizar_palavras_chave(palavras_chave, video_id=None):
+    if not palavras_chave:
+        return html.Div()
+    itens = []
+    for p in palavras_chave:
+        tempos = []
+        for inicio in p["tempos"]:
+            rotulo = formatar_tempo(inicio)
+            tempos.append(html.A(rotulo, href=f"https://youtu.be/{video_id}?t={int(inicio)}", target="_blank")
+                          if video_id else rotulo)
+            tempos.append(" ")
+        itens.append(html.Li([html.B(p["termo"]), f" ({p['ocorrencias']}x): ", *tempos]))
+    return html.Div([html.H5("Palavras-chave", className="mt-3"), html.Ul(itens)])
+
+# Callback do botão: uma transcrição já em cache é respondida na hora, sem
+# iniciar um job; as demais viram um pedido para o job em segundo plano
 @app.callback(
     [
-        Output("transcricao", "children"),
-        Output("barra-progresso", "value"),
-        Output("transcricao-store", "data"),
+        Output("transcricao", "children", allow_duplicate=True),
+        Output("barra-progresso", "value", allow_duplicate=True),
+        Output("transcricao-store", "data", allow_duplicate=True),
+        Output("pedido-transcricao", "data"),
     ],
     [Input("btn-processar-audio", "n_clicks")],
     [State("input-url", "value"), State("idioma-transcricao", "value")],
     prevent_initial_call=True
 )
-def atualizar_transcricao(n_clicks, url_video, idioma):
-    print("Callback atualizar_transcricao acionado")
+def iniciar_transcricao(n_clicks, url_video, idioma):
+    print("Callback iniciar_transcricao acionado")
     if not n_clicks or not url_video:
         print("Sem cliques ou URL vazia")
-        return "Insira um URL válido e pressione o botão.", 0, {"completed": False, "texto": ""}
+        return "Insira um URL válido e pressione o botão.", 0, {"completed": False}, dash.no_update
+
+    video_id = extrair_video_id(url_video)
+    if not video_id:
+        print("URL sem ID de vídeo do YouTube")
+        return "Erro ao baixar o áudio.", 0, {"completed": False}, dash.no_update
+    transcricao_formatada = cache_transcricoes.obter(video_id, idioma)
+    if transcricao_formatada:
+        print(f"Transcrição de {video_id} encontrada no cache")
+        chave = cache_transcricoes.chave(video_id, idioma)
+        return (descrever_transcricao(chave), 100,
+                referencia_transcricao(chave, video_id, idioma, len(transcricao_formatada)), dash.no_update)
+    return "Baixando o áudio...", 0, dash.no_update, {"video_id": video_id, "idioma": idioma, "clique": n_clicks}
+
+# Job do pedido de transcrição. Roda em segundo plano: o download preenche a
+# barra até 50% e a transcrição, conforme os segundos de áudio processados,
+# de 50% a 100%, enquanto os segmentos já decodificados aparecem na aba. A
+# inferência roda no trabalhador do servidor, que grava o resultado no cache.
+@app.callback(
+    [
+        Output("transcricao", "children"),
+        Output("barra-progresso", "value"),
+        Output("transcricao-store", "data"),
+    ],
+    [Input("pedido-transcricao", "data")],
+    background=True,
+    progress=[Output("barra-progresso", "value"), Output("transcricao", "children")],
+    running=[(Output("btn-processar-audio", "disabled"), True, False)],
+    prevent_initial_call=True
+)
+def atualizar_transcricao(set_progress, pedido):
+    print("Callback atualizar_transcricao acionado")
+    if not pedido:
+        return dash.no_update, dash.no_update, dash.no_update
+    video_id, idioma = pedido["video_id"], pedido["idioma"]
 
     def update_progress(value):
-        return value
-
-    arquivo_wav = baixar_audio(url_video, update_callback=update_progress)
-    if arquivo_wav:
-        transcricao_formatada = transcrever_audio(arquivo_wav, idioma, update_callback=update_progress)
-        if isinstance(transcricao_formatada, list) and transcricao_formatada and "Erro" not in transcricao_formatada[0]:
-            print(f"Transcrição gerada com {len(transcricao_formatada)} segmentos")
-            texto_transcricao = " ".join([seg["text"] for seg in transcricao_formatada])
-            return (
-                html.Ul([html.Li(f"[{seg['start']:.2f}s - {seg['end']:.2f}s] {seg['text']}") for seg in transcricao_formatada]),
-                100,
-                {"completed": True, "texto": texto_transcricao}
-            )
-        else:
-            print("Erro na transcrição")
-            return "Erro ao processar a transcrição.", 0, {"completed": False, "texto": ""}
-    else:
-        print("Erro ao baixar áudio")
-        return "Erro ao baixar o áudio.", 0, {"completed": False, "texto": ""}
+        set_progress((value, "Baixando o áudio..."))
 
-# Callback para gerar o resumo e extrair palavra-chave
+    transcricao_formatada = []
+    try:
+        # O áudio fica reservado no armazém até o trabalhador terminar de decodificá-lo
+        with audio_compactado_em_uso(video_id, update_callback=update_progress) as arquivo_audio:
+            if not arquivo_audio:
+                print("Erro ao baixar áudio")
+                return "Erro ao baixar o áudio.", 0, {"completed": False}
+            set_progress((50, "Decodificando o áudio..."))
+            andamento = acompanhar_transcricao(arquivo_audio, idioma, video_id)
+            estado = next(andamento)
+            while estado["estado"] == "decodificando":
+                estado = next(andamento)
+
+        set_progress((50, "Transcrevendo..."))
+        for estado in itertools.chain([estado], andamento):
+            if not estado["segmentos"]:
+                continue
+            transcricao_formatada.extend(estado["segmentos"])
+            # Só a cauda da transcrição vai para o navegador durante o streaming
+            segundos, duracao = estado["segundos"], estado["duracao"]
+            set_progress((50 + 50 * segundos / max(duracao, 1e-6), [
+                html.P(f"{len(transcricao_formatada)} segmentos transcritos ({formatar_tempo(segundos)} de "
+                       f"{formatar_tempo(duracao)})"),
+                renderizar_segmentos(transcricao_formatada[-SEGMENTOS_PROGRESSO:]),
+            ]))
+    except Exception as e:
+        print(f"Erro ao transcrever o áudio: {e}")
+        return "Erro ao processar a transcrição.", 0, {"completed": False}
+
+    if estado["estado"] != "concluido":
+        print(f"Erro na transcrição: {estado['erro']}")
+        return "Erro ao processar a transcrição.", 0, {"completed": False}
+
+    chave = cache_transcricoes.chave(video_id, idioma)
+    print(f"Transcrição gerada com {len(transcricao_formatada)} segmentos")
+    return (
+        descrever_transcricao(chave),
+        100,
+        referencia_transcricao(chave, video_id, idioma, len(transcricao_formatada))
+    )
+
+# Navegação do visualizador: uma nova transcrição volta para a primeira
+# página; clicar em um resultado da busca pula para a página do segmento e o destaca
+@app.callback(
+    [Output("transcricao-paginacao", "active_page"), Output("segmento-destacado", "data")],
+    [Input("transcricao-store", "data"), Input({"type": "resultado-busca", "indice": ALL}, "n_clicks")],
+    prevent_initial_call=True
+)
+def navegar_transcricao(transcricao_data, cliques):
+    gatilho = dash.ctx.triggered_id
+    if isinstance(gatilho, dict):
+        if not any(cliques):
+            return dash.no_update, dash.no_update
+        indice = gatilho["indice"]
+        return indice // SEGMENTOS_POR_PAGINA + 1, indice
+    return 1, None
+
+# Página atual do visualizador, lida do servidor sob demanda
+@app.callback(
+    [Output("transcricao-segmentos", "children"), Output("transcricao-paginacao", "max_value")],
+    [Input("transcricao-paginacao", "active_page"), Input("segmento-destacado", "data")],
+    [State("transcricao-store", "data")],
+    prevent_initial_call=True
+)
+def paginar_transcricao(pagina, destacado, transcricao_data):
+    if not transcricao_data or not transcricao_data.get("completed", False):
+        return "", 1
+    paginas = max(1, -(-transcricao_data.get("segmentos", 0) // SEGMENTOS_POR_PAGINA))
+    pagina = min(max(pagina or 1, 1), paginas)
+    segmentos = cache_transcricoes.pagina(transcricao_data["id"], (pagina - 1) * SEGMENTOS_POR_PAGINA,
+                                          SEGMENTOS_POR_PAGINA)
+    return renderizar_segmentos(segmentos, destacado), paginas
+
+# Busca dentro da transcrição; cada resultado é um botão que leva ao segmento
+@app.callback(
+    Output("resultados-busca", "children"),
+    [Input("btn-buscar-transcricao", "n_clicks"), Input("busca-transcricao", "value")],
+    [State("transcricao-store", "data")],
+    prevent_initial_call=True
+)
+def buscar_transcricao(n_clicks, termo, transcricao_data):
+    if not termo or not transcricao_data or not transcricao_data.get("completed", False):
+        return ""
+    total, resultados = cache_transcricoes.buscar(transcricao_data["id"], termo, RESULTADOS_BUSCA)
+    if not total:
+        return html.P(f"Nenhuma ocorrência de \"{termo}\".")
+    return html.Div([
+        html.P(f"{total} segmentos com \"{termo}\"" + (f" (mostrando {len(resultados)})" if total > len(resultados) else "")),
+        html.Div([
+            dbc.Button(f"[{formatar_tempo(seg['start'])}] {seg['text'].strip()[:80]}",
+                       id={"type": "resultado-busca", "indice": seg["indice"]},
+                       color="link", size="sm", className="d-block text-start")
+            for seg in resultados
+        ], style={"maxHeight": "240px", "overflowY": "auto"}),
+    ], className="mb-2")
+
+# Trecho com os termos encontrados marcados (o índice delimita cada ocorrência com \x02 e \x03)
+def renderizar_destaque(destaque):
+    partes = []
+    for i, parte in enumerate(destaque.strip().split(indice_busca.MARCADOR_INICIO)):
+        if i:
+            marcado, _, parte = parte.partition(indice_busca.MARCADOR_FIM)
+            partes.append(html.Mark(marcado))
+        partes.append(parte)
+    return partes
+
+# Busca em todos os vídeos transcritos; os trechos ficam agrupados por vídeo,
+# na ordem do melhor resultado de cada um, com links para o momento exato
+@app.callback(
+    Output("busca-global-resultados", "children"),
+    [Input("btn-busca-global", "n_clicks"), Input("busca-global", "value")],
+    [State("busca-global-idioma", "value")],
+    prevent_initial_call=True
+)
+def buscar_todos_videos(n_clicks, texto, idioma):
+    if not texto or not texto.strip():
+        return ""
+    resultados = indice_busca.buscar(texto, idioma or None, RESULTADOS_BUSCA_GLOBAL)
+    if not resultados:
+        return html.P(f"Nenhum trecho encontrado para \"{texto}\".")
+    por_video = {}
+    for r in resultados:
+        por_video.setdefault((r["video_id"], r["idioma"]), []).append(r)
+    return html.Div([
+        html.P(f"{len(resultados)} trechos em {len(por_video)} vídeos"),
+        *[html.Div([
+            html.H5(html.A(video_id, href=f"https://www.youtube.com/watch?v={video_id}", target="_blank"),
+                    className="mt-3"),
+            html.Ul([
+                html.Li([
+                    html.A(f"[{formatar_tempo(r['start'])}]", href=f"https://youtu.be/{video_id}?t={int(r['start'])}",
+                           target="_blank", className="me-2"),
+                    *renderizar_destaque(r["destaque"]),
+                ])
+                for r in trechos
+            ]),
+        ]) for (video_id, _), trechos in por_video.items()],
+    ])
+
+# Callback para exportar a transcrição. Os tempos por palavra só são
+# calculados quando pedidos: se o cache ainda não tem essa variante, o áudio
+# (já baixado) é transcrito de novo com word_timestamps no trabalhador do servidor.
+@app.callback(
+    Output("download-legendas", "data"),
+    [Input("btn-exportar", "n_clicks")],
+    [State("transcricao-store", "data"), State("idioma-transcricao", "value"),
+     State("formato-exportacao", "value"), State("exportar-por-palavra", "value")],
+    background=True,
+    running=[(Output("btn-exportar", "disabled"), True, False)],
+    prevent_initial_call=True
+)
+def exportar_transcricao(n_clicks, transcricao_data, idioma, formato, por_palavra):
+    print("Callback exportar_transcricao acionado")
+    video_id = (transcricao_data or {}).get("video_id")
+    if not video_id or not transcricao_data.get("completed", False):
+        print("Nenhuma transcrição para exportar")
+        return dash.no_update
+
+    por_palavra = bool(por_palavra)
+    idioma = transcricao_data.get("idioma", idioma)
+    if por_palavra:
+        segmentos = cache_transcricoes.obter(video_id, idioma, opcoes=opcoes_decodificacao(True), registrar=False)
+    else:
+        segmentos = cache_transcricoes.obter_por_chave(transcricao_data.get("id"))
+    if segmentos is None and por_palavra:
+        print(f"Calculando tempos por palavra de {video_id}")
+        with audio_compactado_em_uso(video_id) as arquivo_audio:
+            estados = []
+            if arquivo_audio:
+                estados = list(acompanhar_transcricao(arquivo_audio, idioma, video_id, palavras=True))
+        if estados and estados[-1]["estado"] == "concluido":
+            segmentos = [seg for estado in estados for seg in estado["segmentos"]]
+    if not segmentos or not isinstance(segmentos[0], dict):
+        print("Erro ao obter os segmentos para exportação")
+        return dash.no_update
+
+    saida = io.StringIO()
+    legendas = ExportadorLegendas(saida, formato, por_palavra).escrever(segmentos)
+    print(f"Exportadas {legendas} legendas em {formato}")
+    return dcc.send_string(saida.getvalue(), f"{video_id}.{formato}")
+
+# Callback para analisar a transcrição: resumo, palavra-chave e sentimento
+# saem de uma única requisição ao serviço de análise
 @app.callback(
     [
         Output("resumo", "children"),
         Output("palavra-chave-store", "data"),
+        Output("sentimentos-texto", "children"),
+        Output("sentimentos-grafico", "figure"),
     ],
     [Input("transcricao-store", "data")],
     [State("idioma-transcricao", "value")],
     prevent_initial_call=True
 )
-def gerar_resumo(transcricao_data, idioma):
-    print("Callback gerar_resumo acionado")
+def analisar_transcricao(transcricao_data, idioma):
+    print("Callback analisar_transcricao acionado")
     if not transcricao_data or not transcricao_data.get("completed", False):
         print("Transcrição não completa ou inexistente")
-        return "Aguardando transcrição...", ""
+        return "Aguardando transcrição...", "", "Aguardando transcrição...", {}
 
-    texto = transcricao_data.get("texto", "")
+    # A transcrição vem do servidor pelo ID; o navegador não carrega o texto
+    idioma = transcricao_data.get("idioma", idioma)
+    segmentos = cache_transcricoes.obter_por_chave(transcricao_data.get("id"))
+    texto = " ".join(seg["text"] for seg in segmentos or [])
     if not texto.strip():
         print("Texto vazio ou inválido")
-        return "Transcrição vazia ou inválida.", ""
+        return "Transcrição vazia ou inválida.", "", "Transcrição vazia ou inválida.", {}
 
     try:
-        client, model_id = config_ai()
-        if client is None or model_id is None:
+        servico = obter_servico_analise()
+        if servico is None:
             print("Falha na configuração da API")
-            return "Erro ao configurar a API do Gemini.", ""
+            return "Erro ao configurar a API do Gemini.", "", "Erro ao configurar a API do Gemini.", {}
 
-        resumo = agente_resumidor(texto, model_id, client)
+        # Segmentos com tempos permitem janelas alinhadas no resumo map-reduce
+        video_id = transcricao_data.get("video_id")
+        analise = servico.analisar(texto, idioma, segmentos)
+        resumo = analise["resumo"]
+        sentimento = analise["sentimento"]
         print(f"Resumo gerado: {resumo[:100]}...")
-        palavra_chave = extrair_termo_principal(resumo, idioma)
+        print(f"Sentimento gerado: {sentimento} ({analise['latencia_s']:.2f}s, {analise['uso']})")
+
+        # Palavras-chave da transcrição inteira (TF-IDF contra o corpus); as do
+        # modelo e o n-gram do resumo ficam como alternativa
+        palavras_chave = motor_palavras_chave.extrair(segmentos, idioma, video_id=video_id)
+        if palavras_chave:
+            palavra_chave = palavras_chave[0]["termo"]
+        elif analise["palavras_chave"]:
+            palavra_chave = analise["palavras_chave"][0]
+        else:
+            palavra_chave = extrair_termo_principal(resumo, idioma)
         print(f"Palavra-chave extraída: {palavra_chave}")
-        return dcc.Markdown(resumo), palavra_chave
-    except Exception as e:
-        print(f"Erro no callback gerar_resumo: {str(e)}")
-        return f"Erro ao gerar resumo: {str(e)}", ""
 
-# Callback para analisar sentimentos
-@app.callback(
-    [Output("sentimentos-texto", "children"), Output("sentimentos-grafico", "figure")],
-    [Input("transcricao-store", "data")],
-    prevent_initial_call=True
-)
-def analisar_sentimentos(transcricao_data):
-    print("Callback analisar_sentimentos acionado")
-    if not transcricao_data or not transcricao_data.get("completed", False):
-        print("Transcrição não completa ou inexistente")
-        return "Aguardando transcrição...", {}
-
-    texto = transcricao_data.get("texto", "")
-    if not texto.strip():
-        print("Texto vazio ou inválido")
-        return "Transcrição vazia ou inválida.", {}
-
-    try:
-        client, model_id = config_ai()
-        if client is None or model_id is None:
-            print("Falha na configuração da API")
-            return "Erro ao configurar a API do Gemini.", {}
-
-        sentimento = agente_analisador_sentimentos(texto, model_id, client)
-        print(f"Sentimento gerado: {sentimento}")
-        figura = {
-            "data": [{"x": ["Sentimento"], "y": [sentimento], "type": "bar"}],
-            "layout": {"title": "Análise de Sentimentos"}
-        }
-        return f"Sentimento: {sentimento}", figura
+        # Linha do tempo do sentimento por segmento
+        textos = [seg["text"] for seg in segmentos]
+        if MODO_SENTIMENTO == "llm":
+            notas = servico.pontuar_segmentos(textos, idioma)
+        else:
+            notas = motor_sentimento.pontuar(textos, idioma)
+        rotulos = Counter(MotorSentimento.rotular(n) for n in notas)
+        texto_sentimento = (f"Sentimento: {sentimento} | média por segmento: {float(np.mean(notas)):+.2f} "
+                            f"({rotulos['positivo']} positivos, {rotulos['neutro']} neutros, "
+                            f"{rotulos['negativo']} negativos)")
+        figura = figura_linha_tempo_sentimento(segmentos, notas)
+        conteudo_resumo = html.Div([dcc.Markdown(resumo), renderizar_palavras_chave(palavras_chave, video_id)])
+        return conteudo_resumo, palavra_chave, texto_sentimento, figura
     except Exception as e:
-        print(f"Erro no callback analisar_sentimentos: {str(e)}")
-        return f"Erro ao analisar sentimentos: {str(e)}", {}
+        print(f"Erro no callback analisar_transcricao: {str(e)}")
+        return f"Erro ao gerar resumo: {str(e)}", "", f"Erro ao analisar sentimentos: {str(e)}", {}
 
 # Callback para atualizar o campo de tópico com a palavra-chave
 @app.callback(
@@ -448,28 +526,198 @@ def atualizar_topico(palavra_chave):
     print(f"Atualizando tópico com: {palavra_chave}")
     return palavra_chave
 
-# Callback para gerar o post
+# Estágios do post como cartões: o que está rodando mostra o texto parcial
+def renderizar_post(topico, estagios):
+    estados = {"cache": "do cache", "executando": "escrevendo...", "concluido": "concluído",
+               "timeout": "tempo esgotado", "erro": "erro", "cancelado": "cancelado"}
+    cartoes = [html.H4(f"Post Gerado para o Tópico: {topico}")]
+    for i, estagio in enumerate(ESTAGIOS_POST, 1):
+        evento = estagios.get(estagio["estagio"])
+        if evento is None:
+            continue
+        cor = "danger" if evento["estado"] in ("timeout", "erro", "cancelado") else "light"
+        cartoes.append(dbc.Card([
+            dbc.CardHeader(f"{i}. {estagio['titulo']} — {estados[evento['estado']]}"),
+            dbc.CardBody(dcc.Markdown(evento["texto"] or "...")),
+        ], color=cor, outline=True, className="mb-2"))
+    revisao = estagios.get("revisor")
+    if revisao and revisao["estado"] in ("cache", "concluido") and not post_aprovado(revisao["texto"]):
+        cartoes.append(html.P("O revisor pediu ajustes: use Regenerar com a Revisão para reescrever só o rascunho.",
+                              className="text-warning"))
+    return cartoes
+
+# Callback para gerar o post. Roda como background callback: cada estágio é
+# transmitido para a aba Post enquanto chega, o botão Cancelar encerra o job
+# e os estágios concluídos ficam no cache, então gerar de novo recomeça do
+# estágio interrompido. Regenerar reaproveita busca e plano e reescreve o
+# rascunho a partir da revisão anterior.
 @app.callback(
-    Output("output-agente", "children"),
-    [Input("btn-gerar-post", "n_clicks")],
-    [State("input-topico-agente", "value")],
+    [Output("output-agente", "children"), Output("post-store", "data")],
+    [Input("btn-gerar-post", "n_clicks"), Input("btn-regenerar-post", "n_clicks")],
+    [State("input-topico-agente", "value"), State("post-store", "data")],
+    background=True,
+    progress=[Output("output-agente", "children")],
+    running=[
+        (Output("btn-gerar-post", "disabled"), True, False),
+        (Output("btn-regenerar-post", "disabled"), True, False),
+        (Output("btn-cancelar-post", "disabled"), False, True),
+    ],
+    cancel=[Input("btn-cancelar-post", "n_clicks")],
     prevent_initial_call=True
 )
-def gerar_post(n_clicks, topico):
+def gerar_post(set_progress, n_gerar, n_regenerar, topico, post_anterior):
     print("Callback gerar_post acionado")
-    if not n_clicks or not topico:
-        print("Sem cliques ou tópico vazio")
-        return "Por favor, digite um tópico para gerar o post."
-
-    client, model_id = config_ai()
-    if client is None or model_id is None:
+    if not topico:
+        print("Tópico vazio")
+        return "Por favor, digite um tópico para gerar o post.", post_anterior
+
+    anteriores = None
+    if dash.ctx.triggered_id == "btn-regenerar-post":
+        if not post_anterior or post_anterior.get("topico") != topico or "revisor" not in post_anterior["resultados"]:
+            return "Gere um post para este tópico antes de regenerar.", post_anterior
+        anteriores = post_anterior["resultados"]
+
+    pipeline = criar_pipeline_post(cache_transcricoes)
+    if pipeline is None:
         print("Falha na configuração da API")
-        return "Erro ao configurar a API do Gemini."
+        return "Erro ao configurar a API do Gemini.", post_anterior
+
+    estagios = {}
+    resultados = {}
+    ultima_atualizacao = 0.0
+    for evento in pipeline.gerar(topico, anteriores):
+        estado_anterior = estagios.get(evento["estagio"], {}).get("estado")
+        estagios[evento["estagio"]] = {"texto": evento["texto"], "estado": evento["estado"]}
+        resultados = evento["resultados"]
+        agora = time.monotonic()
+        # Trechos em sequência são agrupados; mudanças de estado vão sempre para o navegador
+        if evento["estado"] != estado_anterior or agora - ultima_atualizacao >= INTERVALO_PROGRESSO_POST_S:
+            set_progress([renderizar_post(topico, estagios)])
+            ultima_atualizacao = agora
+
+    print(f"Post gerado: {resultados.get('redator', '')[:100]}...")
+    return renderizar_post(topico, estagios), {"topico": topico, "resultados": resultados}
+
+# Callback para enviar URLs para a fila de transcrição em lote
+@app.callback(
+    Output("fila-mensagem", "children"),
+    [Input("btn-fila-adicionar", "n_clicks")],
+    [State("fila-urls", "value"), State("idioma-transcricao", "value")],
+    prevent_initial_call=True
+)
+def adicionar_fila(n_clicks, urls, idioma):
+    if not n_clicks or not urls or not urls.strip():
+        return "Insira ao menos uma URL."
+    fila_transcricao.iniciar()
+    criados = fila_transcricao.adicionar(urls, idioma)
+    return f"{criados} job(s) adicionados à fila."
+
+# Callback que atualiza profundidade e vazão da fila periodicamente
+@app.callback(
+    [Output("fila-estatisticas", "children"), Output("fila-jobs", "children")],
+    [Input("fila-intervalo", "n_intervals")]
+)
+def atualizar_fila(n_intervals):
+    fila_transcricao.iniciar()
+    stats = fila_transcricao.estatisticas()
+    profundidade = stats["profundidade"]
+    tabela_estagios = dbc.Table(
+        [html.Thead(html.Tr([html.Th(estagio) for estagio in profundidade])),
+         html.Tbody(html.Tr([html.Td(quantidade) for quantidade in profundidade.values()]))],
+        bordered=True, size="sm", className="mb-2")
+    downloads, transcricoes = stats["downloads"], stats["transcricoes"]
+    vazao = html.P(
+        f"Última hora — downloads: {downloads['concluidos']} ({downloads['por_minuto']:.2f}/min, "
+        f"média {downloads['duracao_media_s']:.1f}s) | transcrições: {transcricoes['concluidas']} "
+        f"({transcricoes['por_minuto']:.2f}/min, média {transcricoes['duracao_media_s']:.1f}s, "
+        f"{transcricoes['audio_por_segundo']:.2f}s de áudio/s)")
+    jobs = html.Ul([
+        html.Li(f"#{job['id']} [{job['estagio']}] {job['video_id'] or job['url']} ({job['idioma']})"
+                + (f" — {job['erro']}" if job["erro"] else ""))
+        for job in fila_transcricao.listar()
+    ])
+    return [tabela_estagios, vazao], jobs
+
+# Endpoint com tempos de carga e hits/misses do registro de modelos do
+# trabalhador de transcrição (e dos processos do seu pool de trechos)
+@app.server.route("/estatisticas/modelos")
+def estatisticas_modelos():
+    try:
+        return obter_servico_transcricao().estatisticas()
+    except (OSError, EOFError) as e:
+        return {"erro": f"trabalhador de transcrição indisponível: {e}"}, 503
+
+# Endpoints do cache de transcrições: estatísticas e invalidação explícita
+@app.server.route("/estatisticas/transcricoes")
+def estatisticas_transcricoes():
+    return cache_transcricoes.estatisticas()
+
+# Exige ao menos um filtro (video_id, idioma, modelo) ou {"todos": true}: um
+# POST sem corpo válido não pode apagar o cache e o índice de busca inteiros
+@app.server.route("/cache/transcricoes/invalidar", methods=["POST"])
+def invalidar_transcricoes():
+    filtros = flask.request.get_json(silent=True)
+    if not isinstance(filtros, dict):
+        return {"erro": "corpo JSON inválido"}, 400
+    video_id, idioma, modelo = (filtros.get(campo) or None for campo in ("video_id", "idioma", "modelo"))
+    if video_id is None and idioma is None and modelo is None and filtros.get("todos") is not True:
+        return {"erro": "informe video_id, idioma ou modelo, ou {\"todos\": true} para limpar o cache"}, 400
+    removidas = cache_transcricoes.invalidar(video_id, idioma, modelo)
+    return {"removidas": removidas}
+
+# Busca textual em todos os vídeos: /busca?q=termo&idioma=pt&limite=20
+@app.server.route("/busca")
+def buscar_indice():
+    argumentos = flask.request.args
+    try:
+        limite = min(int(argumentos.get("limite", 20)), 200)
+    except ValueError:
+        return {"erro": "limite inválido"}, 400
+    resultados = indice_busca.buscar(argumentos.get("q", ""), argumentos.get("idioma") or None, limite)
+    return {"resultados": resultados}
+
+@app.server.route("/estatisticas/busca")
+def estatisticas_busca():
+    return indice_busca.estatisticas()
+
+@app.server.route("/estatisticas/analise")
+def estatisticas_analise():
+    return estatisticas_servico_analise()
+
+@app.server.route("/estatisticas/fila")
+def estatisticas_fila():
+    return fila_transcricao.estatisticas()
+
+# Hits/misses, downloads compartilhados e bytes removidos do armazém de áudios
+@app.server.route("/estatisticas/artefatos")
+def estatisticas_artefatos():
+    return armazem_artefatos.estatisticas()
+
+# Métricas por estágio do pipeline (download, decodificação, carga do modelo,
+# inferência, transcrição, análise e agentes): /metricas?janela_s=3600 agrega
+# e /metricas/spans?estagio=inferencia&limite=50 lista os spans mais recentes
+@app.server.route("/metricas")
+def metricas_pipeline():
+    try:
+        janela_s = float(flask.request.args.get("janela_s", 3600))
+    except ValueError:
+        return {"erro": "janela_s inválida"}, 400
+    return metricas.resumo(janela_s)
 
-    final_post = run_agentes(topico, model_id, client)
-    print(f"Post gerado: {final_post[:100]}...")
-    return [html.H4(f"Post Gerado para o Tópico: {topico}"), dcc.Markdown(final_post)]
+@app.server.route("/metricas/spans")
+def metricas_spans():
+    try:
+        limite = min(int(flask.request.args.get("limite", 50)), 1000)
+    except ValueError:
+        return {"erro": "limite inválido"}, 400
+    return {"spans": metricas.spans(limite, flask.request.args.get("estagio"))}
 
 # Executar o servidor Dash
 if __name__ == "__main__":
+    # Com debug=True o reloader do Flask executa este bloco também no processo
+    # vigia; o trabalhador de transcrição (que aquece os modelos) e a fila só são
+    # iniciados no processo que atende requisições (no Colab/Jupyter não há reloader)
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true" or "ipykernel" in sys.modules:
+        iniciar_trabalhador_transcricao(MODELOS_AQUECER)
+        fila_transcricao.iniciar()
     app.run(debug=True, host='0.0.0.0')
\ No newline at end of file